@@ -0,0 +1,88 @@
+"""
+Build and search times for the unbalanced and AVL-balanced BST.
+
+Usage: python benchmarks/bst_benchmark.py [--sizes 10000 100000 1000000]
+
+Unbalanced trees on sorted input take quadratic time to build, so they are
+only measured up to --max-unbalanced keys.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from business_logic.bst import BST  # noqa: E402
+
+ORDERS = ("sorted", "reversed", "random")
+
+
+def make_keys(size, order):
+    keys = [f"book {i:08d}" for i in range(size)]
+    if order == "reversed":
+        keys.reverse()
+    elif order == "random":
+        random.Random(0).shuffle(keys)
+    return keys
+
+
+def measure(keys, balanced):
+    bst = BST(key_func=lambda key: key, balanced=balanced)
+    start = time.perf_counter()
+    bst.build(keys)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    bst.search("7")
+    search = time.perf_counter() - start
+    return build, search, bst
+
+
+def tree_height(bst):
+    height = 0
+    stack = [(bst.root, 1)] if bst.root else []
+    while stack:
+        node, depth = stack.pop()
+        height = max(height, depth)
+        for child in (node.left, node.right):
+            if child is not None:
+                stack.append((child, depth + 1))
+    return height
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--max-unbalanced", type=int, default=20_000)
+    args = parser.parse_args()
+
+    print(
+        f"{'size':>9} {'order':>9} {'tree':>10} {'build s':>9} "
+        f"{'search s':>9} {'height':>7}"
+    )
+    for size in args.sizes:
+        for order in ORDERS:
+            keys = make_keys(size, order)
+            for balanced in (False, True):
+                tree = "avl" if balanced else "unbalanced"
+                if not balanced and order != "random" and size > args.max_unbalanced:
+                    print(f"{size:>9} {order:>9} {tree:>10} {'skipped':>9}")
+                    continue
+                build, search, bst = measure(keys, balanced)
+                print(
+                    f"{size:>9} {order:>9} {tree:>10} {build:>9.3f} "
+                    f"{search:>9.3f} {tree_height(bst):>7}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Time and peak memory per CBF call for users with growing review histories.
+
+Usage: python benchmarks/cbf_benchmark.py [--reviews 10 1000 10000]
+
+Runs against a throwaway test database. "orm" materializes the user's
+reviews as Review+Book instances via select_related, as the recommender
+used to; "values" streams only the needed columns with values_list into
+the profile arrays. "reviewed" and "catalog" time a full recommendation
+in each CBF mode with the profiles already loaded.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+
+from business_logic.cbf import BookRecommender  # noqa: E402
+from business_logic.profiles import (  # noqa: E402
+    get_user_profiles,
+    user_review_rows,
+)
+from data_access.models import Book, Review  # noqa: E402
+
+GENRES = [f"Genre {i}" for i in range(40)]
+DESCRIPTION = "lorem ipsum " * 200
+
+
+def seed(n_books, review_counts):
+    rng = random.Random(0)
+    Book.objects.bulk_create(
+        Book(
+            id=f"book{i:06d}",
+            title=f"Title {i}",
+            description=DESCRIPTION,
+            authors=f"Author {i % 500}",
+            categories=",".join(rng.sample(GENRES, rng.randint(1, 3))),
+            ratingsCount=rng.randint(0, 1000),
+        )
+        for i in range(n_books)
+    )
+    for count in review_counts:
+        books = rng.sample(range(n_books), count)
+        Review.objects.bulk_create(
+            (
+                Review(
+                    book_id=f"book{i:06d}",
+                    user_id=f"user{count}",
+                    review_score=rng.randint(1, 5),
+                )
+                for i in books
+            ),
+            batch_size=2000,
+        )
+
+
+def orm_extract(user_id):
+    reviews = Review.objects.filter(user_id=user_id).select_related("book")
+    return [
+        {
+            "book_id": review.book.id,
+            "title": review.book.title,
+            "categories": review.book.categories,
+            "score": review.review_score,
+        }
+        for review in reviews
+    ]
+
+
+def values_extract(user_id):
+    get_user_profiles().refresh(user_id, user_review_rows(user_id))
+
+
+def measure(func, *args, repeat=3):
+    """Best wall time over repeat calls and the peak traced allocation."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reviews", type=int, nargs="+", default=[10, 1000, 10_000])
+    parser.add_argument("--books", type=int, default=20_000)
+    args = parser.parse_args()
+
+    connection.creation.create_test_db(verbosity=0)
+    seed(max(args.books, max(args.reviews)), args.reviews)
+    get_user_profiles()
+
+    calls = {
+        "orm": orm_extract,
+        "values": values_extract,
+        "reviewed": BookRecommender._get_cbf_list,
+        "catalog": BookRecommender._get_catalog_cbf_list,
+    }
+    print(f"{'reviews':>8} {'path':>9} {'ms':>9} {'peak KiB':>10}")
+    for count in args.reviews:
+        for name, func in calls.items():
+            seconds, peak = measure(func, f"user{count}")
+            print(f"{count:>8} {name:>9} {seconds * 1000:>9.2f} {peak / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Recall@10 and latency of the LSH index against exact TF-IDF search.
+
+Usage: python benchmarks/lsh_benchmark.py [--path src/tfidf_index]
+           [--tables 4 8 16] [--bits 8 12 16]
+
+Without --path a synthetic topic-clustered matrix of --books books is
+used. Recall is the share of the exact top 10 (by cosine) that the LSH
+lookup returns, averaged over --queries random books.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+import numpy as np  # noqa: E402
+
+from business_logic.lsh import LSHIndex  # noqa: E402
+from business_logic.tfidf import TfidfIndex  # noqa: E402
+
+K = 10
+
+
+def synthetic(n_books, n_terms=30_000, topics=500, terms_per_book=60, seed=0):
+    """
+    Books drawing 80% of their terms from one topic's vocabulary slice and
+    the rest from Zipf-distributed common words.
+    """
+    rng = np.random.default_rng(seed)
+    per_topic = n_terms // topics
+    own = int(terms_per_book * 0.8)
+    topic = rng.integers(topics, size=n_books)
+    topical = (
+        rng.integers(per_topic, size=(n_books, own)) + (topic * per_topic)[:, None]
+    )
+    # Shared words follow Zipf's law, so common terms have long postings
+    noise = np.minimum(rng.zipf(1.3, size=(n_books, terms_per_book - own)), n_terms) - 1
+    rows = [np.unique(terms) for terms in np.hstack([topical, noise])]
+    indptr = np.concatenate([[0], np.cumsum([len(row) for row in rows])])
+    indices = np.concatenate(rows)
+    return TfidfIndex.from_csr(
+        [f"book{i}" for i in range(n_books)],
+        [f"term{i}" for i in range(n_terms)],
+        indptr,
+        indices,
+        rng.random(len(indices)),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--path", type=str, default=None)
+    parser.add_argument("--books", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--tables", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--bits", type=int, nargs="+", default=[8, 12, 16])
+    args = parser.parse_args()
+
+    tfidf = TfidfIndex.load(args.path) if args.path else synthetic(args.books)
+    rng = np.random.default_rng(1)
+    queries = tfidf.to_book_ids(rng.choice(len(tfidf), args.queries, replace=False))
+
+    tfidf.similar(queries[0], K)  # builds the transposed CSR outside the timing
+    start = time.perf_counter()
+    exact = [{book for book, _ in tfidf.similar(query, K)} for query in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    print(f"{len(tfidf)} books, exact search {exact_ms:.2f} ms/query")
+
+    print(
+        f"{'tables':>7} {'bits':>5} {'build s':>8} {'ms/query':>9} "
+        f"{'candidates':>11} {f'recall@{K}':>10}"
+    )
+    for tables in args.tables:
+        for bits in args.bits:
+            start = time.perf_counter()
+            index = LSHIndex.build(tfidf, tables, bits)
+            build = time.perf_counter() - start
+
+            candidates = found = 0
+            start = time.perf_counter()
+            results = [index.similar(query, K) for query in queries]
+            query_ms = (time.perf_counter() - start) * 1000 / len(queries)
+            for query, result, expected in zip(queries, results, exact):
+                candidates += len(index.candidates(tfidf.book_index(query))[0])
+                found += len(expected & {book for book, _ in result})
+            total = sum(len(expected) for expected in exact)
+            print(
+                f"{tables:>7} {bits:>5} {build:>8.2f} {query_ms:>9.2f} "
+                f"{candidates / len(queries):>11.0f} {found / max(total, 1):>10.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
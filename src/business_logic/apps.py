@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class BusinessLogicConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'business_logic'
+
+    def ready(self):
+        from business_logic import signals  # noqa: F401
+        from business_logic.graph_index import preload_graph_index
+
+        preload_graph_index()
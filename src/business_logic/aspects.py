@@ -1,4 +1,5 @@
 import functools
+import inspect
 import logging
 import time
 from typing import Any, Callable
@@ -50,11 +51,27 @@ def method_logger(func: Callable) -> Callable:
     return wrapper
 
 
-def simple_cache(timeout: int = 300) -> Callable:
+# `version` is an optional callable whose value is part of the key: bumping it
+# retires every cached entry of the function without touching the cache.
+# With version_arg it is called with the value of that argument, so a version
+# can cover a subset of the entries, e.g. one user's.
+def simple_cache(
+    timeout: int = 300, version: Callable = None, version_arg: str = None
+) -> Callable:
     def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func) if version_arg else None
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            key = _generate_cache_key(func, args, kwargs)
+            if version is None:
+                current = None
+            elif version_arg:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                current = version(bound.arguments[version_arg])
+            else:
+                current = version()
+            key = _generate_cache_key(func, args, kwargs, current)
             cached = cache.get(key)
 
             if cached is not None:
@@ -143,8 +160,12 @@ def _summarize_result(result: Any) -> str:
     return f"returned {type(result).__name__}"
 
 
-def _generate_cache_key(func: Callable, args: tuple, kwargs: dict) -> str:
+def _generate_cache_key(
+    func: Callable, args: tuple, kwargs: dict, version: Any = None
+) -> str:
     name = f"{func.__module__}.{func.__qualname__}"
+    if version is not None:
+        name = f"{name}:v{version}"
 
     string_args = tuple(map(repr, args))
     string_kwargs = {k: repr(v) for k, v in kwargs.items()}
@@ -163,7 +184,13 @@ def validate_positive_int(args: tuple, kwargs: dict) -> None:
         if isinstance(arg, int) and arg <= 0:
             raise ValueError("Integer parameters must be positive")
 
-    numeric_keys = {"k", "n_recommendations", "max_results", "max_depth"}
+    numeric_keys = {
+        "k",
+        "n_recommendations",
+        "max_results",
+        "max_depth",
+        "max_feature_degree",
+    }
     for key, value in kwargs.items():
         if isinstance(value, int) and key in numeric_keys and value <= 0:
             raise ValueError(f"{key} must be positive")
@@ -1,5 +1,6 @@
-from collections import defaultdict, deque
-from typing import List
+from typing import Dict, List, Optional
+
+import numpy as np
 
 from business_logic.aspects import (
     error_handler,
@@ -9,12 +10,25 @@ from business_logic.aspects import (
     validate_non_empty_string,
     validate_positive_int,
 )
-from data_access.models import Book
+from business_logic.csr import top_positions, top_rows
+from business_logic.graph_index import get_graph_index, graph_version
+from business_logic.graph_workers import init_worker, recommend_chunk
+from business_logic.precompute import imap_chunks
+from data_access.models import Book, PrecomputedRecommendation
+
+GRAPH_MODES = ("bfs", "ppr")
+PPR_ALPHA = 0.15
+PPR_ITERATIONS = 10
+MAX_FEATURE_DEGREE = 500
+# Candidates BFS ranks; a level past the cap keeps its best-overlap books
+MAX_CANDIDATES = 1000
+# Seeds iterated together by PageRank; bounds the edges x seeds work matrix
+PPR_BLOCK = 16
 
 
 class GraphRecommender:
     """
-    Graph-based recommender using BFS.
+    Graph-based recommender using BFS or personalized PageRank.
     Nodes: books; edges: same author or same category.
     """
 
@@ -22,54 +36,249 @@ class GraphRecommender:
     @error_handler([], propagate=[Book.DoesNotExist])
     @input_validator(validate_positive_int, validate_non_empty_string)
     @performance_monitor
-    @simple_cache(300)
+    @simple_cache(300, version=graph_version)
     def get_recommendations(
-        start_book_id: str, max_depth: int = 2, max_results: int = 10
+        start_book_id: str,
+        max_depth: int = 2,
+        max_results: int = 10,
+        mode: str = "bfs",
+        iterations: int = PPR_ITERATIONS,
+        max_feature_degree: int = MAX_FEATURE_DEGREE,
     ) -> List[Book]:
-        # Build feature maps: author -> books, category -> books
-        author_map = defaultdict(set)
-        category_map = defaultdict(set)
-
-        all_books = list(Book.objects.only("id", "authors", "categories"))  # O(n)
-        for b in all_books:  # O(n * f)
-            if b.authors:
-                for author in b.authors.split(","):
-                    author_map[author.strip().lower()].add(b.id)
-            if b.categories:
-                for cat in b.categories.split(","):
-                    category_map[cat.strip().lower()].add(b.id)
-
-        visited = set([start_book_id])
-        queue = deque([(start_book_id, 0)])
-        recommendations = []
-
-        while queue and len(recommendations) < max_results:
-            current_id, depth = queue.popleft()
-            if depth >= max_depth:
-                continue
-
-            # neighbors by author
-            b = Book.objects.only("id", "authors", "categories").get(pk=current_id)
-            neighbors = set()
-            if b.authors:
-                for author in b.authors.split(","):
-                    neighbors |= author_map[author.strip().lower()]
-            if b.categories:
-                for cat in b.categories.split(","):
-                    neighbors |= category_map[cat.strip().lower()]
-
-            for nb_id in neighbors:
-                if nb_id not in visited:
-                    visited.add(nb_id)
-                    queue.append((nb_id, depth + 1))
-                    if nb_id != start_book_id:
-                        recommendations.append(nb_id)
-                        if len(recommendations) >= max_results:
-                            break
-
-        # Fetch Book instances preserving order
-        books = list(Book.objects.filter(id__in=recommendations))
-        # maintain recommendation order
-        id_to_book = {book.id: book for book in books}
-        ordered = [id_to_book[rid] for rid in recommendations if rid in id_to_book]
-        return ordered
+        """
+        mode="bfs" visits books up to max_depth hops away and returns those
+        sharing the most authors/categories with the start book.
+        mode="ppr" ranks books by personalized PageRank from the start book,
+        using a fixed number of power iterations instead of max_depth.
+        BFS expands each author/category to at most max_feature_degree of
+        its most rated books, so hub categories cannot blow up a request.
+        Results stored by precompute_recommendations for the same parameters
+        are returned without touching the graph; saving a book drops only its
+        own row, and the others catch up on the next precompute run.
+        """
+        if mode not in GRAPH_MODES:
+            raise ValueError(f"Unknown recommendation mode: {mode}")
+
+        params = GraphRecommender.params(
+            max_depth, max_results, mode, iterations, max_feature_degree
+        )
+        stored = (
+            PrecomputedRecommendation.objects.filter(book_id=start_book_id)
+            .values_list("params", "recommended_ids")
+            .first()
+        )
+        if stored and stored[0] == params:
+            return GraphRecommender._fetch_books([stored[1]])[0]
+
+        index = get_graph_index()
+        start = index.book_index(start_book_id)
+        if start < 0:
+            # Unknown to this worker's index: raises DoesNotExist for bad ids,
+            # otherwise the book was added elsewhere and is patched in.
+            book = Book.objects.only("id", "authors", "categories", "ratingsCount").get(
+                pk=start_book_id
+            )
+            index.upsert(book.id, book.authors, book.categories, book.ratingsCount)
+            start = index.book_index(start_book_id)
+
+        rows = GraphRecommender._recommend_rows(
+            index,
+            np.array([start]),
+            max_depth,
+            max_results,
+            mode,
+            iterations,
+            max_feature_degree,
+        )[0]
+        return GraphRecommender._fetch_books([index.to_book_ids(rows)])[0]
+
+    @staticmethod
+    @input_validator(validate_positive_int)
+    @performance_monitor
+    def get_recommendations_batch(
+        seed_ids: List[str],
+        max_depth: int = 2,
+        max_results: int = 10,
+        mode: str = "bfs",
+        iterations: int = PPR_ITERATIONS,
+        max_feature_degree: int = MAX_FEATURE_DEGREE,
+    ) -> Dict[str, List[Book]]:
+        """
+        Recommendations for many seeds in one pass: the index, the visited
+        stamps and the final Book fetch are shared by every seed.
+        Seeds that are not in the catalog map to an empty list.
+        """
+        seed_ids = list(dict.fromkeys(seed_ids))
+        ids = GraphRecommender._recommend_ids(
+            seed_ids, max_depth, max_results, mode, iterations, max_feature_degree
+        )
+        return dict(zip(seed_ids, GraphRecommender._fetch_books(ids)))
+
+    @staticmethod
+    @input_validator(validate_positive_int)
+    @performance_monitor
+    def get_recommendations_batch_parallel(
+        seed_ids: List[str],
+        processes: Optional[int] = None,
+        chunk_size: int = 256,
+        **params,
+    ) -> Dict[str, List[Book]]:
+        """
+        get_recommendations_batch spread over a process pool in chunks of
+        chunk_size seeds. Forked workers inherit this process's index; others
+        map the saved index (or build one) once in their initializer.
+        """
+        seed_ids = list(dict.fromkeys(seed_ids))
+        get_graph_index()
+        chunks = imap_chunks(
+            seed_ids, params, recommend_chunk, init_worker, processes, chunk_size
+        )
+        ids = [rec for _, results in chunks for rec in results]
+        return dict(zip(seed_ids, GraphRecommender._fetch_books(ids)))
+
+    @staticmethod
+    def params(
+        max_depth: int = 2,
+        max_results: int = 10,
+        mode: str = "bfs",
+        iterations: int = PPR_ITERATIONS,
+        max_feature_degree: int = MAX_FEATURE_DEGREE,
+    ) -> Dict[str, object]:
+        """Every recommendation parameter, as stored with precomputed results."""
+        return {
+            "max_depth": max_depth,
+            "max_results": max_results,
+            "mode": mode,
+            "iterations": iterations,
+            "max_feature_degree": max_feature_degree,
+        }
+
+    @staticmethod
+    def _recommend_ids(
+        seed_ids: List[str],
+        max_depth: int = 2,
+        max_results: int = 10,
+        mode: str = "bfs",
+        iterations: int = PPR_ITERATIONS,
+        max_feature_degree: int = MAX_FEATURE_DEGREE,
+    ) -> List[List[str]]:
+        """Recommended book ids per seed, without touching Book instances."""
+        if mode not in GRAPH_MODES:
+            raise ValueError(f"Unknown recommendation mode: {mode}")
+
+        index = get_graph_index()
+        rows = np.array([index.book_index(seed) for seed in seed_ids], dtype=np.int64)
+        missing = [seed for seed, row in zip(seed_ids, rows) if row < 0]
+        if missing:
+            # Patch in seeds added elsewhere with one query; the rest are unknown
+            fields = ("id", "authors", "categories", "ratingsCount")
+            for row in Book.objects.filter(id__in=missing).values_list(*fields):
+                index.upsert(*row)
+            rows = np.array([index.book_index(seed) for seed in seed_ids])
+
+        results = [[] for _ in seed_ids]
+        known = np.flatnonzero(rows >= 0)
+        recommended = GraphRecommender._recommend_rows(
+            index,
+            rows[known],
+            max_depth,
+            max_results,
+            mode,
+            iterations,
+            max_feature_degree,
+        )
+        for position, found in zip(known, recommended):
+            results[position] = index.to_book_ids(found)
+        return results
+
+    @staticmethod
+    def _recommend_rows(
+        index,
+        seeds: np.ndarray,
+        max_depth: int,
+        max_results: int,
+        mode: str,
+        iterations: int,
+        max_feature_degree: int,
+    ) -> List[np.ndarray]:
+        """Recommended rows per seed row, best first."""
+        results = []
+        if mode == "ppr":
+            for i in range(0, len(seeds), PPR_BLOCK):
+                block = seeds[i : i + PPR_BLOCK]
+                scores = index.personalized_pagerank_many(
+                    block, alpha=PPR_ALPHA, iterations=iterations
+                )
+                for column, seed in enumerate(block):
+                    column_scores = scores[:, column]
+                    column_scores[seed] = 0
+                    results.append(top_rows(column_scores, max_results))
+            return results
+
+        # One stamp array for every seed: row r is visited by seed i
+        # when stamps[r] == i + 1, so nothing is reallocated per seed.
+        stamps = np.zeros(index.n_rows, dtype=np.int32)
+        for stamp, seed in enumerate(seeds, start=1):
+            results.append(
+                GraphRecommender._bfs(
+                    index,
+                    seed,
+                    stamps,
+                    stamp,
+                    max_depth,
+                    max_results,
+                    max_feature_degree,
+                )
+            )
+        return results
+
+    @staticmethod
+    def _bfs(
+        index,
+        start: int,
+        stamps: np.ndarray,
+        stamp: int,
+        max_depth: int,
+        max_results: int,
+        max_feature_degree: int,
+    ) -> np.ndarray:
+        # Level-synchronous BFS over int ids: one CSR expansion per depth
+        stamps[start] = stamp
+        frontier = np.array([start])
+        found, found_scores = [], []
+        n_found = 0
+        max_candidates = max(max_results, MAX_CANDIDATES)
+
+        for _ in range(max_depth):
+            if not len(frontier) or n_found >= max_candidates:
+                break
+            next_frontier = index.expand(frontier, max_feature_degree)
+            next_frontier = next_frontier[stamps[next_frontier] != stamp]
+            stamps[next_frontier] = stamp
+            # expand() returns rows in id order, so the whole level is scored
+            # before the cap keeps its best; kept rows stay in BFS order
+            scores = GraphRecommender._overlap(index, start, next_frontier)
+            kept = np.sort(top_positions(scores, max_candidates - n_found))
+            found.append(next_frontier[kept])
+            found_scores.append(scores[kept])
+            n_found += len(kept)
+            frontier = next_frontier
+
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        candidates = np.concatenate(found)
+        scores = np.concatenate(found_scores)
+        return candidates[top_positions(scores, max_results)]
+
+    @staticmethod
+    def _overlap(index, start: int, rows: np.ndarray) -> np.ndarray:
+        """Features shared with the seed, plus their Jaccard to break ties."""
+        shared, degree = index.shared_features(start, rows)
+        union = len(index.features_of(start)) + degree - shared
+        return shared + shared / np.maximum(union, 1)
+
+    @staticmethod
+    def _fetch_books(ids: List[List[str]]) -> List[List[Book]]:
+        """Book instances for every id list, preserving order, in one fetch."""
+        id_to_book = Book.objects.in_bulk({rid for rec in ids for rid in rec})
+        return [[id_to_book[rid] for rid in rec if rid in id_to_book] for rec in ids]
@@ -1,10 +1,96 @@
+import os
+import threading
+from bisect import bisect_right
+from collections import defaultdict
+from collections.abc import Sequence
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+
 from business_logic.aspects import (
     input_validator,
     method_logger,
     performance_monitor,
     simple_cache,
     validate_non_empty_string,
+    validate_positive_int,
 )
+from business_logic.catalog_sync import CatalogFollower
+from business_logic.csr import save_dir, top_rows
+from business_logic.sstable import SSTable
+from data_access.models import Book, CatalogVersion
+
+# Pending edits a TrigramIndex scans linearly before it rebuilds its postings
+REBUILD_THRESHOLD = 1024
+# Candidates few enough to verify directly instead of intersecting further
+VERIFY_THRESHOLD = 64
+# Fuzzy search: keys re-ranked by edit distance after trigram overlap
+FUZZY_CANDIDATES = 300
+# Separates the title from the authors inside a catalog key, so a query
+# never matches across the two; stripped from queries
+KEY_SEPARATOR = "\x00"
+
+
+def _default_key(book):
+    return (book.title or "") + (book.authors or "")
+
+
+def _catalog_key(book):
+    return ((book.title or "") + KEY_SEPARATOR + (book.authors or "")).lower()
+
+
+def _default_id(book):
+    return book.id
+
+
+def trigrams(text):
+    """Distinct 3-character substrings of text, none spanning KEY_SEPARATOR."""
+    return {
+        part[i : i + 3]
+        for part in text.split(KEY_SEPARATOR)
+        for i in range(len(part) - 2)
+    }
+
+
+def _normalize_query(query):
+    return query.lower().replace(KEY_SEPARATOR, "")
+
+
+def substring_distance(pattern, text):
+    """
+    Fewest edits turning pattern into some substring of text.
+    Myers' bit-vector algorithm: one pass over text with the DP column
+    packed into ints, O(len(text)) word operations for short patterns.
+    """
+    m = len(pattern)
+    if not m:
+        return 0
+    peq = {}
+    for i, char in enumerate(pattern):
+        peq[char] = peq.get(char, 0) | (1 << i)
+    mask = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv, mv = mask, 0
+    score = best = m
+    for char in text:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        # No carry into row 0: a match may start anywhere in text
+        ph = (ph << 1) & mask
+        mh = (mh << 1) & mask
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv
+        if score < best:
+            best = score
+    return best
 
 
 class BSTNode:
@@ -13,15 +99,60 @@ class BSTNode:
         self.book = book
         self.left = None
         self.right = None
+        self.height = 1
+
+
+def _height(node):
+    return node.height if node is not None else 0
+
+
+def _update_height(node):
+    node.height = 1 + max(_height(node.left), _height(node.right))
+
+
+def _rotate_left(node):
+    pivot = node.right
+    node.right = pivot.left
+    pivot.left = node
+    _update_height(node)
+    _update_height(pivot)
+    return pivot
+
+
+def _rotate_right(node):
+    pivot = node.left
+    node.left = pivot.right
+    pivot.right = node
+    _update_height(node)
+    _update_height(pivot)
+    return pivot
+
+
+def _rebalance(node):
+    """AVL fix-up for one node; returns the subtree's new root."""
+    _update_height(node)
+    balance = _height(node.left) - _height(node.right)
+    if balance > 1:
+        if _height(node.left.left) < _height(node.left.right):
+            node.left = _rotate_left(node.left)
+        return _rotate_right(node)
+    if balance < -1:
+        if _height(node.right.right) < _height(node.right.left):
+            node.right = _rotate_right(node.right)
+        return _rotate_left(node)
+    return node
 
 
 class BST:
-    def __init__(self, key_func=None):
+    def __init__(self, key_func=None, balanced=False):
         # Use a default key function if none is provided
         if key_func is None:
-            self.key_func = lambda b: (b.title or "") + (b.authors or "")
+            self.key_func = _default_key
         else:
             self.key_func = key_func
+        # balanced=True keeps the tree AVL-balanced, so sorted input still
+        # builds in O(n log n) instead of degrading to a linked list
+        self.balanced = balanced
         self.root = None
 
     def build(self, books):
@@ -32,33 +163,84 @@ class BST:
 
     def insert(self, book):
         key = self.key_func(book)
-        self.root = self._insert(self.root, key, book)
-
-    def _insert(self, node, key, book):
-        if node is None:
-            return BSTNode(key, book)
-        if key < node.key:
-            node.left = self._insert(node.left, key, book)
-        elif key > node.key:
-            node.right = self._insert(node.right, key, book)
+        new_node = BSTNode(key, book)
+        if self.root is None:
+            self.root = new_node
+            return
+
+        # Duplicate keys: store in right subtree for simplicity
+        path = []
+        node = self.root
+        while node is not None:
+            path.append(node)
+            node = node.left if key < node.key else node.right
+        if key < path[-1].key:
+            path[-1].left = new_node
         else:
-            # Duplicate keys: store in right subtree for simplicity
-            node.right = self._insert(node.right, key, book)
-        return node
+            path[-1].right = new_node
+
+        if not self.balanced:
+            return
+        # Walk back up until a subtree's height stops changing
+        for depth in range(len(path) - 1, -1, -1):
+            node = path[depth]
+            old_height = node.height
+            subtree = _rebalance(node)
+            if depth == 0:
+                self.root = subtree
+            elif path[depth - 1].left is node:
+                path[depth - 1].left = subtree
+            else:
+                path[depth - 1].right = subtree
+            if subtree.height == old_height:
+                break
 
-    def search(self, query):
+    def search(self, query, limit=None):
         """Case-insensitive search for books whose key contains the query as substring."""
-        results = []
-        self._search(self.root, query.lower(), results)
-        return results
+        matches = self._matches(self.root, _normalize_query(query))
+        return [node.book for node in islice(matches, limit)]
+
+    def search_page(self, query, limit, cursor=None):
+        """
+        Up to limit matches in key order with a key after cursor, plus any
+        sharing the last one's key, so a page never splits a key. Returns
+        them with the cursor for the next page: the last key returned, or
+        None once no match follows.
+        """
+        page = []
+        for node in self._matches(self.root, _normalize_query(query), cursor):
+            if len(page) >= limit and node.key != page[-1].key:
+                return [match.book for match in page], page[-1].key
+            page.append(node)
+        return [match.book for match in page], None
 
     def _search(self, node, query, results):
-        if node is None:
-            return
-        if query in str(node.key).lower():
-            results.append(node.book)
-        self._search(node.left, query, results)
-        self._search(node.right, query, results)
+        results.extend(match.book for match in self._matches(node, query))
+
+    @staticmethod
+    def _matches(node, query, after=None):
+        """
+        In-order generator of matching nodes under node with a key greater
+        than after. Explicit stack: memory is O(height) and deep trees cannot
+        hit the recursion limit.
+        """
+        stack = []
+        # Seed the stack with the path to the first key > after
+        while node is not None:
+            if after is not None and node.key <= after:
+                node = node.right
+            else:
+                stack.append(node)
+                node = node.left
+
+        while stack:
+            node = stack.pop()
+            if query in str(node.key).lower():
+                yield node
+            node = node.right
+            while node is not None:
+                stack.append(node)
+                node = node.left
 
     @classmethod
     @input_validator(validate_non_empty_string)
@@ -66,7 +248,360 @@ class BST:
     @performance_monitor
     @simple_cache(600)
     def search_in_books(cls, books, query):
-        """Builds a BST from books and searches for the query."""
-        bst = cls()
+        """
+        Builds a balanced BST from books and searches for the query. The
+        tree yields matches in key order; they are returned in the order
+        books were given.
+        """
+        bst = cls(balanced=True)
+        bst.build(books)
+        position = {id(book): i for i, book in enumerate(books)}
+        return sorted(bst.search(query), key=lambda book: position[id(book)])
+
+    @classmethod
+    @input_validator(validate_non_empty_string, validate_positive_int)
+    @method_logger
+    @performance_monitor
+    def search_page_in_books(cls, books, query, limit, cursor=None):
+        """
+        One page of BST.search_page over books keyed like the catalog index
+        (lowercased title and authors), so its cursor resumes search_catalog.
+        """
+        bst = cls(key_func=_catalog_key, balanced=True)
         bst.build(books)
-        return bst.search(query)
+        return bst.search_page(query, limit, cursor)
+
+
+class TrigramIndex:
+    """
+    Case-insensitive substring index over item keys.
+    Each trigram maps to the sorted key-order rows containing it; a query
+    intersects the postings of its trigrams and verifies only the survivors,
+    so selective queries never touch most keys.
+    """
+
+    def __init__(self, key_func=None, id_func=None):
+        self.key_func = _default_key if key_func is None else key_func
+        self.id_func = _default_id if id_func is None else id_func
+        # (keys, items, postings) in one tuple so a rebuild swaps atomically
+        self._data = ([], [], {})
+        # Edits since the last build: ids hidden from the postings, and
+        # added/changed items that are scanned on every query
+        self._removed = set()
+        self._pending = {}
+        self._lock = threading.Lock()
+        # Catalog version of the tables a loaded index maps, else None
+        self.version = None
+
+    def build(self, items):
+        """Indexes items, ordered by their lowercased key."""
+        entries = sorted(
+            ((str(self.key_func(item)).lower(), item) for item in items),
+            key=lambda entry: entry[0],
+        )
+        postings = defaultdict(list)
+        for row, (key, _) in enumerate(entries):
+            for gram in trigrams(key):
+                postings[gram].append(row)
+        postings = {
+            gram: np.array(rows, dtype=np.int32) for gram, rows in postings.items()
+        }
+        self._data = (
+            [key for key, _ in entries],
+            [item for _, item in entries],
+            postings,
+        )
+        # Cleared after _data is swapped; readers load them first
+        self._removed = set()
+        self._pending = {}
+
+    def save(self, path, version, encode):
+        """
+        Replaces the directory path with two sorted string tables: keys
+        with encode(item) bytes, and trigrams with their int32 posting rows.
+        Both are swapped in together, so loaders never pair tables of
+        different builds.
+        """
+        if self._removed or self._pending:
+            raise ValueError("Only a freshly built index can be saved")
+        keys, items, postings = self._data
+
+        def write(staging):
+            SSTable.write(
+                os.path.join(staging, "keys.sst"),
+                ((key, encode(item)) for key, item in zip(keys, items)),
+                version,
+            )
+            SSTable.write(
+                os.path.join(staging, "trigrams.sst"),
+                (
+                    (gram, postings[gram].astype("<i4").tobytes())
+                    for gram in sorted(postings)
+                ),
+                version,
+            )
+
+        save_dir(path, write)
+        self.version = version
+
+    @classmethod
+    def load(cls, path, decode, key_func=None, id_func=None):
+        """
+        Maps an index written by save. Nothing is deserialized up front:
+        keys, items and postings are read from the mapped files on access.
+        """
+        keys = SSTable.open(os.path.join(path, "keys.sst"))
+        grams = SSTable.open(os.path.join(path, "trigrams.sst"))
+        if keys.version != grams.version:
+            raise ValueError(f"Mismatched index tables in {path}")
+        index = cls(key_func, id_func)
+        index._data = (keys.keys, _DecodedColumn(keys.values, decode), _Postings(grams))
+        index.version = keys.version
+        return index
+
+    def add(self, item):
+        """Adds or replaces one item without rebuilding the postings."""
+        self.apply([item], ())
+
+    def discard(self, item_id):
+        """Drops the item with item_id, if present."""
+        self.apply((), [item_id])
+
+    def apply(self, items, removed_ids):
+        """
+        Adds or replaces items and drops removed_ids as pending edits, the
+        postings rebuilt at most once however many there are.
+        """
+        with self._lock:
+            pending = dict(self._pending)
+            removed = set(self._removed)
+            for item in items:
+                item_id = self.id_func(item)
+                pending[item_id] = (str(self.key_func(item)).lower(), item)
+                removed.add(item_id)
+            for item_id in removed_ids:
+                pending.pop(item_id, None)
+                removed.add(item_id)
+            self._removed = removed
+            self._pending = pending
+            if len(pending) > REBUILD_THRESHOLD:
+                self._rebuild()
+
+    def _rebuild(self):
+        removed = self._removed
+        items = [item for item in self._data[1] if self.id_func(item) not in removed]
+        items.extend(item for _, item in self._pending.values())
+        self.build(items)
+
+    def search(self, query, limit=None, after=None):
+        """
+        Items whose key contains query, case-insensitively, in key order.
+        With after, only keys greater than it; with limit, only the items
+        of the first limit matching keys, found without verifying the rest.
+        """
+        query = _normalize_query(query)
+        removed, pending = self._removed, self._pending
+        keys, items, postings = self._data
+        start = 0 if after is None else bisect_right(keys, after)
+
+        grams = sorted((postings.get(gram, ()) for gram in trigrams(query)), key=len)
+        if not grams:
+            # Shorter than a trigram: every key is a candidate
+            rows = range(start, len(keys))
+        else:
+            rows = grams[0]
+            rows = rows[np.searchsorted(rows, start) :] if start else rows
+            for other in grams[1:]:
+                if len(rows) <= VERIFY_THRESHOLD:
+                    break
+                rows = np.intersect1d(rows, other, assume_unique=True)
+            rows = rows.tolist() if isinstance(rows, np.ndarray) else rows
+
+        matches = []
+        distinct = 0
+        for row in rows:
+            key = keys[row]
+            if query not in key or self.id_func(items[row]) in removed:
+                continue
+            if not matches or key != matches[-1][0]:
+                if distinct == limit:
+                    break
+                distinct += 1
+            matches.append((key, items[row]))
+        if pending:
+            matches.extend(
+                entry
+                for entry in pending.values()
+                if query in entry[0] and (after is None or entry[0] > after)
+            )
+            matches.sort(key=lambda entry: entry[0])
+            if limit is not None:
+                matches = _first_keys(matches, limit)
+        return [item for _, item in matches]
+
+    def fuzzy_search(self, query, max_distance=None, candidates=FUZZY_CANDIDATES):
+        """
+        Items whose key contains query within max_distance edits (default:
+        one per four characters), closest first. Trigram overlap counts pick
+        the `candidates` most promising keys; only those get the edit check.
+        """
+        query = _normalize_query(query)
+        grams = trigrams(query)
+        if not grams:
+            return self.search(query)
+        if max_distance is None:
+            max_distance = max(1, len(query) // 4)
+        removed, pending = self._removed, self._pending
+        keys, items, postings = self._data
+
+        scored = []
+        hits = [postings.get(gram, ()) for gram in grams]
+        hits = [rows for rows in hits if len(rows)]
+        if hits:
+            counts = np.bincount(np.concatenate(hits), minlength=len(keys))
+            for row in top_rows(counts, candidates).tolist():
+                if self.id_func(items[row]) not in removed:
+                    scored.append((keys[row], items[row], int(counts[row])))
+        for key, item in pending.values():
+            overlap = len(grams & trigrams(key))
+            if overlap:
+                scored.append((key, item, overlap))
+
+        matches = []
+        for key, item, overlap in scored:
+            # Per field: edits never bridge the title/authors separator
+            distance = min(
+                substring_distance(query, part) for part in key.split(KEY_SEPARATOR)
+            )
+            if distance <= max_distance:
+                matches.append((distance, -overlap, key, item))
+        matches.sort(key=lambda match: match[:3])
+        return [match[3] for match in matches]
+
+
+def _first_keys(entries, limit):
+    """Leading (key, item) entries of a key-sorted list spanning limit keys."""
+    distinct = 0
+    for position, (key, _) in enumerate(entries):
+        if not position or key != entries[position - 1][0]:
+            if distinct == limit:
+                return entries[:position]
+            distinct += 1
+    return entries
+
+
+class _DecodedColumn(Sequence):
+    """Items of a mapped table, decoded on access."""
+
+    def __init__(self, column, decode):
+        self._column = column
+        self._decode = decode
+
+    def __len__(self):
+        return len(self._column)
+
+    def __getitem__(self, index):
+        return self._decode(self._column[index])
+
+
+class _Postings:
+    """Trigram postings of a mapped table, viewed in place."""
+
+    def __init__(self, table):
+        self._table = table
+
+    def __len__(self):
+        return len(self._table)
+
+    def get(self, gram, default=None):
+        position = self._table.find(gram)
+        if position < 0:
+            return default
+        return self._table.values.array(position, "<i4")
+
+
+def _row_key(row):
+    return (row[1] or "") + KEY_SEPARATOR + (row[2] or "")
+
+
+# Field separator of an encoded (id, title, authors) row
+_ROW_SEPARATOR = "\x1f"
+
+
+def _encode_row(row):
+    return _ROW_SEPARATOR.join(field or "" for field in row).encode("utf-8")
+
+
+def _decode_row(value):
+    return tuple(field or None for field in value.decode("utf-8").split(_ROW_SEPARATOR))
+
+
+def _row_id(row):
+    return row[0]
+
+
+def build_catalog_index():
+    """Fresh TrigramIndex over (id, title, authors) rows of every book."""
+    index = TrigramIndex(key_func=_row_key, id_func=_row_id)
+    rows = Book.objects.values_list("id", "title", "authors")
+    index.build(rows.iterator(chunk_size=2000))
+    return index
+
+
+def save_catalog_index(path=None):
+    """Builds the catalog index and writes it, tagged with the CatalogVersion."""
+    path = str(path or settings.SEARCH_INDEX_PATH)
+    index = build_catalog_index()
+    index.save(path, CatalogVersion.current(), _encode_row)
+    return index
+
+
+def _load_saved_catalog_index():
+    path = getattr(settings, "SEARCH_INDEX_PATH", None)
+    if path and os.path.exists(os.path.join(path, "keys.sst")):
+        try:
+            index = TrigramIndex.load(str(path), _decode_row, _row_key, _row_id)
+        except ValueError:
+            # Opened across a save's directory swap, or damaged: rebuild
+            return None
+        keys = index._data[0]
+        # Tables written before keys had a separator are rebuilt instead
+        if not len(keys) or KEY_SEPARATOR in keys[0]:
+            return index, index.version
+    return None
+
+
+def _apply_changes(index, rows, removed):
+    index.apply([row[:3] for row in rows], removed)
+
+
+_catalog_index = CatalogFollower(
+    build_catalog_index, _apply_changes, _load_saved_catalog_index
+)
+
+
+def get_catalog_index():
+    """
+    Process-wide TrigramIndex over (id, title, authors) rows of every book,
+    mapped from the saved tables when they exist, and patched with books
+    changed by any process since (see catalog_sync).
+    """
+    return _catalog_index.get()
+
+
+def search_catalog(query, limit=None, after=None):
+    """
+    Ids of books whose title or authors contain query, in key order.
+    limit and after page through them as in TrigramIndex.search.
+    """
+    return [row[0] for row in get_catalog_index().search(query, limit, after)]
+
+
+def fuzzy_search_catalog(query):
+    """Ids of books whose title or authors nearly contain query, best first."""
+    return [row[0] for row in get_catalog_index().fuzzy_search(query)]
+
+
+def reset_catalog_index():
+    """Drops the process-wide index; the next search reloads it."""
+    _catalog_index.reset()
@@ -0,0 +1,140 @@
+"""
+Keeps process-wide catalog indexes in step with the Book table.
+
+Every catalog write bumps CatalogVersion and logs the changed book ids as
+CatalogChange rows in the same transaction. A CatalogFollower compares the
+version of the index it holds with CatalogVersion at most every
+REFRESH_INTERVAL seconds; when it has moved, only the logged books are
+re-read and patched in, whichever process wrote them. A full build happens
+on first use only, when no saved copy can be caught up instead.
+"""
+
+import threading
+import time
+from typing import Callable, Iterable, Iterator, List, Optional, Set, Tuple
+
+from data_access.models import Book, CatalogChange, CatalogVersion
+
+# Seconds between a follower's checks of CatalogVersion
+REFRESH_INTERVAL = 5.0
+# Columns of the changed books handed to a follower's apply
+BOOK_FIELDS = ("id", "title", "authors", "categories", "ratingsCount")
+
+_followers: List["CatalogFollower"] = []
+
+
+def changed_book_ids(since: int, until: int) -> Optional[Set[str]]:
+    """
+    Ids of books changed at versions since < v <= until, or None when the
+    log misses one of those versions and they cannot be replayed.
+    """
+    changes = CatalogChange.objects.filter(version__gt=since, version__lte=until)
+    versions, book_ids = set(), set()
+    for version, book_id in changes.values_list("version", "book_id").iterator(
+        chunk_size=2000
+    ):
+        versions.add(version)
+        book_ids.add(book_id)
+    if len(versions) != until - since:
+        return None
+    return book_ids
+
+
+def book_rows(book_ids: Iterable[str], chunk_size: int = 2000) -> Iterator[tuple]:
+    """BOOK_FIELDS rows of the given books still in the catalog."""
+    book_ids = list(book_ids)
+    for i in range(0, len(book_ids), chunk_size):
+        rows = Book.objects.filter(id__in=book_ids[i : i + chunk_size])
+        yield from rows.values_list(*BOOK_FIELDS)
+
+
+class CatalogFollower:
+    """
+    One process-wide index kept current by replaying the change log.
+
+    build() returns a fresh index of the whole catalog; load(), if given, a
+    saved (index, version) pair or None; apply(index, rows, removed) patches
+    BOOK_FIELDS rows and removed book ids into an index.
+    """
+
+    def __init__(
+        self,
+        build: Callable[[], object],
+        apply: Callable[[object, List[tuple], Set[str]], None],
+        load: Optional[Callable[[], Optional[Tuple[object, int]]]] = None,
+    ):
+        self._build = build
+        self._apply = apply
+        self._load = load
+        self._index = None
+        self._version = 0
+        self._checked_at = 0.0
+        # Bumped whenever the index changes; cache keys embed it
+        self.generation = 0
+        self._lock = threading.Lock()
+        _followers.append(self)
+
+    @property
+    def loaded(self):
+        """The index if one is loaded, without loading or refreshing it."""
+        return self._index
+
+    def get(self):
+        """The index, loaded on first use and caught up once the catalog moved."""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index, self._version = self._load_or_build()
+                    self._checked_at = time.monotonic()
+                    self.generation += 1
+        elif time.monotonic() - self._checked_at >= REFRESH_INTERVAL:
+            self._checked_at = time.monotonic()
+            if CatalogVersion.current() > self._version:
+                self.refresh()
+        return self._index
+
+    def refresh(self) -> None:
+        """Patches in every book changed since the loaded index's version."""
+        with self._lock:
+            if self._index is None:
+                return
+            version = CatalogVersion.current()
+            if version <= self._version:
+                return
+            book_ids = changed_book_ids(self._version, version)
+            if book_ids is None:
+                # Only when log rows were deleted by hand; load afresh
+                self._index, version = self._load_or_build()
+            else:
+                self._replay(self._index, book_ids)
+            self._version = version
+            self.generation += 1
+
+    def reset(self) -> None:
+        """Drops the index; the next lookup loads it again."""
+        with self._lock:
+            self._index = None
+            self.generation += 1
+
+    def _replay(self, index, book_ids: Set[str]) -> None:
+        rows = list(book_rows(book_ids))
+        self._apply(index, rows, book_ids.difference(row[0] for row in rows))
+
+    def _load_or_build(self) -> Tuple[object, int]:
+        """A saved index caught up from the log if possible, else a new build."""
+        # Read first: a book changed mid-build is replayed again, harmlessly
+        version = CatalogVersion.current()
+        saved = self._load() if self._load is not None else None
+        if saved is not None and 0 <= saved[1] <= version:
+            index, saved_version = saved
+            book_ids = changed_book_ids(saved_version, version)
+            if book_ids is not None:
+                self._replay(index, book_ids)
+                return index, version
+        return self._build(), version
+
+
+def refresh_catalog_indexes() -> None:
+    """Catches every loaded index up with the catalog, unthrottled."""
+    for follower in _followers:
+        follower.refresh()
@@ -1,5 +1,7 @@
+from typing import Dict, List, Tuple
+
 import numpy as np
-import pandas as pd
+from django.db.models import Avg, Count
 
 from business_logic.aspects import (
     error_handler,
@@ -8,7 +10,41 @@ from business_logic.aspects import (
     simple_cache,
     validate_positive_int,
 )
-from data_access.models import Book, Review
+from business_logic.coreview import get_coreview_index
+from business_logic.csr import top_rows
+from business_logic.graph_index import book_features, get_graph_index
+from business_logic.profiles import UserProfiles, get_user_profiles, review_version
+from data_access.models import Book, PrecomputedUserRecommendation
+
+# Columns the recommendation cards render; description et al. stay deferred
+CARD_FIELDS = ("id", "title", "authors", "image")
+# "reviewed" ranks the user's own reviewed books; "catalog" scores every book
+CBF_MODES = ("reviewed", "catalog")
+# Mode of the endpoint, the API and precompute_user_recommendations alike, so
+# stored rows match default requests
+DEFAULT_CBF_MODE = "reviewed"
+# Users scored together in catalog mode; bounds the users x books score block
+USER_BLOCK = 64
+
+
+def _genre_weights(
+    profiles: UserProfiles, interest: np.ndarray, index
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Interest spread over the graph index's category features: each profile
+    category string is split into its genres, which sum their weights.
+    """
+    by_genre: Dict[str, float] = {}
+    codes = np.flatnonzero(interest)
+    for code, weight in zip(codes.tolist(), interest[codes].tolist()):
+        for feature in book_features(None, profiles.categories[code]):
+            by_genre[feature] = by_genre.get(feature, 0.0) + weight
+    # Few distinct genres: one index lookup each
+    rows = [index.feature_index(feature) for feature in by_genre]
+    weights = np.fromiter(by_genre.values(), dtype=np.float64, count=len(by_genre))
+    features = np.array(rows, dtype=np.int64)
+    found = features >= 0
+    return features[found], weights[found]
 
 
 class BookRecommender:
@@ -18,128 +54,171 @@ class BookRecommender:
     @performance_monitor
     @simple_cache(600)
     def get_cbf_list(book_id, n_recommendations=10):
-        book = Book.objects.filter(pk=book_id).first()
-        review = book.reviews.first() if book else None
-        if not review:
-            return []
-        return BookRecommender._get_cbf_list(review.user_id, n_recommendations)
+        """
+        Books most often reviewed by the same users as book_id: a row read
+        from the item-item co-review model, independent of review order.
+        """
+        similar = get_coreview_index().similar(book_id, n_recommendations)
+        return BookRecommender._fetch_books([book for book, _ in similar])
 
     @staticmethod
-    def _get_cbf_list(userid, n_recommendations=10):
-        # Build a DataFrame merging user reviews with their books
-        user_reviews = Review.objects.filter(user_id=userid).select_related("book")
-        if not user_reviews:
-            return []
-
-        records = []
-        for rev in user_reviews:
-            b = rev.book
-            records.append(
-                {
-                    "Id": b.id,
-                    "Title": b.title,
-                    "User_id": rev.user_id,
-                    "review/score": rev.review_score or 0.0,
-                    "description": b.description,
-                    "authors": b.authors,
-                    "image": b.image,
-                    "publisher": b.publisher,
-                    "publishedDate": b.publishedDate,
-                    "categories": b.categories or "",
-                    "ratingsCount": b.ratingsCount,
-                }
-            )
+    @error_handler([])
+    @input_validator(validate_positive_int)
+    @performance_monitor
+    @simple_cache(600, version=review_version, version_arg="user_id")
+    def get_user_cbf_list(user_id, n_recommendations=10, mode=DEFAULT_CBF_MODE):
+        """
+        Content-based recommendations for one user from their genre profile.
+        mode="catalog" scores every book against the user's genre interest
+        and leaves out the books they already reviewed.
+        Results are cached until the user writes a review through any
+        process (see review_version), and rows stored by
+        precompute_user_recommendations for the same parameters are
+        returned without scoring.
+        """
+        if mode not in CBF_MODES:
+            raise ValueError(f"Unknown recommendation mode: {mode}")
+        stored = (
+            PrecomputedUserRecommendation.objects.filter(user_id=user_id)
+            .values_list("params", "recommended_ids")
+            .first()
+        )
+        if stored and stored[0] == BookRecommender.params(n_recommendations, mode):
+            return BookRecommender._fetch_books(stored[1])
+        if mode == "catalog":
+            return BookRecommender._get_catalog_cbf_list(user_id, n_recommendations)
+        return BookRecommender._get_cbf_list(user_id, n_recommendations)
 
-        merged_df = pd.DataFrame(records).set_index("User_id")
-
-        # deprecated. Used to pick a random user id from the dataframe
-        # rng = np.random.default_rng(None)
-        # indexRandom = rng.integers(low=0, high=len(merged_df.index), size=1)
-        # indexRandom = indexRandom[0]
-        # userid = merged_df.iloc[indexRandom]
-        # userid = userid.name
-
-        # Originally this was the user id string or the rng result
-        # userid = Review.user_id
-
-        user_categories = merged_df.loc[[userid], ["categories"]]
-        categories_len = len(user_categories["categories"].unique())
-
-        if categories_len == 1:
-            # Recommendation wont be effective for one genre
-            # rng = np.random.default_rng(None)
-            # index_random = rng.integers(low=0, high=len(merged_df.index), size=1)
-            # index_random = index_random[0]
-            # userid = merged_df.iloc[index_random]
-            # userid = userid.name
-            # user_categories = merged_df.loc[[userid],["categories"]]
-            # categories_len = len(user_categories["categories"].unique())
-            return []
+    @staticmethod
+    @input_validator(validate_positive_int)
+    @performance_monitor
+    def get_user_cbf_batch(
+        user_ids: List[str], n_recommendations: int = 10, mode: str = DEFAULT_CBF_MODE
+    ) -> Dict[str, List[Book]]:
+        """
+        get_user_cbf_list for many users in one pass: catalog scores are
+        computed USER_BLOCK users at a time as one users x genres by
+        genres x books product, and the Book fetch is shared.
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        ids = BookRecommender._user_cbf_ids(user_ids, n_recommendations, mode)
+        books = BookRecommender._fetch_books(
+            list(dict.fromkeys(book_id for row in ids for book_id in row))
+        )
+        book_map = {book.id: book for book in books}
+        return {
+            user_id: [book_map[book_id] for book_id in row if book_id in book_map]
+            for user_id, row in zip(user_ids, ids)
+        }
 
-        # inputUsrVctr is a list with the review score of the user
-        input_user_vector = merged_df.loc[[userid], ["review/score"]].to_numpy()
-        user_genre_matrix = merged_df.loc[[userid], ["categories"]]
+    @staticmethod
+    def params(
+        n_recommendations: int = 10, mode: str = DEFAULT_CBF_MODE
+    ) -> Dict[str, object]:
+        """Every recommendation parameter, as stored with precomputed results."""
+        return {"n_recommendations": n_recommendations, "mode": mode}
 
-        # Encode a feature into binary categorization
+    @staticmethod
+    def _user_cbf_ids(
+        user_ids: List[str], n_recommendations: int = 10, mode: str = DEFAULT_CBF_MODE
+    ) -> List[List[str]]:
+        """Recommended book ids per user, without touching Book instances."""
+        if mode not in CBF_MODES:
+            raise ValueError(f"Unknown recommendation mode: {mode}")
+        results = []
+        for i in range(0, len(user_ids), USER_BLOCK):
+            block = user_ids[i : i + USER_BLOCK]
+            if mode == "reviewed":
+                profiles = get_user_profiles(block)
+                results.extend(
+                    BookRecommender._reviewed_ids(profiles, user_id, n_recommendations)
+                    for user_id in block
+                )
+            else:
+                results.extend(BookRecommender._catalog_ids(block, n_recommendations))
+        return results
 
-        def encode_and_bind(original_dataframe, feature_to_encode):
-            dummies = pd.get_dummies(original_dataframe[[feature_to_encode]])
-            res = pd.concat([original_dataframe, dummies], axis=1)
-            res = res.drop([feature_to_encode], axis=1)
-            return res
+    @staticmethod
+    def _get_cbf_list(userid, n_recommendations=10):
+        profiles = get_user_profiles([userid])
+        return BookRecommender._fetch_books(
+            BookRecommender._reviewed_ids(profiles, userid, n_recommendations)
+        )
 
-        # encode genres of the user
-        user_genre_matrix = encode_and_bind(user_genre_matrix, "categories")
-        user_genre_matrix = user_genre_matrix.to_numpy(dtype=int)
+    @staticmethod
+    def _reviewed_ids(profiles, userid, n_recommendations=10):
+        # Row lookup: the user's normalized genre interest vector
+        interest = profiles.interest(userid)
+        if interest is None:
+            # No reviews, or one genre: recommendation wont be effective
+            return []
 
-        # weight the encode and normalize it into a weight vector
-        weighted_genre_matrix = np.multiply(input_user_vector, user_genre_matrix)
-        interest_genre_vector = weighted_genre_matrix.sum(axis=0)
-        interest_genre_vector = interest_genre_vector / np.linalg.norm(
-            interest_genre_vector
-        )
+        # Score the user's reviewed books: one-hot genres x interest
+        book_ids, titles, categories = profiles.reviews(userid)
+        scores = interest[categories]
 
-        # change pandas base index tobe the title
-        titleindex_df = merged_df.set_index("Title")
+        # First review of each title, then a stable sort by score
+        first = {}
+        for i, title in enumerate(titles):
+            first.setdefault(title, i)
+        first = np.fromiter(first.values(), dtype=np.int64, count=len(first))
+        ranked = first[np.argsort(-scores[first], kind="stable")][:n_recommendations]
+        return [book_ids[i] for i in ranked.tolist()]
 
-        # Candidate selection
-        booklist_match = titleindex_df["categories"].isin(
-            user_categories.loc[:, "categories"]
-        )
-        booklist_match = titleindex_df[booklist_match]
-        candidate_matrix = booklist_match
-
-        candidate_matrix = encode_and_bind(candidate_matrix, "categories")
-        candidate_matrix = candidate_matrix.drop(
-            [
-                "Id",
-                "review/score",
-                "description",
-                "authors",
-                "image",
-                "publisher",
-                "publishedDate",
-                "ratingsCount",
-            ],
-            axis=1,
+    @staticmethod
+    def _get_catalog_cbf_list(userid, n_recommendations=10):
+        return BookRecommender._fetch_books(
+            BookRecommender._catalog_ids([userid], n_recommendations)[0]
         )
 
-        # Result calculation
-        candidate_matrix = candidate_matrix.to_numpy(dtype=int)
-        weighted_candidate_genre_matrix = np.multiply(
-            interest_genre_vector, candidate_matrix
+    @staticmethod
+    def _catalog_ids(user_ids, n_recommendations=10):
+        """
+        Catalog-wide recommended ids for a block of users: their genre
+        interests as a users x genres matrix times the graph index's
+        genres x books CSR, minus each user's reviewed books.
+        """
+        profiles = get_user_profiles(user_ids)
+        index = get_graph_index()
+        columns: Dict[int, int] = {}
+        users = []
+        for position, user_id in enumerate(user_ids):
+            interest = profiles.interest(user_id)
+            if interest is None:
+                continue
+            features, weights = _genre_weights(profiles, interest, index)
+            slots = [columns.setdefault(f, len(columns)) for f in features.tolist()]
+            users.append((position, user_id, slots, weights))
+
+        matrix = np.zeros((len(users), len(columns)), dtype=np.float32)
+        for i, (_, _, slots, weights) in enumerate(users):
+            matrix[i, slots] = weights
+        scores = index.score_features_many(
+            np.fromiter(columns, dtype=np.int64, count=len(columns)), matrix
         )
-        weighted_vrg = weighted_candidate_genre_matrix.sum(axis=1)
 
-        booklist_match.insert(0, "result", weighted_vrg)
-        booklist_match = booklist_match[~booklist_match.index.duplicated(keep="first")]
-        booklist_match = booklist_match.sort_values(
-            by=["result"], ascending=False, kind="mergesort"
+        results = [[] for _ in user_ids]
+        for i, (position, user_id, _, _) in enumerate(users):
+            reviewed = index.book_indexes(profiles.reviews(user_id)[0])
+            scores[i, reviewed[reviewed >= 0]] = 0
+            rows = top_rows(scores[i], n_recommendations)
+            results[position] = index.to_book_ids(rows.tolist())
+        return results
+
+    @staticmethod
+    def _fetch_books(book_ids):
+        """
+        Ranked books in one query: only the card columns, with the review
+        count and average the template shows annotated rather than
+        queried per book.
+        """
+        books = (
+            Book.objects.filter(id__in=book_ids)
+            .only(*CARD_FIELDS)
+            .annotate(
+                review_count=Count("reviews"),
+                avg_rating=Avg("reviews__review_score"),
+            )
         )
-        # keep top‑n scores
-        result = booklist_match.result[:n_recommendations]
-        # convert book IDs → Book instances (preserving order)
-        book_ids = booklist_match.loc[result.index, "Id"].tolist()
-        books = list(Book.objects.filter(id__in=book_ids))
-        book_map = {b.id: b for b in books}
+        book_map = {book.id: book for book in books}
         return [book_map[book_id] for book_id in book_ids if book_id in book_map]
@@ -0,0 +1,29 @@
+"""
+Process-pool entry points for batched CBF recommendations.
+
+Kept free of model imports at module level so spawned workers can unpickle
+these functions before Django is set up; forked workers skip the setup and
+inherit the parent's profiles and graph index.
+"""
+
+
+def init_worker():
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+    from business_logic.graph_index import get_graph_index
+    from business_logic.profiles import get_user_profiles
+
+    get_user_profiles()
+    get_graph_index()
+
+
+def recommend_chunk(payload):
+    """Recommended ids for a (user_ids, params) chunk."""
+    from business_logic.cbf import BookRecommender
+
+    user_ids, params = payload
+    return BookRecommender._user_cbf_ids(user_ids, **params)
@@ -0,0 +1,234 @@
+"""
+Item-item co-review model behind the book page recommendations.
+
+Two books are related by how many users reviewed both. The book x book
+count matrix is never materialized: it is computed a block of rows at a
+time from the user<->book CSR pair, and only each row's TOP_K entries are
+kept, in fixed-size arrays. A recommendation is then an O(K) row read.
+
+The model is a snapshot: `manage.py build_coreview_index` saves it for
+workers to mmap, and new reviews show up once it is rebuilt.
+"""
+
+import os
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from business_logic.csr import (
+    find_key,
+    row_positions,
+    rows_to_indptr,
+    save_arrays,
+    segment_sum,
+    top_rows,
+)
+from data_access.models import Review
+
+# Arrays making up a saved model
+COREVIEW_ARRAYS = ("book_ids", "neighbors", "counts")
+# Co-reviewed books kept per book
+TOP_K = 20
+# Reviewers with more books than this are left out: their pairs grow
+# quadratically and say little about any one book
+MAX_USER_REVIEWS = 500
+# (book row, co-reviewed book) pairs expanded at once; a block of rows is cut
+# by its pair count, and a row over the cap alone is counted in user chunks
+MAX_PAIRS = 4_000_000
+
+
+def _csr(rows: np.ndarray, cols: np.ndarray, n_rows: int):
+    """CSR offsets/columns of (row, col) pairs, columns sorted within rows."""
+    order = np.lexsort((cols, rows))
+    return rows_to_indptr(rows, n_rows), cols[order].astype(np.int32)
+
+
+class CoReviewIndex:
+    """
+    Per-book top-K co-reviewed books. Rows follow the sorted UTF-8 book ids;
+    neighbors holds row numbers (-1 padding) and counts the number of users
+    who reviewed both, best first, ties broken by book id so the result
+    never depends on review order.
+    """
+
+    def __init__(self, book_ids: np.ndarray, neighbors: np.ndarray, counts: np.ndarray):
+        self.book_ids = book_ids
+        self.neighbors = neighbors
+        self.counts = counts
+
+    @classmethod
+    def from_rows(
+        cls, rows: Iterable[Tuple[Optional[str], str]], k: int = TOP_K
+    ) -> "CoReviewIndex":
+        """Model from (user_id, book_id) review rows, in any order."""
+        users, books = {}, {}
+        user_codes, book_codes = [], []
+        for user_id, book_id in rows:
+            if user_id is None:
+                continue
+            user_codes.append(users.setdefault(user_id, len(users)))
+            book_codes.append(books.setdefault(book_id, len(books)))
+
+        book_ids = np.array([book_id.encode("utf-8") for book_id in books], dtype=bytes)
+        order = np.argsort(book_ids, kind="stable")
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        book_ids = book_ids[order]
+        n_books, n_users = len(book_ids), len(users)
+
+        # One entry per (user, book), however often the user reviewed it
+        pairs = np.unique(
+            np.array(user_codes, dtype=np.int64) * max(n_books, 1)
+            + rank[np.array(book_codes, dtype=np.int64)]
+        )
+        pair_users, pair_books = pairs // max(n_books, 1), pairs % max(n_books, 1)
+        per_user = np.bincount(pair_users, minlength=n_users)
+        kept = (per_user[pair_users] >= 2) & (per_user[pair_users] <= MAX_USER_REVIEWS)
+        pair_users, pair_books = pair_users[kept], pair_books[kept]
+
+        user_indptr, user_books = _csr(pair_users, pair_books, n_users)
+        book_indptr, book_users = _csr(pair_books, pair_users, n_books)
+
+        neighbors = np.full((n_books, k), -1, dtype=np.int32)
+        counts = np.zeros((n_books, k), dtype=np.int32)
+        book_csr, user_csr = (book_indptr, book_users), (user_indptr, user_books)
+        # Pairs each book row expands into: every book of each of its reviewers
+        row_pairs = segment_sum(np.diff(user_indptr)[book_users], book_indptr)
+        ends = np.cumsum(row_pairs)
+        start = 0
+        while start < n_books:
+            # Next run of rows expanding into at most MAX_PAIRS pairs
+            done = ends[start - 1] if start else 0
+            stop = int(np.searchsorted(ends, done + MAX_PAIRS, side="right"))
+            stop = max(stop, start + 1)
+            if row_pairs[start] > MAX_PAIRS:
+                cls._fill_row(start, book_csr, user_csr, neighbors, counts)
+            else:
+                cls._fill_block(start, stop, book_csr, user_csr, neighbors, counts)
+            start = stop
+        return cls(book_ids, neighbors, counts)
+
+    @staticmethod
+    def _fill_block(start, stop, book_csr, user_csr, neighbors, counts) -> None:
+        """Top-K co-review counts of the book rows start:stop."""
+        book_indptr, book_users = book_csr
+        user_indptr, user_books = user_csr
+        n_books, k = len(book_indptr) - 1, neighbors.shape[1]
+
+        # Every (row, user) entry expands into that user's other books
+        entry_rows = np.repeat(
+            np.arange(start, stop), np.diff(book_indptr[start : stop + 1])
+        )
+        users = book_users[book_indptr[start] : book_indptr[stop]].astype(np.int64)
+        lengths = user_indptr[users + 1] - user_indptr[users]
+        pair_rows = np.repeat(entry_rows, lengths)
+        pair_books = user_books[row_positions(user_indptr, users)]
+        other = pair_books != pair_rows
+
+        cells, cell_counts = np.unique(
+            pair_rows[other] * n_books + pair_books[other], return_counts=True
+        )
+        rows, books = cells // n_books, cells % n_books
+        # Best count first within a row; equal counts in book id order
+        order = np.lexsort((books, -cell_counts, rows))
+        rows, books, cell_counts = rows[order], books[order], cell_counts[order]
+        rank = np.arange(len(rows)) - np.searchsorted(rows, rows, side="left")
+        top = rank < k
+        neighbors[rows[top], rank[top]] = books[top]
+        counts[rows[top], rank[top]] = cell_counts[top]
+
+    @staticmethod
+    def _fill_row(row, book_csr, user_csr, neighbors, counts) -> None:
+        """
+        Top-K co-review counts of one book row too popular for a block:
+        its reviewers' books are tallied MAX_PAIRS at a time into one dense
+        per-book count, ranked like a block (ties in book id order).
+        """
+        book_indptr, book_users = book_csr
+        user_indptr, user_books = user_csr
+        n_books, k = len(book_indptr) - 1, neighbors.shape[1]
+
+        users = book_users[book_indptr[row] : book_indptr[row + 1]].astype(np.int64)
+        ends = np.cumsum(user_indptr[users + 1] - user_indptr[users])
+        totals = np.zeros(n_books, dtype=np.int64)
+        start = 0
+        while start < len(users):
+            done = ends[start - 1] if start else 0
+            stop = int(np.searchsorted(ends, done + MAX_PAIRS, side="right"))
+            stop = max(stop, start + 1)
+            books = user_books[row_positions(user_indptr, users[start:stop])]
+            totals += np.bincount(books, minlength=n_books)
+            start = stop
+        totals[row] = 0
+        best = top_rows(totals, k)
+        neighbors[row, : len(best)] = best
+        counts[row, : len(best)] = totals[best]
+
+    @classmethod
+    def build(cls, k: int = TOP_K) -> "CoReviewIndex":
+        """Model over every review, streamed in one pass."""
+        rows = Review.objects.values_list("user_id", "book_id")
+        return cls.from_rows(rows.iterator(chunk_size=2000), k)
+
+    def save(self, path: str) -> None:
+        """Replaces the directory `path` with the arrays as raw .npy."""
+        save_arrays(path, {name: getattr(self, name) for name in COREVIEW_ARRAYS})
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "CoReviewIndex":
+        mode = "r" if mmap else None
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)
+            for name in COREVIEW_ARRAYS
+        }
+        return cls(**arrays)
+
+    def __len__(self) -> int:
+        return len(self.book_ids)
+
+    def __contains__(self, book_id: str) -> bool:
+        return find_key(self.book_ids, book_id) >= 0
+
+    def similar(self, book_id: str, n: int = TOP_K) -> List[Tuple[str, int]]:
+        """Up to n (book_id, co-review count) pairs for book_id, best first."""
+        row = find_key(self.book_ids, book_id)
+        if row < 0:
+            return []
+        neighbors = self.neighbors[row, :n]
+        counts = self.counts[row, :n]
+        kept = neighbors >= 0
+        book_ids = [self.book_ids[i].decode("utf-8") for i in neighbors[kept]]
+        return list(zip(book_ids, counts[kept].tolist()))
+
+
+_index: Optional[CoReviewIndex] = None
+_index_lock = threading.Lock()
+
+
+def _saved_index_path() -> Optional[str]:
+    path = getattr(settings, "COREVIEW_INDEX_PATH", None)
+    if path and os.path.exists(os.path.join(path, "book_ids.npy")):
+        return str(path)
+    return None
+
+
+def get_coreview_index() -> CoReviewIndex:
+    """Returns the process-wide model, loading or building it on first use."""
+    global _index
+    index = _index
+    if index is None:
+        with _index_lock:
+            if _index is None:
+                path = _saved_index_path()
+                _index = CoReviewIndex.load(path) if path else CoReviewIndex.build()
+            index = _index
+    return index
+
+
+def reset_coreview_index() -> None:
+    """Drops the process-wide model; the next lookup reloads it."""
+    global _index
+    with _index_lock:
+        _index = None
@@ -0,0 +1,126 @@
+"""
+NumPy helpers shared by the CSR-backed indexes: sorted-key lookups, row
+positions and segment sums without Python loops, top-k selection, and
+saving arrays (or any index directory) for workers to mmap.
+"""
+
+import os
+import shutil
+import tempfile
+from typing import Callable, Dict, Iterable, Optional
+
+import numpy as np
+
+
+def find_key(sorted_keys: np.ndarray, key: str) -> int:
+    """Position of key in a sorted bytes array, or -1. O(log n)"""
+    encoded = key.encode("utf-8")
+    pos = int(np.searchsorted(sorted_keys, encoded))
+    if pos < len(sorted_keys) and sorted_keys[pos] == encoded:
+        return pos
+    return -1
+
+
+def rows_to_indptr(rows: np.ndarray, n_rows: int) -> np.ndarray:
+    """CSR offsets of n_rows rows from the row number of every entry."""
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr
+
+
+def row_positions(
+    indptr: np.ndarray, rows: np.ndarray, limit: Optional[int] = None
+) -> np.ndarray:
+    """Positions of the CSR rows `rows` (first `limit` entries of each)."""
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    if limit is not None:
+        lengths = np.minimum(lengths, limit)
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.cumsum(lengths) - lengths
+    return np.arange(total) + np.repeat(starts - offsets, lengths)
+
+
+def top_positions(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of the k highest scores, best first, ties in position order.
+    argpartition finds the k-th score in O(n); only the winners get sorted.
+    """
+    picked = np.arange(len(scores))
+    if len(scores) > k:
+        kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)[: k - len(above)]
+        picked = np.concatenate([above, ties])
+    return picked[np.lexsort((picked, -scores[picked]))]
+
+
+def top_rows(scores: np.ndarray, k: int) -> np.ndarray:
+    """Rows of the k highest positive scores, best first. O(n + k log k)"""
+    candidates = np.flatnonzero(scores > 0)
+    return candidates[top_positions(scores[candidates], k)]
+
+
+def segment_sum(values: np.ndarray, indptr: np.ndarray) -> np.ndarray:
+    """Per-row sums of edge values laid out in CSR order (1D or 2D)."""
+    out = np.zeros((len(indptr) - 1,) + values.shape[1:], dtype=values.dtype)
+    nonempty = np.flatnonzero(np.diff(indptr))
+    if len(nonempty):
+        out[nonempty] = np.add.reduceat(values, indptr[nonempty], axis=0)
+    return out
+
+
+def save_arrays(
+    path: str, arrays: Dict[str, np.ndarray], keep: Iterable[str] = ()
+) -> None:
+    """
+    Replaces the directory `path` with one holding each array as raw
+    `<name>.npy`, plus the existing files of the arrays named in keep.
+    """
+
+    def write(staging: str) -> None:
+        for name in keep:
+            old = os.path.join(path, f"{name}.npy")
+            if os.path.exists(old):
+                # Files are never rewritten, so sharing the inode is safe
+                os.link(old, os.path.join(staging, f"{name}.npy"))
+        for name, array in arrays.items():
+            np.save(os.path.join(staging, f"{name}.npy"), array)
+
+    save_dir(path, write)
+
+
+def save_dir(path: str, write: Callable[[str], None]) -> None:
+    """
+    Replaces the directory `path` with one filled by write(staging).
+    Writing in place truncates files any worker may have mapped, and lets
+    loaders see a half-written or mixed index, so the files go to a sibling
+    staging directory that is then renamed into place.
+    """
+    path = os.path.abspath(path)
+    parent = os.path.dirname(path)
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".staging-", dir=parent)
+    try:
+        write(staging)
+        _replace_dir(staging, path)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def _replace_dir(src: str, dst: str) -> None:
+    """
+    Moves the directory src to dst. os.replace cannot overwrite a non-empty
+    directory, so an existing dst is first renamed aside, then deleted;
+    workers that mapped its files keep reading them until they reload.
+    """
+    old = None
+    if os.path.exists(dst):
+        old = tempfile.mkdtemp(prefix=".old-", dir=os.path.dirname(dst))
+        os.replace(dst, old)
+    os.replace(src, dst)
+    if old is not None:
+        shutil.rmtree(old, ignore_errors=True)
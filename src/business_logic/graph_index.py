@@ -0,0 +1,596 @@
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from business_logic.catalog_sync import CatalogFollower
+from business_logic.csr import (
+    find_key,
+    row_positions,
+    rows_to_indptr,
+    save_arrays,
+    segment_sum,
+)
+from data_access.models import Book, CatalogVersion
+
+# Arrays making up a saved index
+INDEX_ARRAYS = (
+    "book_ids",
+    "feature_names",
+    "book_indptr",
+    "book_indices",
+    "feature_indptr",
+    "feature_indices",
+    "ratings",
+)
+
+# Catalog version a saved index was built from, saved next to its arrays
+VERSION_ARRAY = "catalog_version"
+
+# Patched rows tolerated before they are folded back into the CSR arrays
+COMPACT_THRESHOLD = 1024
+
+
+def book_features(authors: Optional[str], categories: Optional[str]) -> Tuple[str, ...]:
+    """Normalized feature keys ('author:...', 'category:...') of a book."""
+    features = []
+    if authors:
+        for author in authors.split(","):
+            author = author.strip().lower()
+            if author:
+                features.append(f"author:{author}")
+    if categories:
+        for cat in categories.split(","):
+            cat = cat.strip().lower()
+            if cat:
+                features.append(f"category:{cat}")
+    return tuple(dict.fromkeys(features))
+
+
+def _patched_csr(csr: tuple, patches: Dict[int, np.ndarray], n_rows: int) -> tuple:
+    """Folds per-row patches into fresh CSR arrays of n_rows rows."""
+    indptr, indices = csr
+    base_rows = len(indptr) - 1
+    lengths = np.zeros(n_rows, dtype=np.int64)
+    lengths[:base_rows] = np.diff(indptr)
+    for row, values in patches.items():
+        lengths[row] = len(values)
+
+    new_indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_indptr[1:])
+    new_indices = np.empty(new_indptr[-1], dtype=np.int32)
+
+    kept = np.ones(base_rows, dtype=bool)
+    kept[[row for row in patches if row < base_rows]] = False
+    kept = np.flatnonzero(kept)
+    new_indices[row_positions(new_indptr, kept)] = indices[row_positions(indptr, kept)]
+    for row, values in patches.items():
+        new_indices[new_indptr[row] : new_indptr[row + 1]] = values
+    return new_indptr, new_indices
+
+
+class GraphIndex:
+    """
+    Compact author/category graph behind the book recommender.
+    Books and features get int32 ids (their rank in sorted UTF-8 order) and
+    edges live in NumPy CSR arrays for book->feature and feature->book.
+    Each feature's books are stored by descending ratingsCount, so capping a
+    hub category to its most popular members is a prefix slice.
+
+    Catalog changes are applied in place (see upsert/remove): new books and
+    features are appended after the sorted ids and changed rows are kept as
+    patches until compact() folds them back into the arrays.
+    """
+
+    def __init__(
+        self,
+        book_ids: np.ndarray,
+        feature_names: np.ndarray,
+        book_indptr: np.ndarray,
+        book_indices: np.ndarray,
+        feature_indptr: np.ndarray,
+        feature_indices: np.ndarray,
+        ratings: np.ndarray,
+    ):
+        self.book_ids = book_ids
+        self.feature_names = feature_names
+        # (indptr, indices) pairs are swapped as a whole so readers never mix them
+        self._book_csr = (book_indptr, book_indices)
+        self._feature_csr = (feature_indptr, feature_indices)
+        self._ratings = ratings
+        self._walk_cache = None
+
+        self._new_book_ids: List[str] = []
+        self._new_books: Dict[str, int] = {}
+        self._new_feature_names: List[str] = []
+        self._new_features: Dict[str, int] = {}
+        self._book_patches: Dict[int, np.ndarray] = {}
+        self._feature_patches: Dict[int, np.ndarray] = {}
+        self._removed: Set[int] = set()
+        self._lock = threading.RLock()
+        # CatalogVersion the rows were read at; None when unknown
+        self.catalog_version: Optional[int] = None
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple]) -> "GraphIndex":
+        """Builds the index from (id, authors, categories, ratingsCount) rows."""
+        ids, features, counts, ratings = [], [], [], []
+        for book_id, authors, categories, ratings_count in rows:  # O(n * f)
+            book_feats = book_features(authors, categories)
+            ids.append(book_id.encode("utf-8"))
+            ratings.append(ratings_count or 0.0)
+            features.extend(f.encode("utf-8") for f in book_feats)
+            counts.append(len(book_feats))
+
+        book_ids = np.array(ids, dtype=bytes)
+        order = np.argsort(book_ids, kind="stable")
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+
+        feature_names, edge_features = np.unique(
+            np.array(features, dtype=bytes), return_inverse=True
+        )
+        edge_books = np.repeat(rank, counts)
+        ratings = np.array(ratings, dtype=np.float32)[order]
+
+        by_book = np.lexsort((edge_features, edge_books))
+        book_indptr = rows_to_indptr(edge_books, len(book_ids))
+        book_indices = edge_features[by_book].astype(np.int32)
+        # Most rated first within a feature; ties broken by book id
+        by_feature = np.lexsort((edge_books, -ratings[edge_books], edge_features))
+        feature_indptr = rows_to_indptr(edge_features, len(feature_names))
+        feature_indices = edge_books[by_feature].astype(np.int32)
+        return cls(
+            book_ids[order],
+            feature_names,
+            book_indptr,
+            book_indices,
+            feature_indptr,
+            feature_indices,
+            ratings,
+        )
+
+    @classmethod
+    def build(cls) -> "GraphIndex":
+        """Builds the index with a single streamed pass over the catalog."""
+        # Read first, so a book changed mid-build leaves the index stale
+        version = CatalogVersion.current()
+        rows = Book.objects.values_list("id", "authors", "categories", "ratingsCount")
+        index = cls.from_rows(rows.iterator(chunk_size=2000))
+        index.catalog_version = version
+        return index
+
+    def save(self, path: str) -> None:
+        """
+        Replaces the directory `path` with every array as raw .npy, and the
+        catalog version they were built from (-1 when unknown).
+        """
+        if self.is_patched:
+            raise ValueError("Only freshly built indexes can be saved")
+        arrays = {name: getattr(self, name) for name in INDEX_ARRAYS}
+        version = -1 if self.catalog_version is None else self.catalog_version
+        arrays[VERSION_ARRAY] = np.int64(version)
+        save_arrays(path, arrays)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "GraphIndex":
+        """Loads a saved index; with mmap, workers share the OS pages."""
+        mode = "r" if mmap else None
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)
+            for name in INDEX_ARRAYS
+        }
+        index = cls(**arrays)
+        version_path = os.path.join(path, f"{VERSION_ARRAY}.npy")
+        if os.path.exists(version_path):
+            index.catalog_version = int(np.load(version_path))
+        return index
+
+    @property
+    def book_indptr(self) -> np.ndarray:
+        return self._compacted_book_csr()[0]
+
+    @property
+    def book_indices(self) -> np.ndarray:
+        return self._compacted_book_csr()[1]
+
+    @property
+    def feature_indptr(self) -> np.ndarray:
+        return self._compacted_feature_csr()[0]
+
+    @property
+    def feature_indices(self) -> np.ndarray:
+        return self._compacted_feature_csr()[1]
+
+    @property
+    def ratings(self) -> np.ndarray:
+        return self._ratings[: self.n_rows]
+
+    @property
+    def n_rows(self) -> int:
+        """Number of book rows, including removed ones awaiting a rebuild."""
+        return len(self.book_ids) + len(self._new_book_ids)
+
+    @property
+    def n_features(self) -> int:
+        return len(self.feature_names) + len(self._new_feature_names)
+
+    @property
+    def is_patched(self) -> bool:
+        return bool(
+            self._book_patches
+            or self._feature_patches
+            or self._new_book_ids
+            or self._removed
+        )
+
+    def __contains__(self, book_id: str) -> bool:
+        return self.book_index(book_id) >= 0
+
+    def __len__(self) -> int:
+        return self.n_rows - len(self._removed)
+
+    def _book_row(self, book_id: str) -> int:
+        row = find_key(self.book_ids, book_id)
+        return row if row >= 0 else self._new_books.get(book_id, -1)
+
+    def book_index(self, book_id: str) -> int:
+        row = self._book_row(book_id)
+        return -1 if row in self._removed else row
+
+    def book_indexes(self, book_ids: List[str]) -> np.ndarray:
+        """book_index of many ids with one vectorized searchsorted."""
+        if not book_ids:
+            return np.empty(0, dtype=np.int64)
+        encoded = np.array([book_id.encode("utf-8") for book_id in book_ids])
+        rows = np.searchsorted(self.book_ids, encoded).astype(np.int64)
+        clipped = np.minimum(rows, max(len(self.book_ids) - 1, 0))
+        found = (rows < len(self.book_ids)) & (self.book_ids[clipped] == encoded)
+        rows[~found] = [
+            self._new_books.get(book_ids[i], -1) for i in np.flatnonzero(~found)
+        ]
+        if self._removed:
+            rows[np.isin(rows, list(self._removed))] = -1
+        return rows
+
+    def feature_index(self, feature: str) -> int:
+        row = find_key(self.feature_names, feature)
+        return row if row >= 0 else self._new_features.get(feature, -1)
+
+    def to_book_ids(self, rows: Iterable[int]) -> list:
+        n_base = len(self.book_ids)
+        return [
+            (
+                self.book_ids[i].decode("utf-8")
+                if i < n_base
+                else self._new_book_ids[i - n_base]
+            )
+            for i in rows
+        ]
+
+    def features_of(self, row: int) -> np.ndarray:
+        """Sorted feature ids of a book."""
+        patch = self._book_patches.get(row)
+        if patch is not None:
+            return patch
+        indptr, indices = self._book_csr
+        if row >= len(indptr) - 1:
+            return indices[:0]
+        return indices[indptr[row] : indptr[row + 1]]
+
+    def books_of(self, feature: int) -> np.ndarray:
+        """Book ids sharing a feature, most rated first."""
+        patch = self._feature_patches.get(feature)
+        if patch is not None:
+            return patch
+        indptr, indices = self._feature_csr
+        if feature >= len(indptr) - 1:
+            return indices[:0]
+        return indices[indptr[feature] : indptr[feature + 1]]
+
+    @staticmethod
+    def _gather_rows(patches, csr, rows, limit=None) -> Tuple[np.ndarray, np.ndarray]:
+        """Concatenated rows in `rows` order, plus their offsets."""
+        # Callers read patches before csr: compact() swaps csr in first
+        indptr, indices = csr
+        patched = np.zeros(len(rows), dtype=bool)
+        if patches:
+            patched = np.isin(rows, np.fromiter(patches, dtype=np.int64))
+        base = rows[~patched]
+        patch_values = [patches[row][:limit] for row in rows[patched].tolist()]
+
+        lengths = np.empty(len(rows), dtype=np.int64)
+        lengths[~patched] = indptr[base + 1] - indptr[base]
+        if limit is not None:
+            lengths[~patched] = np.minimum(lengths[~patched], limit)
+        lengths[patched] = [len(values) for values in patch_values]
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        if not patch_values:
+            return indices[row_positions(indptr, base, limit)], offsets
+        out = np.empty(offsets[-1], dtype=np.int32)
+        out[row_positions(offsets, np.flatnonzero(~patched))] = indices[
+            row_positions(indptr, base, limit)
+        ]
+        for i, values in zip(np.flatnonzero(patched).tolist(), patch_values):
+            out[offsets[i] : offsets[i + 1]] = values
+        return out, offsets
+
+    def expand(
+        self, rows: np.ndarray, max_feature_degree: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Neighbors of a whole BFS level, touching each shared feature once.
+        With max_feature_degree, a feature contributes only its most rated
+        books, bounding the work to O(features * cap) however skewed it is.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        features, _ = self._gather_rows(self._book_patches, self._book_csr, rows)
+        features = np.unique(features).astype(np.int64)
+        books, _ = self._gather_rows(
+            self._feature_patches, self._feature_csr, features, max_feature_degree
+        )
+        return np.unique(books)
+
+    def shared_features(
+        self, seed: int, rows: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Features each of `rows` shares with `seed`, and each row's degree.
+        Feature rows are sorted int arrays, so membership in the seed's row
+        is one vectorized searchsorted over all candidates at once.
+        """
+        seed_features = self.features_of(seed)
+        rows = np.asarray(rows, dtype=np.int64)
+        features, offsets = self._gather_rows(self._book_patches, self._book_csr, rows)
+        degree = np.diff(offsets)
+        if not len(seed_features):
+            return np.zeros(len(rows), dtype=np.int64), degree
+        slots = np.searchsorted(seed_features, features)
+        slots = np.minimum(slots, len(seed_features) - 1)
+        hits = (seed_features[slots] == features).astype(np.int64)
+        return segment_sum(hits, offsets), degree
+
+    def score_features_many(
+        self, features: np.ndarray, weights: np.ndarray
+    ) -> np.ndarray:
+        """
+        Per-book sums of the weights of its features, for many weight
+        vectors at once: weights is (vectors x features) and the result
+        (vectors x books), the product with the features x books matrix.
+        Only the postings of the weighted features are read, once for all
+        vectors.
+        """
+        features = np.asarray(features, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.float32)
+        books, offsets = self._gather_rows(
+            self._feature_patches, self._feature_csr, features
+        )
+        scores = np.zeros((weights.shape[0], self.n_rows), dtype=np.float32)
+        for j in range(len(features)):
+            # A feature lists each book once, so the fancy add cannot collide
+            members = books[offsets[j] : offsets[j + 1]]
+            scores[:, members] += weights[:, j : j + 1]
+        return scores
+
+    def upsert(
+        self,
+        book_id: str,
+        authors: Optional[str],
+        categories: Optional[str],
+        ratings_count: Optional[float] = None,
+    ) -> None:
+        """Adds or updates one book, touching only the rows it affects."""
+        with self._lock:
+            row = self._book_row(book_id)
+            if row < 0:
+                row = self._append_book(book_id)
+            self._removed = self._removed - {row}
+            self._set_rating(row, ratings_count or 0.0)
+
+            old = set(self.features_of(row).tolist())
+            new = {self._feature_row(f) for f in book_features(authors, categories)}
+            # Patch dicts are copied, not mutated, so readers iterate safely
+            feature_patches = dict(self._feature_patches)
+            # Kept features are re-sorted too since the rating may have moved
+            for feature in old | new:
+                members = self.books_of(feature)
+                members = members[members != row]
+                if feature in new:
+                    members = np.append(members, np.int32(row))
+                feature_patches[feature] = self._by_rating(members)
+            self._feature_patches = feature_patches
+            self._book_patches = {
+                **self._book_patches,
+                row: np.array(sorted(new), dtype=np.int32),
+            }
+            self._maybe_compact()
+
+    def remove(self, book_id: str) -> None:
+        """Drops one book; its row stays as a tombstone until the next rebuild."""
+        with self._lock:
+            row = self.book_index(book_id)
+            if row < 0:
+                return
+            feature_patches = dict(self._feature_patches)
+            for feature in self.features_of(row).tolist():
+                members = self.books_of(feature)
+                feature_patches[feature] = members[members != row]
+            self._feature_patches = feature_patches
+            self._book_patches = {
+                **self._book_patches,
+                row: np.empty(0, dtype=np.int32),
+            }
+            self._removed = self._removed | {row}
+            self._maybe_compact()
+
+    def _append_book(self, book_id: str) -> int:
+        row = self.n_rows
+        self._new_book_ids.append(book_id)
+        self._new_books[book_id] = row
+        return row
+
+    def _feature_row(self, feature: str) -> int:
+        row = self.feature_index(feature)
+        if row < 0:
+            row = self.n_features
+            self._new_feature_names.append(feature)
+            self._new_features[feature] = row
+        return row
+
+    def _set_rating(self, row: int, rating: float) -> None:
+        size = len(self._ratings)
+        if row >= size or not self._ratings.flags.writeable:
+            # Copy off the read-only mmap, growing geometrically for appends
+            if row >= size:
+                size = max(row + 1, 2 * size)
+            grown = np.zeros(size, dtype=np.float32)
+            grown[: len(self._ratings)] = self._ratings
+            self._ratings = grown
+        self._ratings[row] = rating
+
+    def _by_rating(self, members: np.ndarray) -> np.ndarray:
+        order = np.lexsort((members, -self._ratings[members]))
+        return members[order].astype(np.int32)
+
+    def _maybe_compact(self) -> None:
+        if len(self._book_patches) + len(self._feature_patches) > COMPACT_THRESHOLD:
+            self.compact()
+
+    def compact(self) -> None:
+        """Folds patched rows back into the CSR arrays, keeping row ids stable."""
+        with self._lock:
+            if self._book_patches:
+                self._book_csr = _patched_csr(
+                    self._book_csr, self._book_patches, self.n_rows
+                )
+                self._book_patches = {}
+            if self._feature_patches:
+                self._feature_csr = _patched_csr(
+                    self._feature_csr, self._feature_patches, self.n_features
+                )
+                self._feature_patches = {}
+
+    def _compacted_book_csr(self) -> tuple:
+        if self._book_patches:
+            self.compact()
+        return self._book_csr
+
+    def _compacted_feature_csr(self) -> tuple:
+        if self._feature_patches:
+            self.compact()
+        return self._feature_csr
+
+    def _walk_arrays(self) -> tuple:
+        """CSR arrays plus the book and feature degrees used by PageRank."""
+        book_csr = self._compacted_book_csr()
+        feature_csr = self._compacted_feature_csr()
+        cached = self._walk_cache
+        if cached is None or cached[0] is not book_csr or cached[1] is not feature_csr:
+            degrees = (np.diff(book_csr[0]), np.diff(feature_csr[0]))
+            cached = (book_csr, feature_csr, degrees)
+            self._walk_cache = cached
+        return cached
+
+    def personalized_pagerank_many(
+        self, seeds: np.ndarray, alpha: float = 0.15, iterations: int = 10
+    ) -> np.ndarray:
+        """
+        Personalized PageRank over the bipartite book-feature graph, one
+        column per seed row, iterated together as a matrix.
+        Each iteration walks book -> feature -> book as segment sums over
+        both CSR directions, so the cost is O(iterations * edges * seeds)
+        and every seed shares each pass. Hub features split their mass
+        across all members, which keeps huge categories from drowning out
+        shared authors; mass stuck on books without features teleports
+        back to the seed.
+        """
+        book_csr, feature_csr, (book_degree, feature_degree) = self._walk_arrays()
+        n_books = len(book_degree)
+        seeds = np.asarray(seeds, dtype=np.int64)
+        restart = np.zeros((n_books, len(seeds)), dtype=np.float32)
+        restart[seeds, np.arange(len(seeds))] = 1.0
+        dangling = book_degree == 0
+        book_weight = np.divide(
+            1.0, book_degree, out=np.zeros(n_books), where=~dangling
+        ).astype(np.float32)[:, None]
+        feature_weight = (1.0 / np.maximum(feature_degree, 1)).astype(np.float32)
+
+        rank = restart.copy()
+        for _ in range(iterations):
+            book_share = rank * book_weight
+            feature_mass = segment_sum(book_share[feature_csr[1]], feature_csr[0])
+            feature_share = feature_mass * feature_weight[:, None]
+            walked = segment_sum(feature_share[book_csr[1]], book_csr[0])
+            restart_mass = alpha + (1 - alpha) * rank[dangling].sum(axis=0)
+            rank = (1 - alpha) * walked + restart_mass * restart
+        return rank
+
+
+# Mapped by preload_graph_index, not yet checked against the catalog
+_preloaded: Optional[GraphIndex] = None
+
+
+def _saved_index_path() -> Optional[str]:
+    path = getattr(settings, "GRAPH_INDEX_PATH", None)
+    if path and os.path.exists(os.path.join(path, "book_ids.npy")):
+        return str(path)
+    return None
+
+
+def _load_saved() -> Optional[Tuple[GraphIndex, int]]:
+    """The preloaded or saved index with its catalog version, if any."""
+    global _preloaded
+    index, _preloaded = _preloaded, None
+    if index is None:
+        path = _saved_index_path()
+        index = GraphIndex.load(path) if path else None
+    if index is None or index.catalog_version is None:
+        return None
+    return index, index.catalog_version
+
+
+def _apply_changes(index: GraphIndex, rows: List[tuple], removed: Set[str]) -> None:
+    for book_id, _, authors, categories, ratings_count in rows:
+        index.upsert(book_id, authors, categories, ratings_count)
+    for book_id in removed:
+        index.remove(book_id)
+
+
+_graph = CatalogFollower(GraphIndex.build, _apply_changes, _load_saved)
+
+
+def preload_graph_index() -> None:
+    """
+    Maps a saved index at worker startup without touching the database;
+    its catalog version is checked on first use.
+    """
+    global _preloaded
+    path = _saved_index_path()
+    if path:
+        _preloaded = GraphIndex.load(path)
+
+
+def get_graph_index() -> GraphIndex:
+    """
+    Returns the process-wide index, loading or building it on first use
+    and patching in books changed by any process since (see catalog_sync).
+    """
+    return _graph.get()
+
+
+def graph_version() -> int:
+    """Changes whenever the process-wide index does; cache keys embed it."""
+    # Checks the catalog too, or cached results would hide every change
+    _graph.get()
+    return _graph.generation
+
+
+def reset_graph_index() -> None:
+    """Drops the process-wide index; the next lookup reloads it."""
+    global _preloaded
+    _preloaded = None
+    _graph.reset()
@@ -0,0 +1,27 @@
+"""
+Process-pool entry points for graph recommendations.
+
+Kept free of model imports at module level so spawned workers can unpickle
+these functions before Django is set up; forked workers skip the setup and
+inherit the parent's graph index.
+"""
+
+
+def init_worker():
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+    from business_logic.graph_index import get_graph_index
+
+    get_graph_index()
+
+
+def recommend_chunk(payload):
+    """Recommended ids for a (seed_ids, params) chunk."""
+    from business_logic.bfs import GraphRecommender
+
+    seed_ids, params = payload
+    return GraphRecommender._recommend_ids(seed_ids, **params)
@@ -0,0 +1,198 @@
+"""
+Approximate nearest neighbors over the description TF-IDF matrix.
+
+Signed random projections: each of `tables` hash tables draws `bits`
+random +/-1 hyperplanes and keys every book by the packed signs of its
+projections. Books at a small angle share keys with high probability, so
+a lookup only re-ranks the members of the query's buckets by exact cosine
+instead of scoring the whole catalog. More tables raise recall, more bits
+shrink the buckets (and latency).
+"""
+
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from business_logic.csr import row_positions, save_arrays, segment_sum, top_positions
+from business_logic.tfidf import (
+    NEIGHBOR_ARRAYS,
+    TFIDF_ARRAYS,
+    TfidfIndex,
+    get_tfidf_index,
+)
+
+# Arrays making up a saved index, stored as lsh_<name>.npy next to the matrix
+LSH_ARRAYS = ("planes", "keys", "order", "sorted_keys")
+TABLES = 32
+BITS = 8
+# Candidates re-ranked exactly per requested neighbor
+RERANK = 20
+# Rows projected at once while hashing the catalog
+HASH_BLOCK = 1024
+
+
+class LSHIndex:
+    """
+    Random-projection hash tables over a TfidfIndex, kept as NumPy arrays:
+    planes (terms x tables*bits, int8 signs), keys (tables x books, each a
+    packed uint32 signature) and, per table, the books sorted by key so a
+    bucket is one searchsorted range.
+    """
+
+    def __init__(
+        self,
+        tfidf: TfidfIndex,
+        planes: np.ndarray,
+        keys: np.ndarray,
+        order: np.ndarray,
+        sorted_keys: np.ndarray,
+    ):
+        self.tfidf = tfidf
+        self.planes = planes
+        self.keys = keys
+        self.order = order
+        self.sorted_keys = sorted_keys
+
+    @property
+    def tables(self) -> int:
+        return self.keys.shape[0]
+
+    @property
+    def bits(self) -> int:
+        return self.planes.shape[1] // self.tables
+
+    @classmethod
+    def build(
+        cls, tfidf: TfidfIndex, tables: int = TABLES, bits: int = BITS, seed: int = 0
+    ) -> "LSHIndex":
+        """Hashes every book of tfidf into `tables` tables of `bits`-bit keys."""
+        if not 0 < bits <= 32:
+            raise ValueError("bits must be between 1 and 32")
+        rng = np.random.default_rng(seed)
+        planes = rng.choice(
+            np.array([-1, 1], dtype=np.int8), (len(tfidf.vocabulary), tables * bits)
+        )
+        keys = np.empty((tables, len(tfidf)), dtype=np.uint32)
+        for start in range(0, len(tfidf), HASH_BLOCK):
+            stop = min(start + HASH_BLOCK, len(tfidf))
+            keys[:, start:stop] = cls._hash(tfidf, planes, tables, start, stop)
+        order = np.argsort(keys, axis=1, kind="stable").astype(np.int32)
+        sorted_keys = np.take_along_axis(keys, order, axis=1)
+        return cls(tfidf, planes, keys, order, sorted_keys)
+
+    @staticmethod
+    def _hash(tfidf, planes, tables, start, stop) -> np.ndarray:
+        """Packed signatures (tables x rows) of the rows start:stop."""
+        indptr = np.asarray(tfidf.indptr[start : stop + 1])
+        entries = slice(indptr[0], indptr[-1])
+        weights = np.asarray(tfidf.data[entries], dtype=np.float32)
+        # Sparse rows x dense planes, as per-row sums of the weighted plane rows
+        products = planes[tfidf.indices[entries]] * weights[:, None]
+        projections = segment_sum(products, indptr - indptr[0])
+        signs = (projections > 0).reshape(stop - start, tables, -1)
+        powers = np.uint32(1) << np.arange(signs.shape[2], dtype=np.uint32)
+        return (signs * powers).sum(axis=2, dtype=np.uint32).T
+
+    def save(self, path: str) -> None:
+        """Saves the hash tables as raw .npy arrays next to the matrix in `path`."""
+        arrays = {f"lsh_{name}": getattr(self, name) for name in LSH_ARRAYS}
+        save_arrays(path, arrays, keep=TFIDF_ARRAYS + NEIGHBOR_ARRAYS)
+
+    @classmethod
+    def load(cls, path: str, tfidf: TfidfIndex, mmap: bool = True) -> "LSHIndex":
+        mode = "r" if mmap else None
+        arrays = {
+            name: np.load(os.path.join(path, f"lsh_{name}.npy"), mmap_mode=mode)
+            for name in LSH_ARRAYS
+        }
+        return cls(tfidf, **arrays)
+
+    def candidates(
+        self, row: int, limit: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rows sharing at least one bucket with row (itself excluded) and how
+        many of the tables * bits signature bits they agree on, which
+        estimates their angle to row. With limit, only the rows agreeing
+        most are kept, as a cheap first ranking before the exact one.
+        """
+        keys = self.keys[:, row]
+        members = []
+        for table in range(self.tables):
+            sorted_keys = self.sorted_keys[table]
+            start = np.searchsorted(sorted_keys, keys[table], side="left")
+            end = np.searchsorted(sorted_keys, keys[table], side="right")
+            members.append(self.order[table, start:end])
+        rows = np.unique(np.concatenate(members))
+        rows = rows[rows != row]
+        differing = np.bitwise_count(self.keys[:, rows] ^ keys[:, None])
+        agreement = self.tables * self.bits - differing.sum(axis=0, dtype=np.int64)
+        if limit is not None and len(rows) > limit:
+            best = top_positions(agreement, limit)
+            rows, agreement = rows[best], agreement[best]
+        return rows, agreement
+
+    def similar(
+        self, book_id: str, n: int = 10, rerank: int = RERANK
+    ) -> List[Tuple[str, float]]:
+        """
+        Approximate n most similar books: the rerank * n candidates whose
+        signatures agree most with the book's are re-ranked by exact cosine.
+        """
+        tfidf = self.tfidf
+        row = tfidf.book_index(book_id)
+        if row < 0:
+            return []
+        rows, _ = self.candidates(row, rerank * n)
+
+        # Exact dot products of the candidates with the query row
+        query = np.zeros(len(tfidf.vocabulary), dtype=np.float32)
+        start, end = tfidf.indptr[row], tfidf.indptr[row + 1]
+        query[tfidf.indices[start:end]] = tfidf.data[start:end]
+        positions = row_positions(np.asarray(tfidf.indptr), rows)
+        products = tfidf.data[positions] * query[tfidf.indices[positions]]
+        lengths = tfidf.indptr[rows + 1] - tfidf.indptr[rows]
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        scores = segment_sum(products, offsets)
+
+        kept = np.flatnonzero(scores > 0)
+        best = kept[top_positions(scores[kept], n)]
+        return list(zip(tfidf.to_book_ids(rows[best]), scores[best].tolist()))
+
+
+_index: Optional[LSHIndex] = None
+_index_lock = threading.Lock()
+
+
+def _saved_index_path() -> Optional[str]:
+    path = getattr(settings, "TFIDF_INDEX_PATH", None)
+    if path and os.path.exists(os.path.join(path, "lsh_keys.npy")):
+        return str(path)
+    return None
+
+
+def get_lsh_index() -> Optional[LSHIndex]:
+    """Returns the process-wide hash tables, mapping them on first use."""
+    global _index
+    index = _index
+    if index is None:
+        path = _saved_index_path()
+        tfidf = get_tfidf_index()
+        if path is None or tfidf is None:
+            return None
+        with _index_lock:
+            if _index is None:
+                _index = LSHIndex.load(path, tfidf)
+            index = _index
+    return index
+
+
+def reset_lsh_index() -> None:
+    """Drops the process-wide hash tables; the next lookup maps them again."""
+    global _index
+    with _index_lock:
+        _index = None
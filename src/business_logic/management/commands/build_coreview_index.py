@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from business_logic.coreview import TOP_K, CoReviewIndex, reset_coreview_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds the item-item co-review model and saves it for workers to memory-map."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            type=str,
+            default=str(settings.COREVIEW_INDEX_PATH),
+            help="Directory to write the model arrays to.",
+        )
+        parser.add_argument(
+            "--k", type=int, default=TOP_K, help="Co-reviewed books kept per book."
+        )
+
+    def handle(self, *args, **kwargs):
+        path = kwargs["path"]
+        self.stdout.write("Building co-review model...")
+        index = CoReviewIndex.build(kwargs["k"])
+        index.save(path)
+        reset_coreview_index()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Saved co-review model for {len(index)} books to {path}"
+            )
+        )
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from business_logic.graph_index import GraphIndex
+
+
+class Command(BaseCommand):
+    help = "Builds the book graph index and saves it for workers to memory-map."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            type=str,
+            default=str(settings.GRAPH_INDEX_PATH),
+            help="Directory to write the index arrays to.",
+        )
+
+    def handle(self, *args, **kwargs):
+        path = kwargs["path"]
+        self.stdout.write("Building graph index...")
+        index = GraphIndex.build()
+        index.save(path)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Saved graph index with {len(index)} books and "
+                f"{len(index.feature_names)} features to {path}"
+            )
+        )
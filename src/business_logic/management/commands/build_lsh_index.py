@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from business_logic.lsh import BITS, TABLES, LSHIndex, reset_lsh_index
+from business_logic.tfidf import TfidfIndex
+
+
+class Command(BaseCommand):
+    help = (
+        "Hashes the saved TF-IDF matrix into random-projection tables for "
+        "approximate description-similarity lookups."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            type=str,
+            default=str(settings.TFIDF_INDEX_PATH),
+            help="Directory holding the matrix written by preprocessing.py.",
+        )
+        parser.add_argument(
+            "--tables",
+            type=int,
+            default=TABLES,
+            help="Hash tables; more raise recall and latency.",
+        )
+        parser.add_argument(
+            "--bits",
+            type=int,
+            default=BITS,
+            help="Bits per key (at most 32); more shrink buckets and recall.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **kwargs):
+        path = kwargs["path"]
+        try:
+            tfidf = TfidfIndex.load(path, mmap=True)
+        except FileNotFoundError:
+            raise CommandError(
+                f"No TF-IDF matrix in {path}; run data_access/preprocessing.py first"
+            )
+        self.stdout.write(f"Hashing {len(tfidf)} books...")
+        try:
+            index = LSHIndex.build(
+                tfidf, kwargs["tables"], kwargs["bits"], kwargs["seed"]
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        index.save(path)
+        reset_lsh_index()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Saved {index.tables} tables of {index.bits}-bit keys to {path}"
+            )
+        )
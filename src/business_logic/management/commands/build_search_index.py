@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from business_logic.bst import save_catalog_index
+
+
+class Command(BaseCommand):
+    help = "Builds the catalog search index and saves it for workers to memory-map."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            type=str,
+            default=str(settings.SEARCH_INDEX_PATH),
+            help="Directory to write the index tables to.",
+        )
+
+    def handle(self, *args, **kwargs):
+        path = kwargs["path"]
+        self.stdout.write("Building search index...")
+        index = save_catalog_index(path)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Saved search index for catalog version {index.version} to {path}"
+            )
+        )
@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from business_logic.lsh import reset_lsh_index
+from business_logic.tfidf import BLOCK_SIZE, TfidfIndex, reset_tfidf_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Computes the top description matches of every book from the saved "
+        "TF-IDF matrix and stores them next to it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            type=str,
+            default=str(settings.TFIDF_INDEX_PATH),
+            help="Directory holding the matrix written by preprocessing.py.",
+        )
+        parser.add_argument(
+            "--n", type=int, default=20, help="Neighbors stored per book."
+        )
+        parser.add_argument(
+            "--block-size",
+            type=int,
+            default=BLOCK_SIZE,
+            help="Books scored together; memory grows with block size x books.",
+        )
+
+    def handle(self, *args, **kwargs):
+        path = kwargs["path"]
+        try:
+            index = TfidfIndex.load(path, mmap=True)
+        except FileNotFoundError:
+            raise CommandError(
+                f"No TF-IDF matrix in {path}; run data_access/preprocessing.py first"
+            )
+        self.stdout.write(f"Scoring {len(index)} books...")
+        index.save_neighbors(path, kwargs["n"], kwargs["block_size"])
+        reset_tfidf_index()
+        reset_lsh_index()
+        self.stdout.write(
+            self.style.SUCCESS(f"Saved {kwargs['n']} neighbors per book to {path}")
+        )
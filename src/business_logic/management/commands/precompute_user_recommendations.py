@@ -0,0 +1,90 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from business_logic.cbf import CBF_MODES, DEFAULT_CBF_MODE, BookRecommender
+from business_logic.cbf_workers import init_worker, recommend_chunk
+from business_logic.graph_index import get_graph_index
+from business_logic.precompute import RowWriter, precompute
+from business_logic.profiles import get_user_profiles
+from data_access.models import PrecomputedUserRecommendation, Review
+
+
+class Command(BaseCommand):
+    help = "Computes CBF recommendations for every reviewer and stores them."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", choices=CBF_MODES, default=DEFAULT_CBF_MODE)
+        parser.add_argument("--max-results", type=int, default=10)
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=None,
+            help="Worker processes (default: one per CPU).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=256,
+            help="Users sent to a worker at a time.",
+        )
+        parser.add_argument(
+            "--output",
+            type=str,
+            default=None,
+            help="Write JSON lines to this file instead of the database.",
+        )
+
+    def handle(self, *args, **kwargs):
+        params = BookRecommender.params(kwargs["max_results"], kwargs["mode"])
+        user_ids = list(
+            Review.objects.exclude(user_id=None)
+            .order_by("user_id")
+            .values_list("user_id", flat=True)
+            .distinct()
+        )
+
+        self.stdout.write(f"Precomputing recommendations for {len(user_ids)} users...")
+        # Built once here so forked workers inherit them
+        get_user_profiles()
+        get_graph_index()
+
+        path = kwargs["output"]
+        output = open(path, "w") if path else None
+        writer = RowWriter(PrecomputedUserRecommendation, "user_id")
+
+        def store(chunk, ids):
+            if output:
+                for user_id, recommended in zip(chunk, ids):
+                    record = {"user_id": user_id, "recommended_ids": recommended}
+                    output.write(json.dumps(record) + "\n")
+            else:
+                writer.add(
+                    PrecomputedUserRecommendation(
+                        user_id=user_id, params=params, recommended_ids=recommended
+                    )
+                    for user_id, recommended in zip(chunk, ids)
+                )
+
+        try:
+            elapsed = precompute(
+                self,
+                user_ids,
+                params,
+                recommend_chunk,
+                init_worker,
+                store,
+                "users",
+                kwargs["processes"],
+                kwargs["chunk_size"],
+            )
+            writer.flush()
+        finally:
+            if output:
+                output.close()
+
+        done = f"recommendations for {len(user_ids)} users in {elapsed:.1f}s"
+        if output:
+            self.stdout.write(self.style.SUCCESS(f"Wrote {done} to {path}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Stored {done}"))
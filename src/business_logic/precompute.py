@@ -0,0 +1,95 @@
+"""
+Process-pool plumbing shared by the parallel batch recommenders and the
+offline precompute commands: ids are split into (chunk, params) payloads,
+scored by a pool of workers, and the results stored in bulk upserts.
+"""
+
+import multiprocessing
+import time
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import connections, transaction
+
+# Precomputed rows upserted per transaction
+WRITE_BATCH_SIZE = 1000
+
+
+def imap_chunks(
+    ids: List[str],
+    params: dict,
+    worker: Callable,
+    initializer: Callable,
+    processes: Optional[int] = None,
+    chunk_size: int = 256,
+) -> Iterator[Tuple[List[str], list]]:
+    """
+    Yields (chunk ids, worker results) in order, chunk_size ids at a time.
+    Forked workers inherit whatever the caller loaded beforehand; others
+    load it once in initializer.
+    """
+    chunks = [(ids[i : i + chunk_size], params) for i in range(0, len(ids), chunk_size)]
+    # Children must not share the parent's SQLite connection
+    connections.close_all()
+    with multiprocessing.Pool(processes, initializer=initializer) as pool:
+        for (chunk, _), results in zip(chunks, pool.imap(worker, chunks)):
+            yield chunk, results
+
+
+def precompute(
+    command,
+    ids: List[str],
+    params: dict,
+    worker: Callable,
+    initializer: Callable,
+    store: Callable[[List[str], list], None],
+    unit: str,
+    processes: Optional[int] = None,
+    chunk_size: int = 256,
+) -> float:
+    """
+    Runs imap_chunks for a management command, handing each chunk's results
+    to store and writing progress and throughput after it. Returns the
+    elapsed seconds.
+    """
+    start = time.perf_counter()
+    done = 0
+    for chunk, results in imap_chunks(
+        ids, params, worker, initializer, processes, chunk_size
+    ):
+        store(chunk, results)
+        done += len(chunk)
+        elapsed = time.perf_counter() - start
+        command.stdout.write(
+            f"{done}/{len(ids)} {unit} ({done / max(elapsed, 1e-9):.0f} {unit}/s)"
+        )
+    return time.perf_counter() - start
+
+
+class RowWriter:
+    """
+    Buffers precomputed rows of model and upserts them on unique_field,
+    WRITE_BATCH_SIZE rows per transaction.
+    """
+
+    def __init__(self, model, unique_field: str):
+        self.model = model
+        self.unique_field = unique_field
+        self._pending = []
+
+    def add(self, rows: Iterable) -> None:
+        self._pending.extend(rows)
+        if len(self._pending) >= WRITE_BATCH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        """Inserts or replaces the buffered rows in a single transaction."""
+        if not self._pending:
+            return
+        with transaction.atomic():
+            self.model.objects.bulk_create(
+                self._pending,
+                update_conflicts=True,
+                unique_fields=[self.unique_field],
+                update_fields=["params", "recommended_ids", "created_at"],
+            )
+        self._pending = []
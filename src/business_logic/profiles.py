@@ -0,0 +1,286 @@
+"""
+User genre profiles for content-based filtering.
+
+A users x categories float32 matrix of summed review scores (CSR), with its
+category vocabulary and each user's reviewed books, built in one pass over
+Review. Scoring a user is a row lookup and a product with the one-hot
+book x category matrix, which for one category per book is a gather.
+"""
+
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from business_logic.csr import rows_to_indptr
+from data_access.models import Review, ReviewVersion
+
+# Fields of the single Review pass, in review order
+REVIEW_FIELDS = (
+    "user_id",
+    "book_id",
+    "book__title",
+    "book__categories",
+    "review_score",
+)
+
+
+class UserProfiles:
+    """
+    Review-score sums per (user, category) and reviewed books per user.
+    A book's category is its whole categories string, as in the original
+    DataFrame encoding. Users refreshed after the build are kept as patches.
+    Each user's row is tagged with the ReviewVersion it was read at.
+    """
+
+    def __init__(
+        self,
+        user_ids: List[str],
+        categories: List[str],
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        data: np.ndarray,
+        review_indptr: np.ndarray,
+        review_books: np.ndarray,
+        book_ids: List[str],
+        book_titles: List[str],
+        book_categories: np.ndarray,
+    ):
+        self.categories = categories
+        self._category_index = {name: i for i, name in enumerate(categories)}
+        self._user_index = {user_id: i for i, user_id in enumerate(user_ids)}
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.review_indptr = review_indptr
+        self.review_books = review_books
+        self.book_ids = book_ids
+        self.book_titles = book_titles
+        self.book_categories = book_categories
+        self._book_index = {book_id: i for i, book_id in enumerate(book_ids)}
+        # user id -> (category codes, score sums, book ids, titles, book categories)
+        self._patches: Dict[str, tuple] = {}
+        # user id -> ReviewVersion of their row; absent means 0
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple]) -> "UserProfiles":
+        """Profiles from (user_id, book_id, title, categories, score) rows."""
+        users: Dict[str, int] = {}
+        categories: Dict[str, int] = {}
+        books: Dict[str, int] = {}
+        book_titles, book_categories = [], []
+        user_codes, book_codes, scores = [], [], []
+        for user_id, book_id, title, category, score in rows:
+            if user_id is None:
+                continue
+            book = books.get(book_id)
+            if book is None:
+                book = books[book_id] = len(books)
+                book_titles.append(title)
+                book_categories.append(
+                    categories.setdefault(category or "", len(categories))
+                )
+            user_codes.append(users.setdefault(user_id, len(users)))
+            book_codes.append(book)
+            scores.append(score or 0.0)
+
+        n_users, n_categories = len(users), len(categories)
+        user_codes = np.array(user_codes, dtype=np.int64)
+        book_codes = np.array(book_codes, dtype=np.int64)
+        book_categories = np.array(book_categories, dtype=np.int32)
+
+        # Reviewed books per user, in review order
+        by_user = np.argsort(user_codes, kind="stable")
+        review_indptr = rows_to_indptr(user_codes, n_users)
+        review_books = book_codes[by_user].astype(np.int32)
+
+        # Sum scores per (user, category) cell in one vectorized pass
+        cells = user_codes * max(n_categories, 1) + book_categories[book_codes]
+        cells, inverse = np.unique(cells, return_inverse=True)
+        sums = np.bincount(inverse, weights=np.array(scores, dtype=np.float64))
+        indptr = rows_to_indptr(cells // max(n_categories, 1), n_users)
+        indices = (cells % max(n_categories, 1)).astype(np.int32)
+
+        return cls(
+            list(users),
+            list(categories),
+            indptr,
+            indices,
+            sums.astype(np.float32),
+            review_indptr,
+            review_books,
+            list(books),
+            book_titles,
+            book_categories,
+        )
+
+    @classmethod
+    def build(cls) -> "UserProfiles":
+        """Profiles of every reviewer, streamed from one Review query."""
+        # Read first, so a review written mid-build is re-read on next use
+        versions = dict(ReviewVersion.objects.values_list("user_id", "version"))
+        rows = Review.objects.values_list(*REVIEW_FIELDS).order_by("review_id")
+        profiles = cls.from_rows(rows.iterator(chunk_size=2000))
+        profiles._versions = versions
+        return profiles
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._patches or user_id in self._user_index
+
+    def profile(self, user_id: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Category codes and summed scores of one user's row."""
+        patch = self._patches.get(user_id)
+        if patch is not None:
+            return patch[0], patch[1]
+        row = self._user_index.get(user_id)
+        if row is None:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return self.indices[start:end], self.data[start:end]
+
+    def reviews(self, user_id: str) -> Tuple[List[str], List[str], np.ndarray]:
+        """Book ids, titles and category codes the user reviewed, in order."""
+        patch = self._patches.get(user_id)
+        if patch is not None:
+            return patch[2], patch[3], patch[4]
+        row = self._user_index.get(user_id)
+        if row is None:
+            return [], [], np.empty(0, dtype=np.int32)
+        books = self.review_books[self.review_indptr[row] : self.review_indptr[row + 1]]
+        rows = books.tolist()
+        return (
+            [self.book_ids[book] for book in rows],
+            [self.book_titles[book] for book in rows],
+            self.book_categories[books],
+        )
+
+    def interest(self, user_id: str) -> Optional[np.ndarray]:
+        """
+        L2-normalized float32 interest over every category, or None when
+        the user covers fewer than two categories (nothing to rank).
+        """
+        categories, sums = self.profile(user_id)
+        if len(categories) < 2:
+            return None
+        vector = np.zeros(len(self.categories), dtype=np.float32)
+        vector[categories] = sums
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return None
+        return vector / norm
+
+    def version(self, user_id: str) -> int:
+        """ReviewVersion the user's row was read at."""
+        return self._versions.get(user_id, 0)
+
+    def refresh(self, user_id: str, rows: Iterable[tuple], version: int) -> None:
+        """
+        Replaces one user's row from their (book_id, title, categories,
+        score) review rows, in review order, read at ReviewVersion version.
+        """
+        with self._lock:
+            book_ids, titles, codes = [], [], []
+
+            def scores():
+                for book_id, title, category, score in rows:
+                    category = category or ""
+                    code = self._category_index.get(category)
+                    if code is None:
+                        code = self._category_index[category] = len(self.categories)
+                        self.categories.append(category)
+                    book_ids.append(book_id)
+                    titles.append(title)
+                    codes.append(code)
+                    yield score or 0.0
+
+            # Scores go straight into a float64 array as the rows stream in
+            weights = np.fromiter(scores(), dtype=np.float64)
+            codes = np.array(codes, dtype=np.int32)
+            categories, inverse = np.unique(codes, return_inverse=True)
+            sums = np.bincount(inverse, weights=weights, minlength=len(categories))
+            patches = dict(self._patches)
+            patches[user_id] = (
+                categories.astype(np.int32),
+                sums.astype(np.float32),
+                book_ids,
+                titles,
+                codes,
+            )
+            self._patches = patches
+            self._versions[user_id] = version
+
+    def is_stale_for(
+        self, book_id: str, title: Optional[str], categories: Optional[str]
+    ) -> bool:
+        """Whether an edit to a reviewed book changes what profiles hold."""
+        book = self._book_index.get(book_id)
+        if book is None:
+            return False
+        category = self.categories[self.book_categories[book]]
+        return self.book_titles[book] != title or category != (categories or "")
+
+
+_profiles: Optional[UserProfiles] = None
+_profiles_lock = threading.Lock()
+
+
+def get_user_profiles(user_ids: Iterable[Optional[str]] = ()) -> UserProfiles:
+    """
+    Returns the process-wide profiles, building them on first use. The rows
+    of user_ids are checked against ReviewVersion first, in one query, and
+    re-read if a review of theirs changed since, through any process.
+    """
+    global _profiles
+    profiles = _profiles
+    if profiles is None:
+        with _profiles_lock:
+            if _profiles is None:
+                _profiles = UserProfiles.build()
+            profiles = _profiles
+    user_ids = [user_id for user_id in user_ids if user_id is not None]
+    if user_ids:
+        versions = ReviewVersion.current(user_ids)
+        for user_id in user_ids:
+            version = versions.get(user_id, 0)
+            if profiles.version(user_id) != version:
+                profiles.refresh(user_id, user_review_rows(user_id), version)
+    return profiles
+
+
+def user_review_rows(user_id: str):
+    """
+    One user's (book_id, title, categories, score) rows, in review order.
+    Only these columns are selected: no Book or Review instances are built.
+    """
+    return (
+        Review.objects.filter(user_id=user_id)
+        .order_by("review_id")
+        .values_list(*REVIEW_FIELDS[1:])
+        .iterator(chunk_size=2000)
+    )
+
+
+def review_version(user_id: Optional[str]) -> int:
+    """
+    The user's ReviewVersion: bumped with every review write, through any
+    process, so results cached against it are retired everywhere.
+    """
+    if user_id is None:
+        return 0
+    return ReviewVersion.current([user_id]).get(user_id, 0)
+
+
+def book_changed(book_id: str, title: Optional[str], categories: Optional[str]) -> None:
+    """Drops the loaded profiles if a reviewed book's title or genre changed."""
+    profiles = _profiles
+    if profiles is not None and profiles.is_stale_for(book_id, title, categories):
+        reset_user_profiles()
+
+
+def reset_user_profiles() -> None:
+    """Drops the process-wide profiles; the next lookup rebuilds them."""
+    global _profiles
+    with _profiles_lock:
+        _profiles = None
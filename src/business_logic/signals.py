@@ -0,0 +1,69 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from business_logic.catalog_sync import refresh_catalog_indexes
+from business_logic.coreview import reset_coreview_index
+from business_logic.profiles import (
+    book_changed,
+    reset_user_profiles,
+)
+from data_access.models import (
+    Book,
+    CatalogVersion,
+    PrecomputedRecommendation,
+    PrecomputedUserRecommendation,
+    Review,
+    ReviewVersion,
+)
+from data_access.signals import books_imported
+
+
+# Indexes live in process memory, outside any transaction: they are patched
+# once the write commits, so a rollback never leaves phantom books in them.
+# Database side effects stay in the transaction and roll back with it.
+
+
+@receiver(post_save, sender=Book)
+def book_saved(sender, instance, **kwargs):
+    CatalogVersion.bump([instance.id])
+    # Its own neighborhood may have changed; other books refresh on the next run
+    PrecomputedRecommendation.objects.filter(book_id=instance.id).delete()
+    book_id, title, categories = instance.id, instance.title, instance.categories
+
+    def patch_indexes():
+        refresh_catalog_indexes()
+        book_changed(book_id, title, categories)
+
+    transaction.on_commit(patch_indexes)
+
+
+@receiver(post_delete, sender=Book)
+def book_deleted(sender, instance, **kwargs):
+    CatalogVersion.bump([instance.id])
+    transaction.on_commit(refresh_catalog_indexes)
+
+
+@receiver(books_imported)
+def books_bulk_imported(sender, book_ids, **kwargs):
+    if not book_ids:
+        return
+    CatalogVersion.bump(book_ids)
+
+    def patch_indexes():
+        refresh_catalog_indexes()
+        # Imports bring reviews in bulk too; rebuilt on next use
+        reset_user_profiles()
+        reset_coreview_index()
+
+    transaction.on_commit(patch_indexes)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def review_changed(sender, instance, **kwargs):
+    user_id = instance.user_id
+    if user_id is not None:
+        # Profiles and cached results in every process are retired by it
+        ReviewVersion.bump(user_id)
+    PrecomputedUserRecommendation.objects.filter(user_id=user_id).delete()
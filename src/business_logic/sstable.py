@@ -0,0 +1,125 @@
+"""
+Sorted string table: sorted UTF-8 keys with byte-string values in one file.
+
+Layout (little-endian):
+    magic        8 bytes   b"USSTBL01"
+    count        uint64
+    version      int64     catalog version the table was built from
+    key_offsets  uint64[count + 1], relative to the key blob
+    value_offsets uint64[count + 1], relative to the value blob
+    key blob     packed UTF-8 keys
+    value blob   packed values
+
+Opening a table maps the file and wraps the offset arrays in place, so it
+costs O(1) regardless of size; lookups binary-search the mapped keys. The
+mapping stays open for the lifetime of the table.
+"""
+
+import mmap
+import os
+from bisect import bisect_left
+from typing import Iterable, Sequence, Tuple
+
+import numpy as np
+
+MAGIC = b"USSTBL01"
+_HEADER = np.dtype([("magic", "S8"), ("count", "<u8"), ("version", "<i8")])
+
+
+class _Column(Sequence):
+    """Read-only sequence view over one blob of the table."""
+
+    def __init__(self, buffer, offsets: np.ndarray, start: int, decode: bool):
+        self._buffer = buffer
+        self._offsets = offsets
+        self._start = start
+        self._decode = decode
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        start = self._start + int(self._offsets[index])
+        end = self._start + int(self._offsets[index + 1])
+        value = self._buffer[start:end]
+        return value.decode("utf-8") if self._decode else value
+
+    def array(self, index: int, dtype: str) -> np.ndarray:
+        """Entry index viewed as an array without copying it out of the map."""
+        start = self._start + int(self._offsets[index])
+        size = int(self._offsets[index + 1] - self._offsets[index])
+        dtype = np.dtype(dtype)
+        return np.frombuffer(self._buffer, dtype, size // dtype.itemsize, start)
+
+
+class SSTable:
+    """Memory-mapped sorted string table; see the module docstring."""
+
+    def __init__(self, buffer):
+        header = np.frombuffer(buffer, dtype=_HEADER, count=1)[0]
+        if header["magic"] != MAGIC:
+            raise ValueError("Not a sorted string table")
+        count = int(header["count"])
+        self.version = int(header["version"])
+
+        position = _HEADER.itemsize
+        key_offsets = np.frombuffer(buffer, "<u8", count + 1, position)
+        position += key_offsets.nbytes
+        value_offsets = np.frombuffer(buffer, "<u8", count + 1, position)
+        position += value_offsets.nbytes
+
+        self.keys = _Column(buffer, key_offsets, position, decode=True)
+        position += int(key_offsets[-1])
+        self.values = _Column(buffer, value_offsets, position, decode=False)
+
+    @classmethod
+    def open(cls, path: str) -> "SSTable":
+        """Maps the table at path read-only."""
+        with open(path, "rb") as file:
+            return cls(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @staticmethod
+    def write(path: str, items: Iterable[Tuple[str, bytes]], version: int) -> None:
+        """
+        Writes (key, value) items, which must already be sorted by key.
+        The file is written next to path and renamed over it, so readers
+        never map a half-written table.
+        """
+        keys = []
+        values = []
+        for key, value in items:
+            keys.append(key.encode("utf-8"))
+            values.append(value)
+
+        key_offsets = np.zeros(len(keys) + 1, dtype="<u8")
+        np.cumsum(np.fromiter(map(len, keys), "<u8", len(keys)), out=key_offsets[1:])
+        value_offsets = np.zeros(len(values) + 1, dtype="<u8")
+        np.cumsum(
+            np.fromiter(map(len, values), "<u8", len(values)), out=value_offsets[1:]
+        )
+        header = np.array([(MAGIC, len(keys), version)], dtype=_HEADER)
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(header.tobytes())
+            file.write(key_offsets.tobytes())
+            file.write(value_offsets.tobytes())
+            file.writelines(keys)
+            file.writelines(values)
+        os.replace(tmp_path, path)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def find(self, key: str) -> int:
+        """Position of the first entry with exactly key, or -1."""
+        position = bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            return position
+        return -1
@@ -0,0 +1,318 @@
+"""
+"More like this" recommendations from book descriptions.
+
+data_access/preprocessing.py fits the TF-IDF model and saves its rows here
+as raw .npy arrays (CSR, vocabulary and book ids), so workers can mmap
+them. Rows are L2-normalized, so the cosine similarity of two books is the
+sparse dot product of their rows.
+"""
+
+import os
+import threading
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from business_logic.aspects import (
+    error_handler,
+    input_validator,
+    performance_monitor,
+    simple_cache,
+    validate_positive_int,
+)
+from business_logic.csr import rows_to_indptr, row_positions, save_arrays, top_rows
+from data_access.models import Book
+
+# Arrays making up a saved matrix
+TFIDF_ARRAYS = ("book_ids", "vocabulary", "indptr", "indices", "data")
+# Optional all-pairs neighbor table written by `build_tfidf_neighbors`; the
+# LSH tables of `build_lsh_index` are saved alongside as lsh_*.npy
+NEIGHBOR_ARRAYS = ("neighbors", "neighbor_scores")
+# Rows scored together by the batch mode; bounds its dense block_size x n buffer
+BLOCK_SIZE = 64
+# (entry, posting) products accumulated at once inside a block
+MAX_PRODUCTS = 4_000_000
+
+
+def _saved_lsh_arrays(path: str) -> Tuple[str, ...]:
+    """Names of the LSH arrays saved under the directory `path`, if any."""
+    if not os.path.isdir(path):
+        return ()
+    return tuple(
+        name[: -len(".npy")] for name in os.listdir(path) if name.startswith("lsh_")
+    )
+
+
+class TfidfIndex:
+    """
+    L2-normalized books x terms TF-IDF matrix in CSR form. The transposed
+    terms x books CSR is derived on first use, so scoring a book only
+    touches the postings of the terms in its description.
+    """
+
+    def __init__(
+        self,
+        book_ids: np.ndarray,
+        vocabulary: np.ndarray,
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        data: np.ndarray,
+        neighbors: Optional[np.ndarray] = None,
+        neighbor_scores: Optional[np.ndarray] = None,
+    ):
+        self.book_ids = book_ids
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.neighbors = neighbors
+        self.neighbor_scores = neighbor_scores
+        self._row_of = {
+            book_id.decode("utf-8"): row for row, book_id in enumerate(book_ids)
+        }
+        self._term_csr = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_csr(
+        cls,
+        book_ids: Sequence[str],
+        vocabulary: Sequence[str],
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        data: np.ndarray,
+    ) -> "TfidfIndex":
+        """Index over a fitted CSR matrix; rows are re-normalized to unit L2."""
+        indptr = np.asarray(indptr, dtype=np.int64)
+        data = np.asarray(data, dtype=np.float32)
+        rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        norms = np.sqrt(np.bincount(rows, weights=data**2, minlength=len(indptr) - 1))
+        norms[norms == 0] = 1
+        return cls(
+            np.array([book_id.encode("utf-8") for book_id in book_ids], dtype=bytes),
+            np.array([term.encode("utf-8") for term in vocabulary], dtype=bytes),
+            indptr,
+            np.asarray(indices, dtype=np.int32),
+            (data / norms[rows]).astype(np.float32),
+        )
+
+    def save(self, path: str) -> None:
+        """
+        Replaces the directory `path` with the matrix as raw .npy arrays.
+        Neighbor and LSH tables derived from an older matrix no longer
+        apply, so they are left behind.
+        """
+        save_arrays(path, {name: getattr(self, name) for name in TFIDF_ARRAYS})
+
+    def save_neighbors(self, path: str, n: int, block_size: int = BLOCK_SIZE) -> None:
+        """Computes the all-pairs top-n table and saves it next to the matrix."""
+        neighbors = np.full((len(self), n), -1, dtype=np.int32)
+        scores = np.zeros((len(self), n), dtype=np.float32)
+        for start, block_rows, block_scores in self.top_neighbors(n, block_size):
+            neighbors[start : start + len(block_rows)] = block_rows
+            scores[start : start + len(block_rows)] = block_scores
+        arrays = {"neighbors": neighbors, "neighbor_scores": scores}
+        # LSH tables hash the matrix, not the neighbor table, so they carry over
+        save_arrays(path, arrays, keep=TFIDF_ARRAYS + _saved_lsh_arrays(path))
+        self.neighbors, self.neighbor_scores = neighbors, scores
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "TfidfIndex":
+        """Loads a saved matrix, and its neighbor table if one was written."""
+        mode = "r" if mmap else None
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)
+            for name in TFIDF_ARRAYS
+        }
+        if all(
+            os.path.exists(os.path.join(path, f"{name}.npy"))
+            for name in NEIGHBOR_ARRAYS
+        ):
+            for name in NEIGHBOR_ARRAYS:
+                arrays[name] = np.load(
+                    os.path.join(path, f"{name}.npy"), mmap_mode=mode
+                )
+        return cls(**arrays)
+
+    def __len__(self) -> int:
+        return len(self.book_ids)
+
+    def __contains__(self, book_id: str) -> bool:
+        return book_id in self._row_of
+
+    def book_index(self, book_id: str) -> int:
+        return self._row_of.get(book_id, -1)
+
+    def to_book_ids(self, rows: Sequence[int]) -> List[str]:
+        return [self.book_ids[row].decode("utf-8") for row in rows]
+
+    def _terms(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Transposed terms x books CSR, built once."""
+        term_csr = self._term_csr
+        if term_csr is None:
+            with self._lock:
+                if self._term_csr is None:
+                    order = np.argsort(self.indices, kind="stable")
+                    rows = np.repeat(np.arange(len(self)), np.diff(self.indptr))
+                    self._term_csr = (
+                        rows_to_indptr(self.indices, len(self.vocabulary)),
+                        rows[order].astype(np.int32),
+                        np.asarray(self.data)[order],
+                    )
+                term_csr = self._term_csr
+        return term_csr
+
+    def similarities(self, row: int) -> np.ndarray:
+        """Cosine similarity of one book to every book, itself included."""
+        start, end = self.indptr[row], self.indptr[row + 1]
+        terms = np.asarray(self.indices[start:end], dtype=np.int64)
+        weights = np.asarray(self.data[start:end], dtype=np.float64)
+        term_indptr, term_books, term_data = self._terms()
+        positions = row_positions(term_indptr, terms)
+        products = term_data[positions] * np.repeat(
+            weights, term_indptr[terms + 1] - term_indptr[terms]
+        )
+        return np.bincount(
+            term_books[positions], weights=products, minlength=len(self)
+        ).astype(np.float32)
+
+    def has_neighbors(self, n: int) -> bool:
+        """Whether the stored neighbor table can answer top-n lookups."""
+        return self.neighbors is not None and n <= self.neighbors.shape[1]
+
+    def similar(self, book_id: str, n: int = 10) -> List[Tuple[str, float]]:
+        """The n most similar other books, best first, with their scores."""
+        row = self.book_index(book_id)
+        if row < 0:
+            return []
+        if self.has_neighbors(n):
+            rows = self.neighbors[row, :n]
+            scores = self.neighbor_scores[row, :n]
+            kept = rows >= 0
+            return list(zip(self.to_book_ids(rows[kept]), scores[kept].tolist()))
+        scores = self.similarities(row)
+        scores[row] = 0
+        rows = top_rows(scores, n)
+        return list(zip(self.to_book_ids(rows), scores[rows].tolist()))
+
+    def top_neighbors(
+        self, n: int, block_size: int = BLOCK_SIZE
+    ) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+        """
+        All-pairs top-n, one block of rows at a time: yields (first row,
+        neighbor rows, scores), with -1 padding rows that have fewer than n
+        similar books. Memory stays at block_size x len(self) scores plus
+        at most MAX_PRODUCTS partial products, however large the catalog.
+        """
+        term_indptr, term_books, term_data = self._terms()
+        n_books = len(self)
+        k = min(n, max(n_books - 1, 1))
+        for start in range(0, n_books, block_size):
+            stop = min(start + block_size, n_books)
+            entries = np.arange(self.indptr[start], self.indptr[stop])
+            entry_rows = np.repeat(
+                np.arange(stop - start), np.diff(self.indptr[start : stop + 1])
+            )
+            terms = np.asarray(self.indices[entries], dtype=np.int64)
+            lengths = term_indptr[terms + 1] - term_indptr[terms]
+
+            block = np.zeros((stop - start) * n_books, dtype=np.float64)
+            ends = np.cumsum(lengths)
+            chunk_start = 0
+            while chunk_start < len(entries):
+                # Next run of entries expanding into at most MAX_PRODUCTS products
+                done = ends[chunk_start - 1] if chunk_start else 0
+                chunk_end = int(
+                    np.searchsorted(ends, done + MAX_PRODUCTS, side="right")
+                )
+                chunk = slice(chunk_start, max(chunk_end, chunk_start + 1))
+                chunk_start = chunk.stop
+
+                positions = row_positions(term_indptr, terms[chunk])
+                repeats = lengths[chunk]
+                cells = np.repeat(entry_rows[chunk], repeats) * n_books
+                cells += term_books[positions]
+                products = term_data[positions] * np.repeat(
+                    np.asarray(self.data[entries[chunk]], dtype=np.float64), repeats
+                )
+                block += np.bincount(cells, weights=products, minlength=len(block))
+
+            scores = block.reshape(stop - start, n_books).astype(np.float32)
+            scores[np.arange(stop - start), np.arange(start, stop)] = 0
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            # Best first; equal scores in row order, like top_rows
+            order = np.lexsort((top, -top_scores))
+            top = np.take_along_axis(top, order, axis=1).astype(np.int32)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            top[top_scores <= 0] = -1
+            top_scores[top_scores <= 0] = 0
+            if k < n:
+                padding = ((0, 0), (0, n - k))
+                top = np.pad(top, padding, constant_values=-1)
+                top_scores = np.pad(top_scores, padding)
+            yield start, top, top_scores
+
+
+class DescriptionRecommender:
+    @staticmethod
+    @error_handler([])
+    @input_validator(validate_positive_int)
+    @performance_monitor
+    @simple_cache(600)
+    def get_recommendations(book_id, n_recommendations=10, approximate=False):
+        """
+        Books whose descriptions are most similar to book_id's, by TF-IDF
+        cosine similarity. Empty when no matrix has been saved yet.
+        With approximate, lookups the stored neighbor table cannot answer
+        go through the LSH index (if built) instead of an exact scan.
+        """
+        # lsh imports this module
+        from business_logic.lsh import get_lsh_index
+
+        index = get_tfidf_index()
+        if index is None:
+            return []
+        lsh = get_lsh_index() if approximate else None
+        if lsh is not None and not index.has_neighbors(n_recommendations):
+            similar = lsh.similar(book_id, n_recommendations)
+        else:
+            similar = index.similar(book_id, n_recommendations)
+        book_ids = [book for book, _ in similar]
+        # Books deleted since preprocessing simply drop out
+        book_map = Book.objects.in_bulk(book_ids)
+        return [book_map[similar] for similar in book_ids if similar in book_map]
+
+
+_index: Optional[TfidfIndex] = None
+_index_lock = threading.Lock()
+
+
+def _saved_index_path() -> Optional[str]:
+    path = getattr(settings, "TFIDF_INDEX_PATH", None)
+    if path and os.path.exists(os.path.join(path, "book_ids.npy")):
+        return str(path)
+    return None
+
+
+def get_tfidf_index() -> Optional[TfidfIndex]:
+    """Returns the process-wide matrix, mapping it on first use; None if unsaved."""
+    global _index
+    index = _index
+    if index is None:
+        path = _saved_index_path()
+        if path is None:
+            return None
+        with _index_lock:
+            if _index is None:
+                _index = TfidfIndex.load(path)
+            index = _index
+    return index
+
+
+def reset_tfidf_index() -> None:
+    """Drops the process-wide matrix; the next lookup maps it again."""
+    global _index
+    with _index_lock:
+        _index = None
@@ -0,0 +1,172 @@
+"""
+Catalog-wide sorted index of normalized title+author keys.
+
+Built once per process and shared read-only: prefix and range queries are
+two bisects plus a slice, O(log n + k), instead of a table scan.
+"""
+
+import heapq
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Iterable, List, Optional, Set, Tuple
+
+from business_logic.catalog_sync import CatalogFollower
+from data_access.models import Book
+
+# Sorts after every character a normalized key can contain
+_KEY_END = "\U0010ffff"
+# Separates the title from the authors inside a key
+_SEPARATOR = "\x00"
+# Changes applied one by one; larger batches are merged in one pass
+MERGE_THRESHOLD = 32
+
+
+def normalize(text: Optional[str]) -> str:
+    """Case-folded text with runs of whitespace collapsed."""
+    return " ".join((text or "").casefold().split())
+
+
+def title_key(title: Optional[str], authors: Optional[str]) -> str:
+    """Sort key of a book: its title first, then its authors."""
+    return normalize(title) + _SEPARATOR + normalize(authors)
+
+
+class TitleIndex:
+    """Book ids ordered by title_key, with bisect prefix and range lookups."""
+
+    def __init__(self, keys: List[str], book_ids: List[str]):
+        # One tuple so readers always see matching keys and ids
+        self._entries = (keys, book_ids)
+        self._key_of = dict(zip(book_ids, keys))
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[str, str, str]]) -> "TitleIndex":
+        """Index from (id, title, authors) rows."""
+        entries = sorted(
+            (title_key(title, authors), book_id) for book_id, title, authors in rows
+        )
+        return cls([key for key, _ in entries], [book_id for _, book_id in entries])
+
+    @classmethod
+    def build(cls) -> "TitleIndex":
+        """Index of every book in the catalog."""
+        rows = Book.objects.values_list("id", "title", "authors")
+        return cls.from_rows(rows.iterator(chunk_size=2000))
+
+    def __len__(self) -> int:
+        return len(self._entries[0])
+
+    def __contains__(self, book_id: str) -> bool:
+        return book_id in self._key_of
+
+    def prefix(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        """Ids of books whose title starts with prefix, in title order."""
+        prefix = normalize(prefix)
+        return self.range(prefix, prefix + _KEY_END, limit)
+
+    def range(self, low: str, high: str, limit: Optional[int] = None) -> List[str]:
+        """Ids of books with low <= key < high, in key order."""
+        keys, book_ids = self._entries
+        start = bisect_left(keys, low)
+        end = bisect_left(keys, high, lo=start)
+        if limit is not None:
+            end = min(end, start + limit)
+        return book_ids[start:end]
+
+    def upsert(
+        self, book_id: str, title: Optional[str], authors: Optional[str]
+    ) -> None:
+        """Adds or re-keys one book, replacing the entry lists copy-on-write."""
+        key = title_key(title, authors)
+        with self._lock:
+            old_key = self._key_of.get(book_id)
+            if old_key == key:
+                return
+            keys, book_ids = list(self._entries[0]), list(self._entries[1])
+            if old_key is not None:
+                position = self._position(keys, book_ids, old_key, book_id)
+                del keys[position], book_ids[position]
+            position = bisect_right(keys, key)
+            # Equal keys stay ordered by id, as in a fresh build
+            while (
+                position > 0
+                and keys[position - 1] == key
+                and book_ids[position - 1] > book_id
+            ):
+                position -= 1
+            keys.insert(position, key)
+            book_ids.insert(position, book_id)
+            self._entries = (keys, book_ids)
+            self._key_of[book_id] = key
+
+    def remove(self, book_id: str) -> None:
+        """Drops one book, replacing the entry lists copy-on-write."""
+        with self._lock:
+            old_key = self._key_of.pop(book_id, None)
+            if old_key is None:
+                return
+            keys, book_ids = list(self._entries[0]), list(self._entries[1])
+            position = self._position(keys, book_ids, old_key, book_id)
+            del keys[position], book_ids[position]
+            self._entries = (keys, book_ids)
+
+    def apply(
+        self, rows: Iterable[Tuple[str, str, str]], removed: Iterable[str]
+    ) -> None:
+        """
+        Upserts (id, title, authors) rows and drops removed ids. Large
+        batches are merged into the entry lists in one O(n + k log k) pass
+        rather than copying them once per book.
+        """
+        rows, removed = list(rows), list(removed)
+        if len(rows) + len(removed) <= MERGE_THRESHOLD:
+            for row in rows:
+                self.upsert(*row)
+            for book_id in removed:
+                self.remove(book_id)
+            return
+        changed = {
+            book_id: title_key(title, authors) for book_id, title, authors in rows
+        }
+        dropped = set(changed).union(removed)
+        added = sorted((key, book_id) for book_id, key in changed.items())
+        with self._lock:
+            kept = (entry for entry in zip(*self._entries) if entry[1] not in dropped)
+            entries = list(heapq.merge(kept, added))
+            self._entries = (
+                [key for key, _ in entries],
+                [book_id for _, book_id in entries],
+            )
+            key_of = dict(self._key_of)
+            for book_id in removed:
+                key_of.pop(book_id, None)
+            key_of.update(changed)
+            self._key_of = key_of
+
+    @staticmethod
+    def _position(keys: List[str], book_ids: List[str], key: str, book_id: str) -> int:
+        position = bisect_left(keys, key)
+        while book_ids[position] != book_id:
+            position += 1
+        return position
+
+
+def _apply_changes(index: TitleIndex, rows: List[tuple], removed: Set[str]) -> None:
+    index.apply(((row[0], row[1], row[2]) for row in rows), removed)
+
+
+_index = CatalogFollower(TitleIndex.build, _apply_changes)
+
+
+def get_title_index() -> TitleIndex:
+    """
+    Returns the process-wide index, building it on first use and patching
+    in books changed by any process since (see catalog_sync).
+    """
+    return _index.get()
+
+
+def reset_title_index() -> None:
+    """Drops the process-wide index; the next lookup rebuilds it."""
+    _index.reset()
@@ -0,0 +1,230 @@
+"""
+Radix tree over normalized titles and author names for autocomplete.
+
+Every node caches the ids of the TOP_K most rated books below it, so a
+suggestion lookup walks at most len(prefix) characters and never queries
+the database.
+"""
+
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from business_logic.catalog_sync import CatalogFollower
+from business_logic.title_index import normalize
+from data_access.models import Book
+
+# Suggestions cached per node; requests for more are capped to this
+TOP_K = 20
+
+
+def book_keys(title: Optional[str], authors: Optional[str]) -> List[str]:
+    """Normalized title and author names a book can be found under."""
+    keys = [normalize(title)]
+    keys.extend(normalize(author) for author in (authors or "").split(","))
+    return list(dict.fromkeys(key for key in keys if key))
+
+
+class TrieNode:
+    __slots__ = ("label", "children", "book_ids", "top")
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.children: Dict[str, "TrieNode"] = {}
+        # Books whose key ends exactly here
+        self.book_ids = set()
+        # Most rated book ids anywhere below, best first
+        self.top: List[str] = []
+
+
+class RadixTrie:
+    """Compressed trie mapping key prefixes to their most rated books."""
+
+    def __init__(self):
+        self.root = TrieNode()
+        # book id -> (title, authors, ratingsCount)
+        self._books: Dict[str, Tuple[str, str, float]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[str, str, str, float]]) -> "RadixTrie":
+        """Trie from (id, title, authors, ratingsCount) rows."""
+        trie = cls()
+        for row in rows:
+            trie.upsert(*row)
+        return trie
+
+    @classmethod
+    def build(cls) -> "RadixTrie":
+        """Trie over every book in the catalog."""
+        rows = Book.objects.values_list("id", "title", "authors", "ratingsCount")
+        return cls.from_rows(rows.iterator(chunk_size=2000))
+
+    def __len__(self) -> int:
+        return len(self._books)
+
+    def __contains__(self, book_id: str) -> bool:
+        return book_id in self._books
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Tuple[str, str, str]]:
+        """(id, title, authors) of the most rated books matching prefix."""
+        node = self._find(normalize(prefix))
+        if node is None:
+            return []
+        books = self._books
+        suggestions = []
+        for book_id in node.top[:limit]:
+            book = books.get(book_id)
+            if book is not None:
+                suggestions.append((book_id, book[0], book[1]))
+        return suggestions
+
+    def upsert(
+        self,
+        book_id: str,
+        title: Optional[str],
+        authors: Optional[str],
+        ratings_count: Optional[float] = None,
+    ) -> None:
+        """Adds a book, or re-files it under its new keys and rating."""
+        with self._lock:
+            if book_id in self._books:
+                self._remove(book_id)
+            self._books[book_id] = (title, authors, ratings_count or 0.0)
+            for key in book_keys(title, authors):
+                self._insert(key, book_id)
+
+    def remove(self, book_id: str) -> None:
+        """Drops a book from every node that lists it."""
+        with self._lock:
+            if book_id in self._books:
+                self._remove(book_id)
+                del self._books[book_id]
+
+    def _rank(self, book_id: str) -> Tuple[float, str]:
+        return -self._books[book_id][2], book_id
+
+    def _find(self, prefix: str) -> Optional[TrieNode]:
+        """Node whose subtree holds exactly the keys starting with prefix."""
+        node = self.root
+        i = 0
+        while i < len(prefix):
+            child = node.children.get(prefix[i])
+            if child is None:
+                return None
+            label = child.label
+            if prefix.startswith(label, i):
+                i += len(label)
+            elif label.startswith(prefix[i:]):
+                return child
+            else:
+                return None
+            node = child
+        return node
+
+    def _insert(self, key: str, book_id: str) -> None:
+        node = self.root
+        path = [node]
+        i = 0
+        while i < len(key):
+            child = node.children.get(key[i])
+            if child is None:
+                child = TrieNode(key[i:])
+                node.children[key[i]] = child
+                path.append(child)
+                node = child
+                break
+            common = 0
+            label = child.label
+            while common < len(label) and i + common < len(key):
+                if label[common] != key[i + common]:
+                    break
+                common += 1
+            if common < len(label):
+                # Split the edge; readers keep seeing the old child until
+                # the new middle node is swapped in
+                tail = TrieNode(label[common:])
+                tail.children = child.children
+                tail.book_ids = child.book_ids
+                tail.top = child.top
+                middle = TrieNode(label[:common])
+                middle.children[tail.label[0]] = tail
+                middle.top = child.top
+                node.children[key[i]] = middle
+                child = middle
+            path.append(child)
+            node = child
+            i += common
+
+        node.book_ids.add(book_id)
+        rank = self._rank(book_id)
+        for node in path:
+            self._offer(node, book_id, rank)
+
+    def _offer(self, node: TrieNode, book_id: str, rank: Tuple[float, str]) -> None:
+        top = node.top
+        if book_id in top:
+            return
+        if len(top) >= TOP_K and rank >= self._rank(top[-1]):
+            return
+        position = len(top)
+        while position > 0 and rank < self._rank(top[position - 1]):
+            position -= 1
+        node.top = (top[:position] + [book_id] + top[position:])[:TOP_K]
+
+    def _remove(self, book_id: str) -> None:
+        title, authors, _ = self._books[book_id]
+        depths = {}
+        for key in book_keys(title, authors):
+            path = self._path(key)
+            if path is None:
+                continue
+            path[-1].book_ids.discard(book_id)
+            for depth, node in enumerate(path):
+                depths[node] = depth
+        # Deepest first, so children's lists are final before their parents'
+        for node in sorted(depths, key=depths.get, reverse=True):
+            if book_id in node.top:
+                node.top = self._recompute(node, book_id)
+
+    def _path(self, key: str) -> Optional[List[TrieNode]]:
+        node = self.root
+        path = [node]
+        i = 0
+        while i < len(key):
+            node = node.children.get(key[i])
+            if node is None or not key.startswith(node.label, i):
+                return None
+            path.append(node)
+            i += len(node.label)
+        return path
+
+    def _recompute(self, node: TrieNode, excluded: str) -> List[str]:
+        """Top list of node from its own books and its children's lists."""
+        candidates = set(node.book_ids)
+        for child in node.children.values():
+            candidates.update(child.top)
+        candidates.discard(excluded)
+        return sorted(candidates, key=self._rank)[:TOP_K]
+
+
+def _apply_changes(trie: RadixTrie, rows: List[tuple], removed: Set[str]) -> None:
+    for book_id, title, authors, _, ratings_count in rows:
+        trie.upsert(book_id, title, authors, ratings_count)
+    for book_id in removed:
+        trie.remove(book_id)
+
+
+_trie = CatalogFollower(RadixTrie.build, _apply_changes)
+
+
+def get_trie() -> RadixTrie:
+    """
+    Returns the process-wide trie, building it on first use and patching
+    in books changed by any process since (see catalog_sync).
+    """
+    return _trie.get()
+
+
+def reset_trie() -> None:
+    """Drops the process-wide trie; the next lookup rebuilds it."""
+    _trie.reset()
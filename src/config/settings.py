@@ -101,6 +101,28 @@ CACHES = {
     }
 }
 
+# Book graph index written by `manage.py build_graph_index` (and by
+# `import_data`). Workers memory-map it at startup instead of rebuilding it
+# from the database, unless the catalog has changed since it was built.
+GRAPH_INDEX_PATH = BASE_DIR / "graph_index"
+
+# Catalog search index written by `manage.py build_search_index` (and by
+# `import_data`). Workers map it instead of rebuilding it from the database.
+SEARCH_INDEX_PATH = BASE_DIR / "search_index"
+
+# Description TF-IDF matrix written by data_access/preprocessing.py, plus the
+# neighbor table from `manage.py build_tfidf_neighbors` and the LSH tables
+# from `manage.py build_lsh_index`.
+TFIDF_INDEX_PATH = BASE_DIR / "tfidf_index"
+
+# Serve book page look-alikes from the LSH tables instead of the neighbor
+# table or an exact scan. Off by default: on benchmarks/lsh_benchmark.py the
+# exact scan is as fast as the default tables and has full recall.
+TFIDF_APPROXIMATE = False
+
+# Item-item co-review model written by `manage.py build_coreview_index`.
+COREVIEW_INDEX_PATH = BASE_DIR / "coreview_index"
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
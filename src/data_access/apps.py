@@ -3,4 +3,11 @@ from django.apps import AppConfig
 
 class DataAccessConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
-    name = "data_access"
\ No newline at end of file
+    name = "data_access"
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+
+        from data_access.fts import repair_after_migrate
+
+        post_migrate.connect(repair_after_migrate, sender=self)
@@ -0,0 +1,220 @@
+"""
+BM25-ranked full-text search over Book, backed by the SQLite FTS5 table
+that migration 0003 creates and keeps in sync with triggers.
+
+The table is an external-content index keyed on the implicit rowid of
+data_access_book, whose primary key is a CharField. VACUUM may renumber
+that rowid, and a migration that remakes data_access_book drops the
+triggers. check() detects both and rebuild() repairs them; post_migrate
+runs the pair after every migrate, and `manage.py rebuild_fts_index`
+after a VACUUM.
+"""
+
+from typing import List, Optional
+
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connection, connections
+
+FTS_TABLE = "data_access_book_fts"
+# bm25() weights for title, authors, categories and description
+FTS_WEIGHTS = (10.0, 5.0, 2.0, 1.0)
+
+TABLE_SQL = f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        title, authors, categories, description,
+        content='data_access_book', content_rowid='rowid'
+    )
+"""
+TRIGGER_SQL = {
+    f"{FTS_TABLE}_ai": f"""
+    CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON data_access_book BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, authors, categories, description)
+        VALUES (new.rowid, new.title, new.authors, new.categories, new.description);
+    END
+    """,
+    f"{FTS_TABLE}_ad": f"""
+    CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON data_access_book BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, authors, categories, description)
+        VALUES ('delete', old.rowid, old.title, old.authors, old.categories, old.description);
+    END
+    """,
+    f"{FTS_TABLE}_au": f"""
+    CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON data_access_book BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, authors, categories, description)
+        VALUES ('delete', old.rowid, old.title, old.authors, old.categories, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, authors, categories, description)
+        VALUES (new.rowid, new.title, new.authors, new.categories, new.description);
+    END
+    """,
+}
+REBUILD_SQL = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+CREATE_SQL = [TABLE_SQL, *TRIGGER_SQL.values(), REBUILD_SQL]
+DROP_SQL = [f"DROP TRIGGER IF EXISTS {name}" for name in TRIGGER_SQL] + [
+    f"DROP TABLE IF EXISTS {FTS_TABLE}"
+]
+
+
+def match_expression(query: str) -> str:
+    """
+    FTS5 query matching every word of query, the last one as a prefix.
+    Words are quoted, so user input never reaches the FTS5 query syntax.
+    """
+    words = ['"' + word.replace('"', '""') + '"' for word in query.split()]
+    if words:
+        words[-1] += "*"
+    return " ".join(words)
+
+
+def _ranked_sql(select: str) -> str:
+    return (
+        f"SELECT {select} FROM {FTS_TABLE} "
+        f"JOIN data_access_book AS book ON book.rowid = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH %s"
+    )
+
+
+def search_books(
+    query: str, limit: Optional[int] = None, offset: int = 0
+) -> Optional[List[str]]:
+    """
+    Ids of books matching query across title, authors, categories and
+    description, best BM25 score first; None when FTS5 is unavailable.
+    limit and offset page through them in SQL.
+    """
+    if connection.vendor != "sqlite":
+        return None
+    expression = match_expression(query)
+    if not expression:
+        return []
+    weights = ", ".join(str(weight) for weight in FTS_WEIGHTS)
+    sql = _ranked_sql("book.id") + (
+        f" ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s OFFSET %s"
+    )
+    try:
+        with connection.cursor() as cursor:
+            # LIMIT -1 is no limit in SQLite
+            cursor.execute(sql, [expression, -1 if limit is None else limit, offset])
+            return [row[0] for row in cursor.fetchall()]
+    except DatabaseError:
+        # No FTS5 table: migrated without FTS5 support
+        return None
+
+
+def count_books(query: str) -> Optional[int]:
+    """Number of books search_books(query) returns; None when FTS5 is unavailable."""
+    if connection.vendor != "sqlite":
+        return None
+    expression = match_expression(query)
+    if not expression:
+        return 0
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(_ranked_sql("count(*)"), [expression])
+            return cursor.fetchone()[0]
+    except DatabaseError:
+        return None
+
+
+class RankedBooks:
+    """
+    Ranked ids of a query as a lazy sequence for Paginator: the length is
+    one COUNT query, and a slice reads just that page with LIMIT/OFFSET.
+    """
+
+    def __init__(self, query: str, count: int):
+        self.query = query
+        self._count = count
+
+    def count(self) -> int:
+        return self._count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError("RankedBooks only supports slices")
+        start, stop, _ = index.indices(self._count)
+        if stop <= start:
+            return []
+        return search_books(self.query, stop - start, start) or []
+
+
+def ranked_books(query: str) -> Optional[RankedBooks]:
+    """Every match of query, read a page at a time; None when FTS5 is unavailable."""
+    count = count_books(query)
+    return None if count is None else RankedBooks(query, count)
+
+
+def _table_exists(cursor) -> bool:
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE]
+    )
+    return cursor.fetchone() is not None
+
+
+def _triggers(cursor) -> set:
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def check(using: str = DEFAULT_DB_ALIAS) -> List[str]:
+    """
+    Ways the FTS5 table has drifted from data_access_book: dropped sync
+    triggers, or index entries that no longer match the rows (after a
+    VACUUM or any write made without the triggers). Empty when consistent
+    or when there is no FTS5 table.
+    """
+    db = connections[using]
+    if db.vendor != "sqlite":
+        return []
+    with db.cursor() as cursor:
+        if not _table_exists(cursor):
+            return []
+        existing = _triggers(cursor)
+        problems = [
+            f"missing trigger {name}" for name in TRIGGER_SQL if name not in existing
+        ]
+        try:
+            # rank=1 also compares the index against the content table
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('integrity-check', 1)"
+            )
+        except DatabaseError:
+            problems.append("index does not match data_access_book")
+    return problems
+
+
+def rebuild(using: str = DEFAULT_DB_ALIAS) -> bool:
+    """
+    Recreates missing sync triggers and rebuilds the index from
+    data_access_book. False when there is no FTS5 table.
+    """
+    db = connections[using]
+    if db.vendor != "sqlite":
+        return False
+    with db.cursor() as cursor:
+        if not _table_exists(cursor):
+            return False
+        existing = _triggers(cursor)
+        for name, sql in TRIGGER_SQL.items():
+            if name not in existing:
+                cursor.execute(sql)
+        cursor.execute(REBUILD_SQL)
+    return True
+
+
+def repair_after_migrate(sender, using=DEFAULT_DB_ALIAS, **kwargs) -> None:
+    """post_migrate receiver: rebuilds the index if a migration broke its sync."""
+    if check(using):
+        rebuild(using)
+
+
+def optimize() -> None:
+    """Merges the index segments left by a bulk load, if the table exists."""
+    if connection.vendor != "sqlite":
+        return
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    except DatabaseError:
+        pass
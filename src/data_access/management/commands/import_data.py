@@ -1,10 +1,13 @@
 import csv
 import os
 
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from django.db import transaction
 
+from data_access import fts
 from data_access.models import Book, Review
+from data_access.signals import books_imported
 
 BOOK_BATCH_SIZE = 500
 REVIEW_BATCH_SIZE = 1000
@@ -25,6 +28,12 @@ class Command(BaseCommand):
         self.stdout.write("Starting database seeding...")
         seed_data(file_path)
         self.stdout.write("Database seeding complete.")
+        # Saved indexes are keyed to the new catalog version, so restarted
+        # workers map them instead of rebuilding or serving the old catalog
+        call_command("build_graph_index", stdout=self.stdout)
+        call_command("build_search_index", stdout=self.stdout)
+        # A saved co-review model would otherwise predate the imported reviews
+        call_command("build_coreview_index", stdout=self.stdout)
 
 
 def seed_data(file_path):
@@ -32,6 +41,7 @@ def seed_data(file_path):
     books = {}
     title_to_id_map = {}
     reviews = []
+    imported_ids = []
 
     with open(file_path, newline="", encoding="utf-8") as csvfile:
         reader = csv.DictReader(csvfile)
@@ -73,12 +83,21 @@ def seed_data(file_path):
             # Check batch sizes: if the batch sizes are reached, flush the objects.
             if len(books) >= BOOK_BATCH_SIZE and len(reviews) >= REVIEW_BATCH_SIZE:
                 bulk_insert(books, reviews)
+                imported_ids.extend(books)
                 books.clear()
                 reviews.clear()
 
         # Insert any remaining objects after processing the whole CSV.
         if books or reviews:
             bulk_insert(books, reviews)
+            imported_ids.extend(books)
+
+    # Triggers filled the full-text index row by row; compact it once
+    fts.optimize()
+
+    # bulk_create sends no post_save: bump the catalog version, logging the
+    # imported ids, which running servers then patch into their indexes
+    books_imported.send(sender=Book, book_ids=imported_ids)
 
 
 def bulk_insert(books_dict, reviews_list):
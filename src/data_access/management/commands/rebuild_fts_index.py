@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from data_access import fts
+
+
+class Command(BaseCommand):
+    help = (
+        "Checks the full-text search index against the book table and rebuilds "
+        "it. Run after VACUUM, which may renumber the rows it is keyed on."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report problems, failing if there are any.",
+        )
+
+    def handle(self, *args, **kwargs):
+        problems = fts.check()
+        for problem in problems:
+            self.stdout.write(self.style.WARNING(problem))
+        if kwargs["check"]:
+            if problems:
+                raise CommandError("The full-text search index is out of sync")
+            self.stdout.write(
+                self.style.SUCCESS("The full-text search index is in sync")
+            )
+            return
+        if not fts.rebuild():
+            raise CommandError(
+                "No FTS5 table; this database keeps the substring search"
+            )
+        self.stdout.write(self.style.SUCCESS("Rebuilt the full-text search index"))
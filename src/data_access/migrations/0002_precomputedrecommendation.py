@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-18 12:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_access", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PrecomputedRecommendation",
+            fields=[
+                (
+                    "book",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="precomputed_recommendation",
+                        serialize=False,
+                        to="data_access.book",
+                    ),
+                ),
+                ("params", models.JSONField()),
+                ("recommended_ids", models.JSONField()),
+                ("created_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
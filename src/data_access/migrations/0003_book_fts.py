@@ -0,0 +1,76 @@
+from django.db import migrations
+
+# External-content FTS5 table over data_access_book, kept in sync by
+# triggers so ORM saves, deletes and bulk_create all update it. Migrations
+# that remake data_access_book on SQLite drop the triggers with it;
+# post_migrate recreates them (see data_access.fts.check). The SQL is
+# written out here so later edits to data_access.fts never change what
+# this migration did.
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE data_access_book_fts USING fts5(
+        title, authors, categories, description,
+        content='data_access_book', content_rowid='rowid'
+    )
+    """,
+    """
+    CREATE TRIGGER data_access_book_fts_ai AFTER INSERT ON data_access_book BEGIN
+        INSERT INTO data_access_book_fts(rowid, title, authors, categories, description)
+        VALUES (new.rowid, new.title, new.authors, new.categories, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER data_access_book_fts_ad AFTER DELETE ON data_access_book BEGIN
+        INSERT INTO data_access_book_fts(data_access_book_fts, rowid, title, authors, categories, description)
+        VALUES ('delete', old.rowid, old.title, old.authors, old.categories, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER data_access_book_fts_au AFTER UPDATE ON data_access_book BEGIN
+        INSERT INTO data_access_book_fts(data_access_book_fts, rowid, title, authors, categories, description)
+        VALUES ('delete', old.rowid, old.title, old.authors, old.categories, old.description);
+        INSERT INTO data_access_book_fts(rowid, title, authors, categories, description)
+        VALUES (new.rowid, new.title, new.authors, new.categories, new.description);
+    END
+    """,
+    "INSERT INTO data_access_book_fts(data_access_book_fts) VALUES ('rebuild')",
+]
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS data_access_book_fts_ai",
+    "DROP TRIGGER IF EXISTS data_access_book_fts_ad",
+    "DROP TRIGGER IF EXISTS data_access_book_fts_au",
+    "DROP TABLE IF EXISTS data_access_book_fts",
+]
+
+
+def fts5_available(connection):
+    if connection.vendor != "sqlite":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return "ENABLE_FTS5" in {row[0] for row in cursor.fetchall()}
+
+
+def create_book_fts(apps, schema_editor):
+    # Other databases, or SQLite builds without FTS5, keep the LIKE search
+    if fts5_available(schema_editor.connection):
+        for sql in CREATE_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_book_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        for sql in DROP_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_access", "0002_precomputedrecommendation"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_book_fts, drop_book_fts),
+    ]
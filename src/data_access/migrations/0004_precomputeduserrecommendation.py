@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 13:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_access", "0003_book_fts"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PrecomputedUserRecommendation",
+            fields=[
+                (
+                    "user_id",
+                    models.CharField(max_length=255, primary_key=True, serialize=False),
+                ),
+                ("params", models.JSONField()),
+                ("recommended_ids", models.JSONField()),
+                ("created_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
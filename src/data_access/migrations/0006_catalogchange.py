@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 14:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_access", "0005_catalogversion"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CatalogChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version", models.BigIntegerField(db_index=True)),
+                ("book_id", models.CharField(max_length=255)),
+            ],
+        ),
+    ]
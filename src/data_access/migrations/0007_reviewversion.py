@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 14:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_access", "0006_catalogchange"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReviewVersion",
+            fields=[
+                (
+                    "user_id",
+                    models.CharField(max_length=255, primary_key=True, serialize=False),
+                ),
+                ("version", models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
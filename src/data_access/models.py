@@ -1,5 +1,7 @@
-from django.db import models
-from django.db.models import Avg, QuerySet
+from typing import Dict, Iterable
+
+from django.db import models, transaction
+from django.db.models import Avg, F, QuerySet
 
 
 class Book(models.Model):
@@ -31,3 +33,105 @@ class Review(models.Model):
 
     def __str__(self):
         return f"Review {self.review_id} for {self.book.title}"
+
+
+class CatalogVersion(models.Model):
+    """
+    Single-row counter bumped on every Book save, delete and bulk import.
+    Indexes are tagged with it; the books changed at each version are logged
+    as CatalogChange rows, so an index behind it re-reads only those.
+    """
+
+    version = models.BigIntegerField(default=0)
+
+    @classmethod
+    def current(cls) -> int:
+        return cls.objects.filter(pk=1).values_list("version", flat=True).first() or 0
+
+    @classmethod
+    def bump(cls, book_ids: Iterable[str]) -> int:
+        """Moves the counter on and logs book_ids as changed at the new value."""
+        with transaction.atomic():
+            if not cls.objects.filter(pk=1).update(version=F("version") + 1):
+                cls.objects.get_or_create(pk=1, defaults={"version": 1})
+            version = cls.current()
+            CatalogChange.objects.bulk_create(
+                (
+                    CatalogChange(version=version, book_id=book_id)
+                    for book_id in book_ids
+                ),
+                batch_size=2000,
+            )
+        return version
+
+    def __str__(self):
+        return f"Catalog version {self.version}"
+
+
+class CatalogChange(models.Model):
+    """One book saved, deleted or imported at a CatalogVersion."""
+
+    version = models.BigIntegerField(db_index=True)
+    # No foreign key: deleted books are logged too
+    book_id = models.CharField(max_length=255)
+
+    def __str__(self):
+        return f"{self.book_id} at catalog version {self.version}"
+
+
+class ReviewVersion(models.Model):
+    """
+    Per-user counter bumped on every Review save and delete. A user's
+    profile row is tagged with it, so every process notices reviews written
+    through any other.
+    """
+
+    user_id = models.CharField(primary_key=True, max_length=255)
+    version = models.BigIntegerField(default=0)
+
+    @classmethod
+    def current(cls, user_ids: Iterable[str]) -> Dict[str, int]:
+        """Counters of the given users; users never bumped are left out."""
+        return dict(
+            cls.objects.filter(user_id__in=list(user_ids)).values_list(
+                "user_id", "version"
+            )
+        )
+
+    @classmethod
+    def bump(cls, user_id: str) -> None:
+        with transaction.atomic():
+            if not cls.objects.filter(pk=user_id).update(version=F("version") + 1):
+                cls.objects.get_or_create(pk=user_id, defaults={"version": 1})
+
+    def __str__(self):
+        return f"Review version {self.version} of {self.user_id}"
+
+
+class PrecomputedRecommendation(models.Model):
+    """Graph recommendations computed offline by precompute_recommendations."""
+
+    book = models.OneToOneField(
+        Book,
+        primary_key=True,
+        related_name="precomputed_recommendation",
+        on_delete=models.CASCADE,
+    )
+    params = models.JSONField()
+    recommended_ids = models.JSONField()
+    created_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Recommendations for {self.book_id}"
+
+
+class PrecomputedUserRecommendation(models.Model):
+    """CBF recommendations stored by precompute_user_recommendations."""
+
+    user_id = models.CharField(primary_key=True, max_length=255)
+    params = models.JSONField()
+    recommended_ids = models.JSONField()
+    created_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Recommendations for user {self.user_id}"
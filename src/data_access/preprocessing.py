@@ -1,3 +1,6 @@
+import os
+import sys
+
 import pandas as pd
 import nltk
 nltk.download('punkt')
@@ -6,6 +9,14 @@ from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize
 from sklearn.feature_extraction.text import TfidfVectorizer
 
+# The matrix is saved through the app, so Django settings must be loaded
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+import django
+django.setup()
+from django.conf import settings
+from business_logic.tfidf import TfidfIndex
+
 # Load dataset
 df = pd.read_csv("merged_dataframe.csv")
 
@@ -47,3 +58,12 @@ print(tfidf_matrix.shape)  # Should match the number of books and features
 
 # Save Processed Data for Faster Access
 df.to_csv("processed_books.csv", index=False)
+
+# Save the L2-normalized TF-IDF rows for the "more like this" recommender
+TfidfIndex.from_csr(
+    df['Id'].astype(str).tolist(),
+    vectorizer.get_feature_names_out().tolist(),
+    tfidf_matrix.indptr,
+    tfidf_matrix.indices,
+    tfidf_matrix.data,
+).save(settings.TFIDF_INDEX_PATH)
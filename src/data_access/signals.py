@@ -0,0 +1,7 @@
+from django.dispatch import Signal
+
+# Sent once a bulk import has committed, with the imported primary keys as
+# `book_ids`. bulk_create skips post_save, so derived indexes listen here.
+# Only receivers in the importing process hear it; other processes see the
+# import through the catalog version of the indexes they load.
+books_imported = Signal()
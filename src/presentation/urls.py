@@ -6,6 +6,11 @@ urlpatterns = [
     path("", views.index, name="index"),
     path("search/", views.search, name="search"),
     path("book/<str:book_id>/", views.book_details, name="book_details"),
+    path(
+        "recommendations/user/<str:user_id>/",
+        views.user_recommendations,
+        name="user_recommendations",
+    ),
     path("autocomplete/", views.autocomplete, name="autocomplete"),
     path("top-books/", views.top_books, name="top_books"),
     path("about/", views.about, name="about"),
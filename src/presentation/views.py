@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib.auth import login, update_session_auth_hash
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import PasswordChangeForm
@@ -7,11 +8,20 @@ from django.shortcuts import get_object_or_404, redirect, render
 from django.template.loader import render_to_string
 from django.utils.cache import patch_cache_control, patch_vary_headers
 
-from business_logic.aspects import error_handler, method_logger, performance_monitor
-from business_logic.bst import BST
-from business_logic.cbf import BookRecommender
+from business_logic.aspects import (
+    error_handler,
+    method_logger,
+    performance_monitor,
+    validate_positive_int,
+)
+from business_logic.bst import BST, fuzzy_search_catalog, search_catalog
+from business_logic.cbf import CBF_MODES, DEFAULT_CBF_MODE, BookRecommender
 from business_logic.merge_sort import MergeSort
+from business_logic.tfidf import DescriptionRecommender
+from business_logic.title_index import get_title_index
 from business_logic.top_k import BookRanker
+from business_logic.trie import TOP_K, get_trie
+from data_access import fts
 from data_access.models import Book
 
 from .forms import SignUpForm
@@ -22,6 +32,13 @@ def _cache_page(response):
     patch_cache_control(response, max_age=60 * 15, public=False, private=True)
 
 
+def _paginate_ids(ids, page, per_page):
+    """Page of an ordered id list, with its books fetched in one query."""
+    page_obj = Paginator(ids, per_page).get_page(page)
+    id_to_book = Book.objects.in_bulk(page_obj.object_list)
+    return page_obj, [id_to_book[i] for i in page_obj.object_list if i in id_to_book]
+
+
 @performance_monitor
 @method_logger
 def index(request):
@@ -57,29 +74,49 @@ def search(request):
     order = request.GET.get("order", "asc")
     view = request.GET.get("view", "grid")
     query = request.GET.get("q", "").strip()
-    books_query = Book.objects.all().order_by("id")
-    if query:
-        books_query = books_query.filter(title__icontains=query) | books_query.filter(
-            authors__icontains=query
-        )
-        books_query = books_query.distinct()
-
-    # Pagination
-    paginator = Paginator(books_query, per_page)
-    page_obj = paginator.get_page(page)
-    page_books = list(page_obj.object_list)
-
-    # Search BST
-    if query:
-        books = BST.search_in_books(page_books, query)
+    mode = request.GET.get("mode", "")
+    after = request.GET.get("after") or None
+    next_after = None
+
+    ranked_ids = fts.ranked_books(query) if query and mode == "fts" else None
+
+    if query and mode == "prefix":
+        # Title prefix over the whole catalog from the sorted index
+        page_obj, books = _paginate_ids(get_title_index().prefix(query), page, per_page)
+    elif query and mode == "fuzzy":
+        # Typo-tolerant: trigram candidates re-ranked by edit distance
+        page_obj, books = _paginate_ids(fuzzy_search_catalog(query), page, per_page)
+    elif ranked_ids is not None:
+        # BM25-ranked full-text matches over every text field, paged in SQL
+        page_obj, books = _paginate_ids(ranked_ids, page, per_page)
+    elif query:
+        # Substring matches over the whole catalog from the trigram index.
+        # Also the fallback for mode=fts when FTS5 is unavailable.
+        # Paged by key: after is the last key of the previous page, and the
+        # window holds one more key so the BST page knows whether any follow
+        page_obj = None
+        window = search_catalog(query, per_page + 1, after)
+        id_to_book = Book.objects.in_bulk(window)
+        page_books = [id_to_book[i] for i in window if i in id_to_book]
+
+        # Search BST
+        books, next_after = BST.search_page_in_books(page_books, query, per_page)
     else:
-        books = page_books
+        paginator = Paginator(Book.objects.all().order_by("id"), per_page)
+        page_obj = paginator.get_page(page)
+        books = list(page_obj.object_list)
 
-    sorted_books = MergeSort.sort_books(books, sort, ascending=(order == "asc"))
+    if mode in ("fuzzy", "fts") and "sort" not in request.GET:
+        # Keep the most relevant matches first unless a sort was asked for
+        sorted_books = books
+    else:
+        sorted_books = MergeSort.sort_books(books, sort, ascending=(order == "asc"))
 
     context = {
         "books": sorted_books,
         "page_obj": page_obj,
+        "after": after,
+        "next_after": next_after,
         "current_sort": sort,
         "current_order": order,
         "view": view,
@@ -95,19 +132,42 @@ def search(request):
 @method_logger
 def autocomplete(request):
     prefix = request.GET.get("q", "").strip()
-    max_results = int(request.GET.get("max", 10))
+    try:
+        max_results = int(request.GET.get("max", 10))
+        validate_positive_int((), {"max_results": max_results})
+    except ValueError:
+        return JsonResponse({"error": "Invalid max"}, status=400)
     if not prefix:
         return JsonResponse({"suggestions": []})
     # Custom BST is super slow and is required for search.
-    # This uses indexed DB query (O(log n + k)) since it is not required for
-    # autocomplete.
-    books = Book.objects.filter(title__istartswith=prefix).order_by("title")[
-        :max_results
+    # Autocomplete walks the in-memory trie (O(len(prefix))), which ranks
+    # titles and authors by ratingsCount without a database query.
+    suggestions = get_trie().suggest(prefix, min(max_results, TOP_K))
+    data = [
+        {"id": book_id, "title": title, "authors": authors}
+        for book_id, title, authors in suggestions
     ]
-    data = [{"id": b.id, "title": b.title, "authors": b.authors} for b in books]
     return JsonResponse({"suggestions": data})
 
 
+@performance_monitor
+@method_logger
+def user_recommendations(request, user_id):
+    mode = request.GET.get("mode", DEFAULT_CBF_MODE)
+    try:
+        n_recommendations = int(request.GET.get("n", 10))
+    except ValueError:
+        n_recommendations = 0
+    if mode not in CBF_MODES or n_recommendations <= 0:
+        return JsonResponse({"error": "Invalid mode or n"}, status=400)
+    # Cached per user until they write a review anywhere; no page cache on top
+    books = BookRecommender.get_user_cbf_list(user_id, n_recommendations, mode)
+    data = [
+        {"id": book.id, "title": book.title, "authors": book.authors} for book in books
+    ]
+    return JsonResponse({"user_id": user_id, "mode": mode, "recommendations": data})
+
+
 @performance_monitor
 @method_logger
 def book_details(request, book_id):
@@ -115,11 +175,20 @@ def book_details(request, book_id):
     reviews = book.reviews.all()
 
     recommended_books = BookRecommender.get_cbf_list(book_id, n_recommendations=8)
+    # Description look-alikes; empty until preprocessing saved the matrix
+    similar_books = DescriptionRecommender.get_recommendations(
+        book_id, n_recommendations=8, approximate=settings.TFIDF_APPROXIMATE
+    )
 
     response = render(
         request,
         "book_details.html",
-        {"book": book, "reviews": reviews, "recommended_books": recommended_books},
+        {
+            "book": book,
+            "reviews": reviews,
+            "recommended_books": recommended_books,
+            "similar_books": similar_books,
+        },
     )
     _cache_page(response)
     return response
@@ -0,0 +1,36 @@
+import pytest
+from django.core.cache import cache
+
+from business_logic.bst import reset_catalog_index
+from business_logic.coreview import reset_coreview_index
+from business_logic.graph_index import reset_graph_index
+from business_logic.lsh import reset_lsh_index
+from business_logic.profiles import reset_user_profiles
+from business_logic.tfidf import reset_tfidf_index
+from business_logic.title_index import reset_title_index
+from business_logic.trie import reset_trie
+
+RESETS = (
+    reset_graph_index,
+    reset_title_index,
+    reset_catalog_index,
+    reset_trie,
+    reset_user_profiles,
+    reset_coreview_index,
+    reset_tfidf_index,
+    reset_lsh_index,
+    cache.clear,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_all_indexes():
+    """
+    Indexes and cached results live for the whole process, and test
+    transactions roll back without signals, so every test starts cold
+    """
+    for reset in RESETS:
+        reset()
+    yield
+    for reset in RESETS:
+        reset()
@@ -62,6 +62,54 @@ def test_simple_cache(mock_cache):
     assert not mock_cache.set.called
 
 
+@patch("src.business_logic.aspects.cache")
+def test_simple_cache_version(mock_cache):
+    """Test that simple_cache keys entries on the version callable."""
+    mock_cache.get.return_value = None
+    version = [1]
+
+    @simple_cache(version=lambda: version[0])
+    def sample_function(x):
+        return x * 2
+
+    sample_function(5)
+    sample_function(5)
+    version[0] = 2
+    sample_function(5)
+
+    keys = [call.args[0] for call in mock_cache.get.call_args_list]
+    assert keys[0] == keys[1]
+    assert keys[1] != keys[2]
+
+
+@patch("src.business_logic.aspects.cache")
+def test_simple_cache_version_arg(mock_cache):
+    """Test that version_arg versions entries per value of that argument."""
+    mock_cache.get.return_value = None
+    versions = {"a": 1, "b": 1}
+    seen = []
+
+    def version(key):
+        seen.append(key)
+        return versions[key]
+
+    @simple_cache(version=version, version_arg="key")
+    def sample_function(key, times=2):
+        return key * times
+
+    sample_function("a")
+    sample_function("b")
+    versions["a"] = 2
+    sample_function("a")
+    sample_function("b")
+    sample_function(times=3, key="b")
+
+    keys = [call.args[0] for call in mock_cache.get.call_args_list]
+    assert keys[0] != keys[2]
+    assert keys[1] == keys[3]
+    assert seen == ["a", "b", "a", "b", "b"]
+
+
 def test_error_handler():
     """Test that error_handler decorator handles exceptions properly."""
 
@@ -1,7 +1,11 @@
+import io
+
 import pytest
 
+from business_logic import bfs
 from business_logic.bfs import GraphRecommender
-from data_access.models import Book
+from business_logic.graph_index import reset_graph_index
+from data_access.models import Book, PrecomputedRecommendation
 
 
 @pytest.mark.django_db
@@ -82,6 +86,134 @@ class TestGraphRecommender:
         if len(default_recommendations) > 2:
             assert len(limited_recommendations) < len(default_recommendations)
 
+    def test_get_recommendations_ppr(self, sample_books):
+        """Test PageRank mode ranks books sharing more features first"""
+        recommendations = GraphRecommender.get_recommendations(
+            "book1", max_depth=1, mode="ppr"
+        )
+        ids = [book.id for book in recommendations]
+
+        # book2 shares both the author and a category with book1
+        assert ids[0] == "book2"
+        assert "book1" not in ids
+        assert set(ids) == {"book2", "book3", "book4", "book5"}
+
+        limited = GraphRecommender.get_recommendations(
+            "book1", max_results=2, mode="ppr"
+        )
+        assert [book.id for book in limited] == ids[:2]
+
+    def test_get_recommendations_ranked_by_overlap(self, sample_books):
+        """Test BFS returns the books sharing most features, not the first seen"""
+        recommendations = GraphRecommender.get_recommendations("book1", max_results=1)
+
+        # book2 shares the author and a category; others share one category
+        assert [book.id for book in recommendations] == ["book2"]
+
+    def test_candidate_cap_keeps_best_overlap(self, monkeypatch):
+        """Test the candidate cap drops the weakest books, not the last ids"""
+        monkeypatch.setattr(bfs, "MAX_CANDIDATES", 5)
+        Book.objects.bulk_create(
+            [
+                Book(id="seed", title="S", authors="X", categories="C1,C2"),
+                Book(id="zzz", title="Z", authors="X", categories="C1"),
+            ]
+            + [Book(id=f"a{i:02d}", title="A", categories="C1") for i in range(10)]
+            + [Book(id=f"b{i:02d}", title="B", categories="C2") for i in range(10)]
+        )
+
+        recommendations = GraphRecommender.get_recommendations("seed", max_results=1)
+
+        # zzz shares the author and C1 but sorts after the 5 kept a/b books
+        assert [book.id for book in recommendations] == ["zzz"]
+
+    def test_get_recommendations_hub_degree_cap(self):
+        """Test hub categories only contribute their most rated books"""
+        Book.objects.bulk_create(
+            Book(id=f"hub{i:02d}", title=f"H{i}", categories="Fiction", ratingsCount=i)
+            for i in range(30)
+        )
+
+        recommendations = GraphRecommender.get_recommendations(
+            "hub00", max_results=30, max_feature_degree=4
+        )
+
+        assert {book.id for book in recommendations} == {
+            "hub29",
+            "hub28",
+            "hub27",
+            "hub26",
+        }
+
+    def test_get_recommendations_unknown_mode(self, sample_books):
+        """Test an unknown mode falls back to no recommendations"""
+        assert GraphRecommender.get_recommendations("book1", mode="dfs") == []
+
+    @pytest.mark.parametrize("mode", ["bfs", "ppr"])
+    def test_get_recommendations_batch(self, sample_books, mode):
+        """Test batch results match per-seed recommendations"""
+        seeds = ["book1", "book3", "missing", "book5"]
+
+        batch = GraphRecommender.get_recommendations_batch(
+            seeds, max_results=3, mode=mode
+        )
+
+        assert list(batch) == seeds
+        assert batch["missing"] == []
+        for seed in ["book1", "book3", "book5"]:
+            single = GraphRecommender.get_recommendations(
+                seed, max_results=3, mode=mode
+            )
+            assert [b.id for b in batch[seed]] == [b.id for b in single]
+
+    def test_get_recommendations_batch_parallel(self, sample_books):
+        """Test the process pool variant matches the in-process batch"""
+        seeds = ["book1", "book2", "book3", "book4", "book5"]
+
+        parallel = GraphRecommender.get_recommendations_batch_parallel(
+            seeds, processes=2, chunk_size=2, max_results=3
+        )
+        batch = GraphRecommender.get_recommendations_batch(seeds, max_results=3)
+
+        assert {seed: [b.id for b in books] for seed, books in parallel.items()} == {
+            seed: [b.id for b in books] for seed, books in batch.items()
+        }
+
+    def test_precompute_recommendations(self, sample_books):
+        """Test the command stores every book and the recommender reads it"""
+        from django.core.management import call_command
+
+        call_command(
+            "precompute_recommendations",
+            processes=2,
+            chunk_size=2,
+            max_results=3,
+            stdout=io.StringIO(),
+        )
+
+        batch = GraphRecommender.get_recommendations_batch(
+            [book.id for book in sample_books], max_results=3
+        )
+        stored = PrecomputedRecommendation.objects.in_bulk()
+        assert {book_id: row.recommended_ids for book_id, row in stored.items()} == {
+            seed: [b.id for b in books] for seed, books in batch.items()
+        }
+
+        stored["book1"].recommended_ids = ["book5"]
+        stored["book1"].save()
+        recommendations = GraphRecommender.get_recommendations("book1", max_results=3)
+        assert [book.id for book in recommendations] == ["book5"]
+
+        # Editing another book keeps the row until the next precompute
+        sample_books[1].save()
+        recommendations = GraphRecommender.get_recommendations("book1", max_results=3)
+        assert [book.id for book in recommendations] == ["book5"]
+
+        # Other parameters, or a change to the book, bypass the stored row
+        assert len(GraphRecommender.get_recommendations("book1", max_results=2)) == 2
+        sample_books[0].save()
+        assert not PrecomputedRecommendation.objects.filter(book_id="book1").exists()
+
     def test_get_recommendations_no_connections(self):
         """Test recommendation when there are no connections"""
         # Create an isolated book with no author or category connections
@@ -100,3 +232,32 @@ class TestGraphRecommender:
         """Test recommendation with a nonexistent book ID"""
         with pytest.raises(Book.DoesNotExist):
             GraphRecommender.get_recommendations("nonexistent_id")
+
+    def test_query_count_independent_of_frontier_size(self):
+        """Test BFS queries do not grow with the number of visited books"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        Book.objects.create(id="small0", title="S0", categories="Tiny")
+        Book.objects.create(id="small1", title="S1", categories="Tiny")
+        Book.objects.bulk_create(
+            Book(
+                id=f"big{i}",
+                title=f"B{i}",
+                authors=f"Author {i % 7}",
+                categories="Huge",
+            )
+            for i in range(60)
+        )
+        reset_graph_index()
+        GraphRecommender.get_recommendations("small0", max_results=100)
+
+        with CaptureQueriesContext(connection) as small:
+            GraphRecommender.get_recommendations("small1", max_results=100)
+        with CaptureQueriesContext(connection) as big:
+            recommendations = GraphRecommender.get_recommendations(
+                "big0", max_results=100
+            )
+
+        assert len(recommendations) == 59
+        assert len(big.captured_queries) == len(small.captured_queries)
@@ -1,7 +1,21 @@
 import pytest
 
-from business_logic.bst import BST, BSTNode
-from data_access.models import Book
+from business_logic.bst import (
+    BST,
+    BSTNode,
+    TrigramIndex,
+    _encode_row,
+    _row_id,
+    fuzzy_search_catalog,
+    get_catalog_index,
+    reset_catalog_index,
+    save_catalog_index,
+    search_catalog,
+    substring_distance,
+)
+from business_logic.sstable import SSTable
+from data_access.models import Book, CatalogVersion
+from data_access.signals import books_imported
 
 
 class TestBSTClass:
@@ -133,3 +147,238 @@ class TestBSTClass:
         ids = {book.id for book in results}
         assert "book2" in ids
         assert "book3" in ids
+
+    def test_balanced_sorted_input(self):
+        """Test a balanced tree stays logarithmic on pre-sorted keys"""
+        keys = [f"{i:05d}" for i in range(1000)]
+        bst = BST(key_func=lambda k: k, balanced=True)
+        bst.build(keys)
+
+        # An AVL tree of n nodes is at most ~1.44 log2(n) high
+        assert bst.root.height <= 14
+        assert sorted(bst.search("")) == keys
+        assert bst.search("00999") == ["00999"]
+
+    def test_unbalanced_deep_tree_search(self):
+        """Test sorted input deeper than the recursion limit still works"""
+        keys = [f"{i:05d}" for i in range(5000)]
+        bst = BST(key_func=lambda k: k)
+        bst.build(keys)
+
+        assert len(bst.search("")) == len(keys)
+        assert bst.search("04999") == ["04999"]
+
+    def test_search_limit(self):
+        """Test search stops after limit matches, in key order"""
+        bst = BST(key_func=lambda k: k)
+        bst.build(["b", "a", "c", "a", "ab"])
+
+        assert bst.search("a", limit=2) == ["a", "a"]
+
+    @pytest.mark.parametrize("balanced", [False, True])
+    def test_search_page_resumes(self, balanced):
+        """Test cursors walk every match once, in key order, across duplicates"""
+        keys = ["b", "a", "c", "a", "a", "d", "ab", "x"]
+        bst = BST(key_func=lambda k: k, balanced=balanced)
+        bst.build(keys)
+
+        pages = []
+        results, cursor = bst.search_page("", 2)
+        while True:
+            pages.append(results)
+            if cursor is None:
+                break
+            results, cursor = bst.search_page("", 2, cursor)
+
+        assert pages == [["a", "a", "a"], ["ab", "b"], ["c", "d"], ["x"]]
+        assert bst.search_page("b", 1, "ab") == (["b"], None)
+
+
+class TestTrigramIndex:
+    """Tests for the trigram substring index"""
+
+    @pytest.fixture
+    def index(self):
+        """Index over a few books"""
+        index = TrigramIndex()
+        index.build(
+            [
+                Book(id="b1", title="The Hobbit", authors="J.R.R. Tolkien"),
+                Book(id="b2", title="Harry Potter", authors="J.K. Rowling"),
+                Book(id="b3", title="Hobbit Houses", authors="Ann Lee"),
+            ]
+        )
+        return index
+
+    def test_search_in_key_order(self, index):
+        """Test matches are case-insensitive substrings, sorted by key"""
+        assert [b.id for b in index.search("HOBBIT")] == ["b3", "b1"]
+        assert [b.id for b in index.search("j.")] == ["b2", "b1"]
+        assert [b.id for b in index.search("t")] == ["b2", "b3", "b1"]
+        assert index.search("hobbitx") == []
+
+    def test_search_pages_by_key(self, index):
+        """Test limit and after page through matches without splitting a key"""
+        index.add(Book(id="b4", title="Hobbit Houses", authors="Ann Lee"))
+
+        assert [b.id for b in index.search("o", limit=2)] == ["b2", "b3", "b4"]
+        after = "hobbit housesann lee"
+        assert [b.id for b in index.search("o", limit=2, after=after)] == ["b1"]
+        assert [b.id for b in index.search("ho", after="harry")] == ["b3", "b4", "b1"]
+        assert index.search("o", after="the hobbitj.r.r. tolkien") == []
+
+    def test_add_and_discard(self, index):
+        """Test edits are visible before the postings are rebuilt"""
+        index.add(Book(id="b2", title="Harry the Hobbit", authors=None))
+        index.add(Book(id="b4", title="A Hobbit Tale", authors=None))
+        index.discard("b3")
+
+        assert [b.id for b in index.search("hobbit")] == ["b4", "b2", "b1"]
+        assert [b.id for b in index.search("potter")] == []
+
+    def test_rebuild_after_many_edits(self, index, monkeypatch):
+        """Test pending edits are folded into the postings"""
+        monkeypatch.setattr("business_logic.bst.REBUILD_THRESHOLD", 1)
+        index.add(Book(id="b4", title="Hobbit Maps", authors=None))
+        index.add(Book(id="b5", title="Hobbit Songs", authors=None))
+
+        assert not index._pending
+        assert [b.id for b in index.search("hobbit ")] == ["b3", "b4", "b5"]
+
+    def test_substring_distance(self):
+        """Test edit distance to the closest substring"""
+        assert substring_distance("hobbit", "the hobbit") == 0
+        assert substring_distance("hobit", "the hobbit") == 1
+        assert substring_distance("hbbot", "the hobbit") == 2
+        assert substring_distance("abc", "") == 3
+
+    def test_fuzzy_search(self, index):
+        """Test misspelled queries find the closest keys first"""
+        assert [b.id for b in index.fuzzy_search("hobit")] == ["b3", "b1"]
+        assert [b.id for b in index.fuzzy_search("hary poter")] == ["b2"]
+        assert index.fuzzy_search("hobit", max_distance=0) == []
+
+        index.add(Book(id="b4", title="Harry Porter", authors=None))
+        assert [b.id for b in index.fuzzy_search("harry potter")] == ["b2", "b4"]
+
+    def test_save_and_load(self, index, tmp_path):
+        """Test a mapped index answers like the built one and accepts edits"""
+        encode = lambda book: f"{book.id}|{book.title}|{book.authors}".encode()
+        decode = lambda value: Book(
+            **dict(zip(("id", "title", "authors"), value.decode().split("|")))
+        )
+        index.save(str(tmp_path), 5, encode)
+
+        loaded = TrigramIndex.load(str(tmp_path), decode)
+
+        assert loaded.version == 5
+        for query in ("hobbit", "j.", "t", "zzz"):
+            assert [b.id for b in loaded.search(query)] == [
+                b.id for b in index.search(query)
+            ]
+        loaded.discard("b3")
+        assert [b.id for b in loaded.search("hobbit")] == ["b1"]
+
+    def test_save_keeps_mapped_tables_readable(self, index, tmp_path):
+        """Test saving over a mapped index swaps both tables in together"""
+        path = tmp_path / "search"
+        encode = lambda book: book.id.encode()
+        index.save(str(path), 1, encode)
+        mapped = TrigramIndex.load(str(path), bytes.decode, id_func=str)
+
+        other = TrigramIndex()
+        other.build([Book(id="b9", title="Dune", authors=None)])
+        other.save(str(path), 2, encode)
+
+        assert mapped.search("hobbit") == ["b3", "b1"]
+        assert TrigramIndex.load(str(path), bytes.decode).version == 2
+        assert [p.name for p in tmp_path.iterdir()] == ["search"]
+
+
+@pytest.mark.django_db
+class TestCatalogIndex:
+    """Tests for the process-wide catalog search index"""
+
+    @pytest.fixture(autouse=True)
+    def index_path(self, settings, tmp_path):
+        """Point the on-disk index at a temporary directory"""
+        settings.SEARCH_INDEX_PATH = tmp_path
+        return tmp_path
+
+    def test_maps_saved_index(self, index_path):
+        """Test a saved index matching the catalog is mapped, not rebuilt"""
+        Book.objects.create(id="b1", title="The Hobbit", authors="Tolkien")
+        save_catalog_index()
+
+        index = get_catalog_index()
+
+        assert index.version == CatalogVersion.current()
+        assert [row[0] for row in index.search("hobbit")] == ["b1"]
+
+    def test_no_match_across_title_and_authors(self):
+        """Test a query spanning the end of the title and the authors misses"""
+        Book.objects.create(id="b1", title="The Hobbit", authors="Tolkien")
+
+        assert search_catalog("hobbit") == ["b1"]
+        assert search_catalog("hobbittolk") == []
+        assert search_catalog("bit\x00tol") == []
+        assert fuzzy_search_catalog("hobbittolkien") == []
+
+    def test_mismatched_tables_rebuilt(self, index_path):
+        """Test tables of different builds are rebuilt from, not an error"""
+        Book.objects.create(id="b1", title="The Hobbit", authors="Tolkien")
+        save_catalog_index()
+        SSTable.write(str(index_path / "trigrams.sst"), [], 99)
+
+        index = get_catalog_index()
+
+        assert index.version is None
+        assert search_catalog("hobbit") == ["b1"]
+
+    def test_saved_index_without_separator_rebuilt(self, index_path):
+        """Test tables saved before keys had a separator are not mapped"""
+        Book.objects.create(id="b1", title="The Hobbit", authors="Tolkien")
+        old = TrigramIndex(key_func=lambda row: row[1] + row[2], id_func=_row_id)
+        old.build(Book.objects.values_list("id", "title", "authors"))
+        old.save(str(index_path), CatalogVersion.current(), _encode_row)
+
+        assert get_catalog_index().version is None
+        assert search_catalog("hobbittolk") == []
+
+    def test_saved_index_caught_up(self, index_path):
+        """Test a saved index is mapped and patched with books changed since"""
+        Book.objects.create(id="b1", title="The Hobbit", authors="Tolkien")
+        save_catalog_index()
+        version = CatalogVersion.current()
+        Book.objects.bulk_create([Book(id="b2", title="Hobbit Houses")])
+        books_imported.send(sender=Book, book_ids=["b2"])
+
+        index = get_catalog_index()
+
+        assert index.version == version
+        assert [row[0] for row in index.search("hobbit")] == ["b2", "b1"]
+
+    def test_edited_title_caught_up(self, index_path):
+        """Test an edit after the save is replayed over the mapped index"""
+        book = Book.objects.create(id="b1", title="The Hobbit", authors="Tolkien")
+        save_catalog_index()
+        book.title = "The Silmarillion"
+        book.save()
+        reset_catalog_index()
+
+        index = get_catalog_index()
+
+        assert [row[0] for row in index.search("silmarillion")] == ["b1"]
+        assert index.search("hobbit") == []
+
+    def test_patched_after_change_elsewhere(self, monkeypatch):
+        """Test books changed by another process reach the loaded index"""
+        monkeypatch.setattr("business_logic.catalog_sync.REFRESH_INTERVAL", 0)
+        Book.objects.create(id="b1", title="The Hobbit", authors="Tolkien")
+        assert search_catalog("hobbit") == ["b1"]
+
+        # Another worker's write: rows and log change, no signal here
+        Book.objects.bulk_create([Book(id="b2", title="Hobbit Houses")])
+        CatalogVersion.bump(["b2"])
+
+        assert search_catalog("hobbit") == ["b2", "b1"]
@@ -1,7 +1,18 @@
+import io
+import json
+
+import numpy as np
 import pytest
+from django.core.management import call_command
 
 from business_logic.cbf import BookRecommender
-from data_access.models import Book, Review
+from business_logic.profiles import UserProfiles, get_user_profiles
+from data_access.models import (
+    Book,
+    PrecomputedUserRecommendation,
+    Review,
+    ReviewVersion,
+)
 
 
 @pytest.mark.django_db
@@ -105,3 +116,220 @@ class TestBookRecommender:
 
         # Check that we got at most 1 recommendation
         assert len(result) <= 1
+
+    def test_get_cbf_list_ranked_by_interest(
+        self, sample_books, sample_reviews, sample_user_id
+    ):
+        """Test reviewed books are ranked by the user's genre interest"""
+        result = BookRecommender._get_cbf_list(sample_user_id)
+
+        # Machine Learning (5.0) > Programming,CS (4.5) > Data Science (3.5)
+        assert [book.id for book in result] == ["book3", "book1", "book2"]
+
+    def test_catalog_mode_scores_unreviewed_books(
+        self, sample_books, sample_reviews, sample_user_id
+    ):
+        """Test catalog mode ranks the whole catalog minus reviewed books"""
+        Book.objects.create(id="book5", title="Cooking", categories="Cooking")
+
+        result = BookRecommender._get_catalog_cbf_list(sample_user_id)
+
+        # Only book4 is unreviewed and shares a genre with the user
+        assert [book.id for book in result] == ["book4"]
+
+    def test_user_cbf_list_modes(self, sample_books, sample_reviews, sample_user_id):
+        """Test get_user_cbf_list dispatches on mode"""
+        reviewed = BookRecommender.get_user_cbf_list(sample_user_id)
+        catalog = BookRecommender.get_user_cbf_list(sample_user_id, mode="catalog")
+
+        assert [book.id for book in reviewed] == ["book3", "book1", "book2"]
+        assert [book.id for book in catalog] == ["book4"]
+
+    def test_unknown_mode(self, sample_user_id):
+        """Test an unknown mode falls back to no recommendations"""
+        assert BookRecommender.get_user_cbf_list(sample_user_id, mode="nope") == []
+
+    @pytest.fixture
+    def more_reviews(self, sample_books):
+        """Reviewers with other tastes, one with a single genre"""
+        Book.objects.create(id="book5", title="Cooking", categories="Cooking")
+        Review.objects.create(book=sample_books[3], user_id="other", review_score=2)
+        Review.objects.create(book=sample_books[2], user_id="other", review_score=5)
+        Review.objects.create(book_id="book5", user_id="cook", review_score=4)
+
+    @pytest.mark.parametrize("mode", ["reviewed", "catalog"])
+    def test_batch_matches_single_users(
+        self, sample_reviews, sample_user_id, more_reviews, monkeypatch, mode
+    ):
+        """Test batched results equal per-user lists, across user blocks"""
+        monkeypatch.setattr("business_logic.cbf.USER_BLOCK", 2)
+        user_ids = [sample_user_id, "other", "cook", "nobody"]
+
+        batch = BookRecommender.get_user_cbf_batch(user_ids, 3, mode)
+
+        assert list(batch) == user_ids
+        for user_id in user_ids:
+            single = BookRecommender.get_user_cbf_list(user_id, 3, mode)
+            assert [b.id for b in batch[user_id]] == [b.id for b in single]
+        assert batch["other"] and batch["cook"] == []
+
+    def test_precompute_user_recommendations(
+        self, sample_reviews, sample_user_id, more_reviews, tmp_path
+    ):
+        """Test the command stores every reviewer, or writes them as JSON lines"""
+        options = {"processes": 2, "chunk_size": 1, "max_results": 3}
+        call_command("precompute_user_recommendations", **options, stdout=io.StringIO())
+
+        batch = BookRecommender.get_user_cbf_batch([sample_user_id, "other", "cook"], 3)
+        expected = {user: [b.id for b in books] for user, books in batch.items()}
+        stored = PrecomputedUserRecommendation.objects.in_bulk()
+        assert {user: row.recommended_ids for user, row in stored.items()} == expected
+        assert stored["other"].params == BookRecommender.params(3)
+
+        # Default requests are served from the rows stored with default options
+        stored["other"].recommended_ids = ["book1"]
+        stored["other"].save()
+        assert [b.id for b in BookRecommender.get_user_cbf_list("other", 3)] == [
+            "book1"
+        ]
+
+        output = tmp_path / "recommendations.jsonl"
+        stdout = io.StringIO()
+        call_command(
+            "precompute_user_recommendations",
+            **options,
+            output=str(output),
+            stdout=stdout,
+        )
+        lines = [json.loads(line) for line in output.read_text().splitlines()]
+        assert {line["user_id"]: line["recommended_ids"] for line in lines} == expected
+        assert "Stored" not in stdout.getvalue()
+
+    def test_user_endpoint_cached_until_review(
+        self, client, sample_reviews, sample_user_id
+    ):
+        """Test the endpoint result stays cached until the user writes a review"""
+        url = f"/recommendations/user/{sample_user_id}/"
+
+        def ids():
+            data = client.get(url, {"n": 3}).json()
+            return [book["id"] for book in data["recommendations"]]
+
+        assert ids() == ["book3", "book1", "book2"]
+
+        # Bypasses signals: the inputs look unchanged, so the entry is served
+        Review.objects.filter(book_id="book3").update(review_score=1.0)
+        assert ids() == ["book3", "book1", "book2"]
+
+        sample_reviews[2].review_score = 1.0
+        sample_reviews[2].save()
+        assert ids() == ["book1", "book2", "book3"]
+        assert client.get(url, {"mode": "nope"}).status_code == 400
+
+        # Another worker's write: the shared counter retires this cache too
+        Review.objects.filter(book_id="book3").update(review_score=5.0)
+        ReviewVersion.bump(sample_user_id)
+        assert ids() == ["book3", "book1", "book2"]
+
+    def test_user_endpoint_reads_precomputed(
+        self, client, sample_reviews, sample_user_id
+    ):
+        """Test stored rows are served for their parameters until a review"""
+        PrecomputedUserRecommendation.objects.create(
+            user_id=sample_user_id,
+            params=BookRecommender.params(5, "catalog"),
+            recommended_ids=["book2"],
+        )
+        url = f"/recommendations/user/{sample_user_id}/"
+
+        data = client.get(url, {"n": 5, "mode": "catalog"}).json()
+        assert [book["id"] for book in data["recommendations"]] == ["book2"]
+        data = client.get(url, {"n": 4, "mode": "catalog"}).json()
+        assert [book["id"] for book in data["recommendations"]] == ["book4"]
+
+        sample_reviews[0].save()
+        assert not PrecomputedUserRecommendation.objects.exists()
+        data = client.get(url, {"n": 5, "mode": "catalog"}).json()
+        assert [book["id"] for book in data["recommendations"]] == ["book4"]
+
+    def test_get_cbf_list_from_co_reviews(self, sample_books, sample_reviews):
+        """Test book pages list books reviewed by the same users"""
+        Review.objects.create(book=sample_books[3], user_id="other", review_score=3)
+        Review.objects.create(book=sample_books[2], user_id="other", review_score=3)
+
+        result = BookRecommender.get_cbf_list("book3")
+
+        # book1/book2 share one reviewer with book3, book4 shares another
+        assert [book.id for book in result] == ["book1", "book2", "book4"]
+
+
+class TestUserProfiles:
+    """Tests for the users x categories profile matrix"""
+
+    @pytest.fixture
+    def profiles(self):
+        """Profiles over a few hand-made reviews"""
+        return UserProfiles.from_rows(
+            [
+                ("u1", "b1", "T1", "Fiction", 4.0),
+                ("u2", "b2", "T2", "History", 2.0),
+                ("u1", "b3", "T3", "Fiction", 3.0),
+                ("u1", "b2", "T2", "History", None),
+                (None, "b4", "T4", "Art", 5.0),
+            ]
+        )
+
+    def test_csr_layout(self, profiles):
+        """Test scores are summed per user and category"""
+        assert profiles.categories == ["Fiction", "History"]
+        assert profiles.data.dtype == np.float32
+        categories, sums = profiles.profile("u1")
+        assert categories.tolist() == [0, 1]
+        assert sums.tolist() == [7.0, 0.0]
+        assert profiles.reviews("u1")[0] == ["b1", "b3", "b2"]
+        assert "u3" not in profiles
+
+    def test_interest(self, profiles):
+        """Test interest is normalized and needs two categories"""
+        assert np.allclose(profiles.interest("u1"), [1.0, 0.0])
+        assert profiles.interest("u2") is None
+        assert profiles.interest("missing") is None
+
+    def test_refresh(self, profiles):
+        """Test a refreshed user replaces their row, new genres included"""
+        rows = [("b2", "T2", "History", 2.0), ("b5", "T5", "Art", 2.0)]
+        profiles.refresh("u2", rows, 3)
+
+        categories, sums = profiles.profile("u2")
+        assert [profiles.categories[c] for c in categories] == ["History", "Art"]
+        assert np.allclose(profiles.interest("u2"), [0, 0.7071, 0.7071], atol=1e-4)
+        assert profiles.version("u2") == 3
+
+    @pytest.mark.django_db
+    def test_patched_on_review_change(self):
+        """Test saving a review refreshes that user's profile on next use"""
+        book = Book.objects.create(id="b1", title="T", categories="Fiction")
+        other = Book.objects.create(id="b2", title="U", categories="History")
+        Review.objects.create(book=book, user_id="u1", review_score=4.0)
+        profiles = get_user_profiles()
+        assert profiles.interest("u1") is None
+
+        Review.objects.create(book=other, user_id="u1", review_score=4.0)
+
+        assert get_user_profiles(["u1"]) is profiles
+        assert profiles.interest("u1") is not None
+
+    @pytest.mark.django_db
+    def test_refreshed_after_review_elsewhere(self):
+        """Test a review written by another process is read on next use"""
+        book = Book.objects.create(id="b1", title="T", categories="Fiction")
+        other = Book.objects.create(id="b2", title="U", categories="History")
+        Review.objects.create(book=book, user_id="u1", review_score=4.0)
+        profiles = get_user_profiles(["u1"])
+
+        # Another worker's write: row and counter change, no signal here
+        Review.objects.bulk_create([Review(book=other, user_id="u1", review_score=4.0)])
+        assert get_user_profiles(["u2"]).interest("u1") is None
+        ReviewVersion.bump("u1")
+
+        assert get_user_profiles(["u1"]).interest("u1") is not None
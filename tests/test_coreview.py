@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+from django.core.management import call_command
+from django.test import override_settings
+
+from business_logic import coreview
+from business_logic.coreview import CoReviewIndex, get_coreview_index
+from data_access.models import Book, Review
+
+
+def brute_force(rows, k):
+    """Top-k co-review lists by counting every pair in Python"""
+    by_user = {}
+    for user_id, book_id in rows:
+        if user_id is not None:
+            by_user.setdefault(user_id, set()).add(book_id)
+    counts = {}
+    for books in by_user.values():
+        if len(books) > coreview.MAX_USER_REVIEWS:
+            continue
+        for a in books:
+            for b in books - {a}:
+                counts.setdefault(a, {}).setdefault(b, 0)
+                counts[a][b] += 1
+    return {
+        book: sorted(others.items(), key=lambda item: (-item[1], item[0]))[:k]
+        for book, others in counts.items()
+    }
+
+
+class TestCoReviewIndex:
+    """Tests for the item-item co-review model"""
+
+    @pytest.fixture
+    def rows(self):
+        return [
+            ("u1", "b1"),
+            ("u1", "b2"),
+            ("u1", "b3"),
+            ("u2", "b2"),
+            ("u2", "b3"),
+            ("u2", "b3"),
+            ("u3", "b4"),
+            (None, "b1"),
+        ]
+
+    def test_counts(self, rows):
+        """Test counts, best first, ties by id, duplicates counted once"""
+        index = CoReviewIndex.from_rows(rows, k=3)
+
+        assert index.similar("b2") == [("b3", 2), ("b1", 1)]
+        assert index.similar("b1") == [("b2", 1), ("b3", 1)]
+        assert index.similar("b1", 1) == [("b2", 1)]
+        assert index.similar("b4") == []
+        assert index.similar("missing") == []
+
+    def test_independent_of_review_order(self, rows):
+        """Test shuffled reviews give the same model"""
+        index = CoReviewIndex.from_rows(rows)
+        shuffled = CoReviewIndex.from_rows(rows[::-1])
+
+        assert np.array_equal(index.neighbors, shuffled.neighbors)
+        assert np.array_equal(index.counts, shuffled.counts)
+
+    @pytest.mark.parametrize("max_pairs", [1, 60, 1_000_000])
+    def test_matches_brute_force(self, monkeypatch, max_pairs):
+        """Test counting in pair-capped blocks, or per row, agrees with brute force"""
+        monkeypatch.setattr(coreview, "MAX_PAIRS", max_pairs)
+        monkeypatch.setattr(coreview, "MAX_USER_REVIEWS", 15)
+        rng = np.random.default_rng(0)
+        rows = [(f"u{rng.integers(40)}", f"b{rng.integers(60)}") for _ in range(600)]
+
+        index = CoReviewIndex.from_rows(rows, k=5)
+
+        expected = brute_force(rows, 5)
+        for book_id in {book for _, book in rows}:
+            assert index.similar(book_id) == expected.get(book_id, [])
+
+    def test_save_and_mmap_load(self, rows, tmp_path):
+        """Test the arrays round-trip through a memory-mapped load"""
+        index = CoReviewIndex.from_rows(rows)
+        index.save(str(tmp_path))
+
+        loaded = CoReviewIndex.load(str(tmp_path))
+
+        assert isinstance(loaded.neighbors, np.memmap)
+        assert loaded.similar("b2") == index.similar("b2")
+
+    def test_save_replaces_directory(self, rows, tmp_path):
+        """Test saving over a model swaps the whole directory in"""
+        path = tmp_path / "coreview"
+        CoReviewIndex.from_rows(rows).save(str(path))
+        mapped = CoReviewIndex.load(str(path))
+        (path / "stale.npy").write_bytes(b"")
+
+        CoReviewIndex.from_rows(rows[:2]).save(str(path))
+
+        assert sorted(p.name for p in path.iterdir()) == [
+            "book_ids.npy",
+            "counts.npy",
+            "neighbors.npy",
+        ]
+        assert [p.name for p in tmp_path.iterdir()] == ["coreview"]
+        assert CoReviewIndex.load(str(path)).similar("b2") == [("b1", 1)]
+        # Arrays mapped before the swap stay readable
+        assert mapped.similar("b2") == [("b3", 2), ("b1", 1)]
+
+
+@pytest.mark.django_db
+class TestCoReviewLifecycle:
+    """Tests for the process-wide model"""
+
+    def test_built_from_reviews_or_loaded(self, tmp_path):
+        """Test the model is built from reviews, or mapped once saved"""
+        books = [Book.objects.create(id=f"b{i}", title=f"T{i}") for i in range(3)]
+        for book in books:
+            Review.objects.create(book=book, user_id="u1", review_score=4)
+
+        with override_settings(COREVIEW_INDEX_PATH=tmp_path / "missing"):
+            assert get_coreview_index().similar("b0") == [("b1", 1), ("b2", 1)]
+
+        with override_settings(COREVIEW_INDEX_PATH=tmp_path):
+            call_command("build_coreview_index", k=1, stdout=None)
+            loaded = get_coreview_index()
+
+        assert isinstance(loaded.neighbors, np.memmap)
+        assert loaded.similar("b0") == [("b1", 1)]
@@ -0,0 +1,115 @@
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.urls import reverse
+
+from business_logic.bst import reset_catalog_index
+from data_access import fts
+from data_access.models import Book
+
+
+@pytest.mark.django_db
+class TestBookFullTextSearch:
+    """Tests for the FTS5 book index"""
+
+    @pytest.fixture
+    def books(self):
+        """Books whose words appear in different fields"""
+        return [
+            Book.objects.create(
+                id="b1",
+                title="Gardening Basics",
+                authors="Ann Lee",
+                categories="Home",
+            ),
+            Book.objects.create(
+                id="b2",
+                title="A Quiet Year",
+                authors="Tom Reed",
+                description="A memoir about gardening and patience.",
+            ),
+            Book.objects.create(id="b3", title="Sea Stories", authors="Gardener Jones"),
+        ]
+
+    def test_match_expression_quotes_words(self):
+        """Test user input is quoted and the last word is a prefix"""
+        assert fts.match_expression('tom "reed') == '"tom" """reed"*'
+        assert fts.match_expression("  ") == ""
+
+    def test_ranked_by_field_weight(self, books):
+        """Test title matches outrank description matches"""
+        assert fts.search_books("gardening") == ["b1", "b2"]
+        assert fts.search_books("garden") == ["b1", "b3", "b2"]
+        assert fts.search_books("quiet memoir") == ["b2"]
+        assert fts.search_books('") OR (') == []
+
+    def test_kept_in_sync(self, books):
+        """Test saves, deletes and bulk inserts update the index"""
+        books[2].title = "Ocean Tales"
+        books[2].authors = None
+        books[2].save()
+        books[0].delete()
+        Book.objects.bulk_create([Book(id="b4", title="Gardening Again")])
+
+        assert fts.search_books("gardening") == ["b4", "b2"]
+        assert fts.search_books("ocean") == ["b3"]
+
+    def test_paged_in_sql(self, books):
+        """Test limit/offset page the ranking and the count covers every match"""
+        assert fts.search_books("garden", limit=2) == ["b1", "b3"]
+        assert fts.search_books("garden", limit=2, offset=2) == ["b2"]
+        assert fts.count_books("garden") == 3
+        assert fts.ranked_books("garden")[1:3] == ["b3", "b2"]
+
+    def test_check_and_rebuild(self, books):
+        """Test a dropped trigger is reported, and rebuilding resyncs the index"""
+        assert fts.check() == []
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TRIGGER {fts.FTS_TABLE}_au")
+        books[2].title = "Ocean Tales"
+        books[2].save()
+
+        assert fts.check() == [
+            f"missing trigger {fts.FTS_TABLE}_au",
+            "index does not match data_access_book",
+        ]
+        with pytest.raises(CommandError):
+            call_command("rebuild_fts_index", check=True, stdout=None)
+
+        call_command("rebuild_fts_index", stdout=None)
+        assert fts.check() == []
+        assert fts.search_books("ocean") == ["b3"]
+
+    def test_search_view(self, client, books):
+        """Test the fts mode ranks results and falls back without FTS5"""
+        url = reverse("search") + "?q=gardening&mode=fts"
+        response = client.get(url)
+        assert [book.id for book in response.context["books"]] == ["b1", "b2"]
+
+    def test_search_view_pages_past_first_page(self, client, books):
+        """Test fts mode pages through every match, not a fixed top slice"""
+        Book.objects.bulk_create(
+            Book(id=f"g{i:03d}", title=f"Gardening Vol {i}") for i in range(120)
+        )
+        url = reverse("search") + "?q=gardening&mode=fts"
+
+        first = client.get(url).context
+        second = client.get(url + "&page=2").context
+
+        assert first["page_obj"].paginator.count == 122
+        assert len(first["books"]) == 100
+        assert len(second["books"]) == 22
+        ids = {book.id for book in first["books"]} | {b.id for b in second["books"]}
+        assert len(ids) == 122
+
+    def test_search_view_fallback(self, client, books, monkeypatch):
+        """Test the substring search is used when FTS5 is unavailable"""
+        monkeypatch.setattr(fts, "search_books", lambda *args: None)
+        monkeypatch.setattr(fts, "count_books", lambda query: None)
+        reset_catalog_index()
+
+        response = client.get(reverse("search") + "?q=gardening&mode=fts")
+        reset_catalog_index()
+
+        assert [book.id for book in response.context["books"]] == ["b1"]
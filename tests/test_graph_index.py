@@ -0,0 +1,387 @@
+import io
+
+import numpy as np
+import pytest
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import F
+
+from business_logic.catalog_sync import refresh_catalog_indexes
+from business_logic.graph_index import (
+    GraphIndex,
+    book_features,
+    get_graph_index,
+    graph_version,
+    preload_graph_index,
+    reset_graph_index,
+)
+from data_access.models import Book, CatalogVersion
+from data_access.signals import books_imported
+
+
+def neighbors(index, book_id):
+    """Books sharing an author or category with book_id, via expand"""
+    row = index.book_index(book_id)
+    if row < 0:
+        return set()
+    return set(index.to_book_ids(index.expand(np.array([row]))))
+
+
+def incidence(index):
+    """Dense books x features 0/1 matrix of the index"""
+    dense = np.zeros((index.n_rows, index.n_features))
+    rows = np.repeat(np.arange(index.n_rows), np.diff(index.book_indptr))
+    dense[rows, index.book_indices] = 1
+    return dense
+
+
+def dense_pagerank(index, seed, alpha=0.15, iterations=10):
+    """Reference personalized PageRank over the dense incidence matrix"""
+    dense = incidence(index)
+    book_degree = dense.sum(axis=1)
+    feature_degree = np.maximum(dense.sum(axis=0), 1)
+    dangling = book_degree == 0
+    restart = np.zeros(index.n_rows)
+    restart[seed] = 1.0
+    rank = restart.copy()
+    for _ in range(iterations):
+        share = np.divide(rank, book_degree, out=np.zeros_like(rank), where=~dangling)
+        walked = dense @ ((share @ dense) / feature_degree)
+        rank = (1 - alpha) * walked + (
+            alpha + (1 - alpha) * rank[dangling].sum()
+        ) * restart
+    return rank
+
+
+class TestGraphIndex:
+    """Tests for the in-memory author/category index"""
+
+    @pytest.fixture
+    def index(self):
+        """Index over a small hand-made catalog"""
+        return GraphIndex.from_rows(
+            [
+                ("book1", "John Smith", "Programming, Computer Science", 10.0),
+                ("book2", "john smith", "Advanced", None),
+                ("book3", "Jane Doe", "Programming", 50.0),
+                ("book4", None, None, 5.0),
+            ]
+        )
+
+    def test_book_features_normalized(self):
+        """Test feature keys are lowercased, stripped and deduplicated"""
+        features = book_features(" Jane Doe ,", "Fiction,fiction")
+        assert features == ("author:jane doe", "category:fiction")
+
+    def test_neighbors(self, index):
+        """Test neighbors come from shared authors and categories"""
+        assert neighbors(index, "book1") == {"book1", "book2", "book3"}
+        assert neighbors(index, "book2") == {"book1", "book2"}
+        assert neighbors(index, "book4") == set()
+
+    def test_contains_and_len(self, index):
+        """Test membership and size"""
+        assert "book3" in index
+        assert "missing" not in index
+        assert len(index) == 4
+
+    def test_csr_layout(self, index):
+        """Test both CSR directions agree and use int32 neighbor ids"""
+        assert index.book_indices.dtype == np.int32
+        assert index.feature_indices.dtype == np.int32
+        row = index.book_index("book1")
+        for feature in index.features_of(row):
+            assert row in index.books_of(feature)
+        assert len(index.features_of(index.book_index("book4"))) == 0
+
+    def test_feature_books_ordered_by_ratings(self, index):
+        """Test hub rows are stored most rated first and can be capped"""
+        programming = index.feature_index("category:programming")
+        assert index.to_book_ids(index.books_of(programming)) == ["book3", "book1"]
+
+        row = index.book_index("book1")
+        capped = index.to_book_ids(index.expand(np.array([row]), 1))
+        assert set(capped) == {"book1", "book3"}
+
+    def test_shared_features(self, index):
+        """Test overlap counts and degrees against the seed's features"""
+        index.upsert("book5", "John Smith", "Programming", 1.0)
+        rows = np.array(
+            [index.book_index(book) for book in ("book5", "book3", "book4")]
+        )
+
+        shared, degree = index.shared_features(index.book_index("book1"), rows)
+
+        assert shared.tolist() == [2, 1, 0]
+        assert degree.tolist() == [2, 2, 0]
+
+    def test_score_features(self, index):
+        """Test per-book weight sums over features, patches included"""
+        index.upsert("book5", None, "Programming", 1.0)
+        programming = index.feature_index("category:programming")
+        advanced = index.feature_index("category:advanced")
+
+        scores = index.score_features_many([programming, advanced], [[1.0, 0.5]])
+
+        by_book = dict(zip(index.to_book_ids(range(index.n_rows)), scores[0].tolist()))
+        assert by_book == {
+            "book1": 1.0,
+            "book2": 0.5,
+            "book3": 1.0,
+            "book4": 0.0,
+            "book5": 1.0,
+        }
+
+    def test_score_features_many(self, index):
+        """Test the scores are the weights times the features x books matrix"""
+        index.upsert("book5", None, "Programming", 1.0)
+        features = np.array(
+            [
+                index.feature_index("category:programming"),
+                index.feature_index("category:advanced"),
+            ]
+        )
+        weights = np.array([[1.0, 0.5], [0.0, 2.0], [0.25, 0.0]])
+
+        scores = index.score_features_many(features, weights)
+
+        assert np.allclose(scores, weights @ incidence(index)[:, features].T)
+
+    def test_personalized_pagerank(self, index):
+        """Test PageRank keeps total mass and favors closer books"""
+        seed = index.book_index("book1")
+        scores = index.personalized_pagerank_many(np.array([seed]), iterations=20)
+
+        assert scores.shape == (len(index), 1)
+        assert scores.sum() == pytest.approx(1.0)
+        assert scores[index.book_index("book4"), 0] == 0
+        assert scores[index.book_index("book2"), 0] > 0
+
+    def test_personalized_pagerank_many(self, index):
+        """Test every column matches a dense single-seed walk"""
+        index.upsert("book5", None, None, 1.0)
+        seeds = np.array([index.book_index(b) for b in ("book1", "book3", "book5")])
+        scores = index.personalized_pagerank_many(seeds)
+
+        for column, seed in enumerate(seeds):
+            expected = dense_pagerank(index, seed)
+            assert np.allclose(scores[:, column], expected, atol=1e-6)
+
+    def test_save_and_mmap_load(self, index, tmp_path):
+        """Test a saved index is memory-mapped and answers the same queries"""
+        index.save(tmp_path)
+        loaded = GraphIndex.load(tmp_path)
+
+        assert isinstance(loaded.feature_indices, np.memmap)
+        assert len(loaded) == len(index)
+        assert neighbors(loaded, "book1") == neighbors(index, "book1")
+
+    def test_save_keeps_mapped_arrays_readable(self, index, tmp_path):
+        """Test saving over a mapped index swaps in new files, not rewrites"""
+        path = tmp_path / "graph"
+        index.save(path)
+        mapped = GraphIndex.load(path)
+        before = neighbors(mapped, "book1")
+
+        GraphIndex.from_rows([("book1", "Solo Author", None, 1.0)]).save(path)
+
+        assert neighbors(mapped, "book1") == before
+        assert len(GraphIndex.load(path)) == 1
+        assert [p.name for p in tmp_path.iterdir()] == ["graph"]
+
+    def test_upsert_new_book(self, index):
+        """Test a new book joins existing and new features"""
+        index.upsert("book5", "Jane Doe", "Poetry", 1.0)
+
+        assert "book5" in index
+        assert len(index) == 5
+        assert neighbors(index, "book5") == {"book3", "book5"}
+        assert "book5" in neighbors(index, "book3")
+
+    def test_upsert_moves_book(self, index):
+        """Test updating a book drops edges it no longer has"""
+        index.upsert("book2", "Jane Doe", "Programming", 100.0)
+
+        assert neighbors(index, "book2") == {"book1", "book2", "book3"}
+        assert neighbors(index, "book1") == {"book1", "book2", "book3"}
+        programming = index.feature_index("category:programming")
+        assert index.to_book_ids(index.books_of(programming))[0] == "book2"
+
+    def test_remove(self, index):
+        """Test a removed book disappears from lookups and neighbors"""
+        index.remove("book3")
+
+        assert "book3" not in index
+        assert len(index) == 3
+        assert neighbors(index, "book1") == {"book1", "book2"}
+
+        index.upsert("book3", "Jane Doe", "Programming", 50.0)
+        assert "book3" in neighbors(index, "book1")
+
+    def test_book_indexes(self, index):
+        """Test vectorized lookups match book_index, appends and removals too"""
+        index.upsert("book5", None, "Programming", 1.0)
+        index.remove("book2")
+        book_ids = ["book3", "book5", "book2", "missing", "book1"]
+
+        rows = index.book_indexes(book_ids)
+
+        assert rows.tolist() == [index.book_index(book) for book in book_ids]
+        assert rows.tolist()[2:4] == [-1, -1]
+
+    def test_compact_keeps_patches(self, index):
+        """Test folding patches into the arrays keeps every answer"""
+        index.upsert("book5", "John Smith", None, 3.0)
+        index.remove("book2")
+        before = {book: neighbors(index, book) for book in ("book1", "book5")}
+
+        index.compact()
+
+        assert not index._book_patches and not index._feature_patches
+        assert {book: neighbors(index, book) for book in ("book1", "book5")} == before
+        scores = index.personalized_pagerank_many([index.book_index("book5")])
+        assert scores[index.book_index("book1"), 0] > 0
+
+    def test_patch_mmap_loaded_index(self, index, tmp_path):
+        """Test a read-only memory-mapped index still accepts changes"""
+        index.save(tmp_path)
+        loaded = GraphIndex.load(tmp_path)
+
+        loaded.upsert("book4", "Jane Doe", None, 9.0)
+
+        assert neighbors(loaded, "book4") == {"book3", "book4"}
+        with pytest.raises(ValueError):
+            loaded.save(tmp_path)
+
+
+@pytest.mark.django_db
+class TestGraphIndexLifecycle:
+    """Tests for the process-wide index"""
+
+    def test_built_once(self):
+        """Test the index is shared until reset"""
+        reset_graph_index()
+        first = get_graph_index()
+        assert get_graph_index() is first
+
+    def test_patched_on_book_change(self, django_capture_on_commit_callbacks):
+        """Test saving or deleting a book patches the loaded index in place"""
+        reset_graph_index()
+        index = get_graph_index()
+        version = graph_version()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            book = Book.objects.create(id="b1", title="T", authors="A", categories="C")
+        assert get_graph_index() is index
+        assert "b1" in index
+        assert graph_version() > version
+
+        with django_capture_on_commit_callbacks(execute=True):
+            book.delete()
+        assert "b1" not in index
+
+    def test_patched_on_bulk_import(self, django_capture_on_commit_callbacks):
+        """Test the bulk-import signal patches imported rows in"""
+        reset_graph_index()
+        index = get_graph_index()
+        Book.objects.bulk_create(
+            [Book(id="b2", title="T", authors="A"), Book(id="b3", title="U")]
+        )
+        assert "b2" not in index
+
+        with django_capture_on_commit_callbacks(execute=True):
+            books_imported.send(sender=Book, book_ids=["b2", "b3"])
+
+        assert "b2" in index and "b3" in index
+
+    def test_not_patched_on_rollback(self):
+        """Test a book saved in a rolled back transaction never reaches the index"""
+        index = get_graph_index()
+
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                Book.objects.create(id="b1", title="T", authors="A")
+                raise RuntimeError
+
+        refresh_catalog_indexes()
+        assert "b1" not in index
+
+    def test_patched_after_change_elsewhere(self, monkeypatch):
+        """Test books changed by another process are replayed from the log"""
+        monkeypatch.setattr("business_logic.catalog_sync.REFRESH_INTERVAL", 0)
+        index = get_graph_index()
+        Book.objects.create(id="b1", title="T", authors="A")
+        version = graph_version()
+
+        # Another worker's writes: rows and log change, no signal here
+        Book.objects.filter(id="b1").update(authors="B")
+        Book.objects.bulk_create([Book(id="b2", title="U", authors="B")])
+        CatalogVersion.bump(["b1", "b2"])
+
+        assert get_graph_index() is index
+        assert neighbors(index, "b1") == {"b1", "b2"}
+        assert graph_version() > version
+
+    def test_refresh_throttled(self, monkeypatch):
+        """Test the catalog is not checked again within REFRESH_INTERVAL"""
+        monkeypatch.setattr("business_logic.catalog_sync.REFRESH_INTERVAL", 3600)
+        index = get_graph_index()
+        Book.objects.bulk_create([Book(id="b2", title="U", authors="A")])
+        CatalogVersion.bump(["b2"])
+
+        assert "b2" not in get_graph_index()
+
+    def test_saved_index_caught_up_with_catalog(self, settings, tmp_path):
+        """Test a saved index is mapped and patched with books changed since"""
+        settings.GRAPH_INDEX_PATH = tmp_path
+        book = Book.objects.create(id="b1", title="T", authors="A", categories="C")
+        GraphIndex.build().save(tmp_path)
+
+        preload_graph_index()
+        assert isinstance(get_graph_index().feature_indices, np.memmap)
+
+        book.authors = "B"
+        book.save()
+        Book.objects.create(id="b2", title="U", authors="B")
+        reset_graph_index()
+        preload_graph_index()
+        index = get_graph_index()
+
+        assert isinstance(index.book_ids, np.memmap)
+        assert neighbors(index, "b1") == {"b1", "b2"}
+
+    def test_saved_index_rebuilt_without_log(self, settings, tmp_path):
+        """Test a saved index is rebuilt when the log cannot catch it up"""
+        settings.GRAPH_INDEX_PATH = tmp_path
+        Book.objects.create(id="b1", title="T", authors="A")
+        GraphIndex.build().save(tmp_path)
+
+        # A change from before the log existed
+        Book.objects.filter(id="b1").update(authors="B")
+        CatalogVersion.objects.update(version=F("version") + 1)
+        Book.objects.create(id="b2", title="U", authors="B")
+        preload_graph_index()
+        index = get_graph_index()
+
+        assert not isinstance(index.book_ids, np.memmap)
+        assert neighbors(index, "b1") == {"b1", "b2"}
+
+    def test_import_data_saves_current_index(self, settings, tmp_path):
+        """Test import_data saves a graph index workers will accept"""
+        settings.GRAPH_INDEX_PATH = tmp_path / "graph"
+        settings.SEARCH_INDEX_PATH = tmp_path / "search"
+        settings.COREVIEW_INDEX_PATH = tmp_path / "coreview"
+        csv_path = tmp_path / "books.csv"
+        csv_path.write_text(
+            "Id,Title,authors,categories,ratingsCount,User_id,review/score\n"
+            "b1,Dune,['Frank Herbert'],['Fiction'],10,u1,5\n"
+            "b2,Emma,['Jane Austen'],['Fiction'],3,u1,4\n"
+        )
+
+        call_command("import_data", str(csv_path), stdout=io.StringIO())
+        saved = GraphIndex.load(settings.GRAPH_INDEX_PATH)
+
+        assert saved.catalog_version == CatalogVersion.current()
+        assert "b1" in saved and "b2" in saved
+        preload_graph_index()
+        assert get_graph_index().catalog_version == saved.catalog_version
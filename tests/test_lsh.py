@@ -0,0 +1,154 @@
+import numpy as np
+import pytest
+from django.core.management import call_command
+from django.test import override_settings
+
+from business_logic.lsh import LSHIndex, get_lsh_index
+from business_logic.tfidf import DescriptionRecommender, TfidfIndex
+from data_access.models import Book
+
+
+def random_tfidf(n_books=300, n_terms=200, topics=10, seed=0):
+    """Books drawing most of their terms from one of a few topics"""
+    rng = np.random.default_rng(seed)
+    indptr, indices, data = [0], [], []
+    for book in range(n_books):
+        topic = book % topics
+        own = rng.choice(n_terms // topics, 8, replace=False) + topic * (
+            n_terms // topics
+        )
+        terms = np.unique(np.concatenate([own, rng.choice(n_terms, 2)]))
+        indices.extend(terms.tolist())
+        data.extend(rng.random(len(terms)).tolist())
+        indptr.append(len(indices))
+    return TfidfIndex.from_csr(
+        [f"book{i}" for i in range(n_books)],
+        [f"term{i}" for i in range(n_terms)],
+        indptr,
+        indices,
+        data,
+    )
+
+
+class TestLSHIndex:
+    """Tests for the random-projection hash tables"""
+
+    @pytest.fixture
+    def tfidf(self):
+        return random_tfidf()
+
+    def test_keys_match_signs_of_projections(self, tfidf):
+        """Test each packed key holds the signs of that table's projections"""
+        index = LSHIndex.build(tfidf, tables=3, bits=5)
+        dense = np.zeros((len(tfidf), len(tfidf.vocabulary)))
+        rows = np.repeat(np.arange(len(tfidf)), np.diff(tfidf.indptr))
+        dense[rows, tfidf.indices] = tfidf.data
+        signs = (dense @ index.planes > 0).reshape(len(tfidf), 3, 5)
+
+        expected = (signs * (1 << np.arange(5))).sum(axis=2).T
+        assert np.array_equal(index.keys, expected)
+        assert index.tables == 3 and index.bits == 5
+
+    def test_candidates_share_a_bucket(self, tfidf):
+        """Test candidates are exactly the books sharing some key"""
+        index = LSHIndex.build(tfidf, tables=4, bits=6)
+
+        candidates, hits = index.candidates(0)
+
+        shared = (index.keys == index.keys[:, [0]]).any(axis=0)
+        shared[0] = False
+        assert candidates.tolist() == np.flatnonzero(shared).tolist()
+        xor = index.keys[:, candidates] ^ index.keys[:, [0]]
+        differing = [sum(bin(int(key)).count("1") for key in col) for col in xor.T]
+        assert hits.tolist() == [24 - bits for bits in differing]
+
+        limited, limited_hits = index.candidates(0, limit=5)
+        assert len(limited) == 5
+        assert limited_hits.tolist() == sorted(hits, reverse=True)[:5]
+
+    def test_similar_is_exactly_reranked(self, tfidf):
+        """Test returned scores are exact cosines, best first"""
+        index = LSHIndex.build(tfidf, tables=8, bits=8)
+
+        similar = index.similar("book0", 10)
+
+        exact = dict(tfidf.similar("book0", len(tfidf)))
+        assert [score for _, score in similar] == sorted(
+            (score for _, score in similar), reverse=True
+        )
+        for book_id, score in similar:
+            assert score == pytest.approx(exact[book_id], abs=1e-6)
+        assert index.similar("missing") == []
+
+    def test_recall_grows_with_tables(self, tfidf):
+        """Test more tables find more of the exact top 10"""
+
+        def recall(tables):
+            index = LSHIndex.build(tfidf, tables=tables, bits=10)
+            found = 0
+            for book in range(0, len(tfidf), 10):
+                book_id = f"book{book}"
+                exact = {b for b, _ in tfidf.similar(book_id, 10)}
+                found += len(exact & {b for b, _ in index.similar(book_id, 10)})
+            return found
+
+        assert recall(1) < recall(16)
+
+    def test_save_and_load(self, tfidf, tmp_path):
+        """Test tables round-trip and a new matrix invalidates them"""
+        tfidf.save(str(tmp_path))
+        tfidf.save_neighbors(str(tmp_path), 3)
+        LSHIndex.build(tfidf, tables=2, bits=4).save(str(tmp_path))
+        assert TfidfIndex.load(str(tmp_path)).has_neighbors(3)
+
+        loaded = LSHIndex.load(str(tmp_path), tfidf)
+        assert loaded.similar("book1", 5) == LSHIndex.build(
+            tfidf, tables=2, bits=4
+        ).similar("book1", 5)
+
+        tfidf.save(str(tmp_path))
+        with override_settings(TFIDF_INDEX_PATH=tmp_path):
+            assert get_lsh_index() is None
+
+    def test_bits_bounded(self, tfidf):
+        """Test keys must fit in 32 bits"""
+        with pytest.raises(ValueError):
+            LSHIndex.build(tfidf, bits=33)
+
+
+@pytest.mark.django_db
+class TestApproximateRecommendations:
+    """Tests for the LSH path of the description recommender"""
+
+    def test_book_details_uses_lsh(self, client, tmp_path):
+        """Test book_details lists look-alikes from the tables once enabled"""
+        tfidf = random_tfidf(n_books=40)
+        for book in range(40):
+            Book.objects.create(id=f"book{book}", title=f"Title {book}")
+        tfidf.save(str(tmp_path))
+
+        with override_settings(TFIDF_INDEX_PATH=tmp_path, TFIDF_APPROXIMATE=True):
+            call_command("build_lsh_index", tables=16, bits=4, stdout=None)
+            expected = [book_id for book_id, _ in get_lsh_index().similar("book0", 8)]
+            response = client.get("/book/book0/")
+            result = DescriptionRecommender.get_recommendations(
+                "book0", 8, approximate=True
+            )
+
+        assert expected
+        assert [book.id for book in response.context["similar_books"]] == expected
+        assert [book.id for book in result] == expected
+
+    def test_book_details_exact_by_default(self, client, tmp_path):
+        """Test built tables are not used for book pages unless enabled"""
+        tfidf = random_tfidf(n_books=40)
+        for book in range(40):
+            Book.objects.create(id=f"book{book}", title=f"Title {book}")
+        tfidf.save(str(tmp_path))
+
+        with override_settings(TFIDF_INDEX_PATH=tmp_path):
+            call_command("build_lsh_index", tables=1, bits=16, stdout=None)
+            response = client.get("/book/book0/")
+
+        expected = [book_id for book_id, _ in tfidf.similar("book0", 8)]
+        assert [book.id for book in response.context["similar_books"]] == expected
@@ -0,0 +1,36 @@
+import pytest
+
+from business_logic.sstable import SSTable
+
+
+class TestSSTable:
+    """Tests for the memory-mapped sorted string table"""
+
+    def test_write_and_open(self, tmp_path):
+        """Test keys, values and version round-trip through the mapped file"""
+        path = str(tmp_path / "table.sst")
+        SSTable.write(path, [("apple", b"1"), ("café", b"\x00\x01"), ("pear", b"")], 7)
+
+        table = SSTable.open(path)
+
+        assert table.version == 7
+        assert len(table) == 3
+        assert list(table.keys) == ["apple", "café", "pear"]
+        assert table.values[table.find("café")] == b"\x00\x01"
+        assert table.values[table.find("pear")] == b""
+        assert table.find("plum") == -1
+
+    def test_array_view(self, tmp_path):
+        """Test values can be viewed as arrays in place"""
+        path = str(tmp_path / "table.sst")
+        SSTable.write(path, [("a", (3).to_bytes(4, "little") * 2)], 1)
+
+        assert SSTable.open(path).values.array(0, "<i4").tolist() == [3, 3]
+
+    def test_rejects_other_files(self, tmp_path):
+        """Test a file without the magic header is refused"""
+        path = tmp_path / "table.sst"
+        path.write_bytes(b"\x00" * 64)
+
+        with pytest.raises(ValueError):
+            SSTable.open(str(path))
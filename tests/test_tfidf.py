@@ -0,0 +1,141 @@
+import numpy as np
+import pytest
+from django.core.management import call_command
+from django.test import override_settings
+
+from business_logic import tfidf
+from business_logic.tfidf import (
+    TFIDF_ARRAYS,
+    DescriptionRecommender,
+    TfidfIndex,
+    get_tfidf_index,
+)
+from data_access.models import Book
+
+
+def dense_index(book_ids, rows):
+    """Index from a dense books x terms matrix"""
+    matrix = np.array(rows, dtype=np.float32)
+    indptr = np.concatenate([[0], np.cumsum((matrix != 0).sum(axis=1))])
+    indices = np.nonzero(matrix)[1]
+    vocabulary = [f"term{i}" for i in range(matrix.shape[1])]
+    return TfidfIndex.from_csr(
+        book_ids, vocabulary, indptr, indices, matrix[matrix != 0]
+    )
+
+
+class TestTfidfIndex:
+    """Tests for the TF-IDF description matrix"""
+
+    @pytest.fixture
+    def index(self):
+        """Five books over four terms; book5 has an empty description"""
+        return dense_index(
+            ["book1", "book2", "book3", "book4", "book5"],
+            [
+                [3, 4, 0, 0],
+                [3, 4, 0, 1],
+                [0, 1, 2, 0],
+                [0, 0, 0, 5],
+                [0, 0, 0, 0],
+            ],
+        )
+
+    def test_rows_normalized(self, index):
+        """Test every non-empty row has unit L2 norm"""
+        rows = np.repeat(np.arange(len(index)), np.diff(index.indptr))
+        norms = np.bincount(rows, weights=index.data**2, minlength=len(index))
+        assert np.allclose(norms, [1, 1, 1, 1, 0])
+
+    def test_similarities_are_cosines(self, index):
+        """Test the sparse dot product matches dense cosine similarity"""
+        dense = np.zeros((len(index), len(index.vocabulary)))
+        rows = np.repeat(np.arange(len(index)), np.diff(index.indptr))
+        dense[rows, index.indices] = index.data
+
+        for row in range(len(index)):
+            assert np.allclose(index.similarities(row), dense @ dense[row], atol=1e-6)
+
+    def test_similar(self, index):
+        """Test neighbors exclude the book itself and unrelated books"""
+        similar = index.similar("book1", 3)
+
+        assert [book_id for book_id, _ in similar] == ["book2", "book3"]
+        assert similar[0][1] == pytest.approx(5 / np.sqrt(26), abs=1e-6)
+        assert index.similar("missing") == []
+        assert index.similar("book5") == []
+
+    @pytest.mark.parametrize("block_size", [1, 2, 64])
+    def test_top_neighbors_match_single_queries(self, index, monkeypatch, block_size):
+        """Test batch results equal per-book queries, in any block layout"""
+        monkeypatch.setattr(tfidf, "MAX_PRODUCTS", 3)
+        neighbors = {}
+        for start, rows, scores in index.top_neighbors(3, block_size):
+            for i, (row, row_scores) in enumerate(zip(rows, scores)):
+                kept = row >= 0
+                neighbors[start + i] = list(
+                    zip(index.to_book_ids(row[kept]), row_scores[kept].tolist())
+                )
+
+        for row, book_id in enumerate(index.to_book_ids(range(len(index)))):
+            expected = index.similar(book_id, 3)
+            assert [b for b, _ in neighbors[row]] == [b for b, _ in expected]
+            assert np.allclose([s for _, s in neighbors[row]], [s for _, s in expected])
+
+    def test_save_and_load_with_neighbors(self, index, tmp_path):
+        """Test the matrix round-trips and stored neighbors are served"""
+        index.save(str(tmp_path))
+        loaded = TfidfIndex.load(str(tmp_path))
+        assert loaded.neighbors is None
+        assert loaded.similar("book3", 2) == index.similar("book3", 2)
+
+        loaded.save_neighbors(str(tmp_path), 2)
+        reloaded = TfidfIndex.load(str(tmp_path))
+
+        assert reloaded.neighbors.shape == (5, 2)
+        assert [b for b, _ in reloaded.similar("book1", 2)] == ["book2", "book3"]
+
+    def test_save_keeps_mapped_arrays_readable(self, index, tmp_path):
+        """Test saving over a mapped matrix swaps in new files, not rewrites"""
+        path = tmp_path / "tfidf"
+        index.save(str(path))
+        index.save_neighbors(str(path), 2)
+        mapped = TfidfIndex.load(str(path))
+        expected = mapped.similar("book3", 2)
+        similarities = mapped.similarities(2)
+
+        dense_index(["book1"], [[1, 0, 0]]).save(str(path))
+
+        assert mapped.similar("book3", 2) == expected
+        assert np.array_equal(mapped.similarities(2), similarities)
+        assert sorted(p.name for p in path.iterdir()) == [
+            f"{name}.npy" for name in sorted(TFIDF_ARRAYS)
+        ]
+        assert [p.name for p in tmp_path.iterdir()] == ["tfidf"]
+
+
+@pytest.mark.django_db
+class TestDescriptionRecommender:
+    """Tests for the description-similarity recommender"""
+
+    def test_no_saved_matrix(self, tmp_path):
+        """Test recommendations are empty until preprocessing saved a matrix"""
+        with override_settings(TFIDF_INDEX_PATH=tmp_path / "missing"):
+            assert get_tfidf_index() is None
+            assert DescriptionRecommender.get_recommendations("book1") == []
+
+    def test_recommendations_from_saved_matrix(self, tmp_path):
+        """Test neighbors come back as books, most similar first"""
+        for book_id in ("book1", "book2", "book3"):
+            Book.objects.create(id=book_id, title=book_id)
+        dense_index(
+            ["book1", "book2", "book3", "gone"],
+            [[1, 1, 0], [1, 0, 0], [0, 1, 1], [1, 1, 0]],
+        ).save(str(tmp_path))
+
+        with override_settings(TFIDF_INDEX_PATH=tmp_path):
+            call_command("build_tfidf_neighbors", n=3, stdout=None)
+            result = DescriptionRecommender.get_recommendations("book1", 3)
+
+        # "gone" is the closest match but no longer in the catalog
+        assert [book.id for book in result] == ["book2", "book3"]
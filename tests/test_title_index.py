@@ -0,0 +1,110 @@
+import pytest
+
+from business_logic.title_index import TitleIndex, get_title_index, title_key
+from data_access.models import Book, CatalogVersion
+from data_access.signals import books_imported
+
+
+class TestTitleIndex:
+    """Tests for the sorted catalog title index"""
+
+    @pytest.fixture
+    def index(self):
+        """Index over a small hand-made catalog"""
+        return TitleIndex.from_rows(
+            [
+                ("book1", "Python  Basics", "John Smith"),
+                ("book2", "python cookbook", "Jane Doe"),
+                ("book3", "Data Science", None),
+                ("book4", "Python Basics", "Ann Lee"),
+            ]
+        )
+
+    def test_title_key_normalized(self):
+        """Test keys are case-folded with whitespace collapsed"""
+        assert title_key(" Python  BASICS ", "John") == title_key(
+            "python basics", "john"
+        )
+
+    def test_prefix(self, index):
+        """Test prefix queries return title order and respect the limit"""
+        assert index.prefix("PYTHON") == ["book4", "book1", "book2"]
+        assert index.prefix("python b") == ["book4", "book1"]
+        assert index.prefix("python", limit=1) == ["book4"]
+        assert index.prefix("ruby") == []
+
+    def test_range(self, index):
+        """Test range queries are half-open on normalized keys"""
+        assert index.range("d", "python c") == ["book3", "book4", "book1"]
+
+    def test_upsert_and_remove(self, index):
+        """Test edits keep the index sorted"""
+        index.upsert("book5", "Python Anatomy", None)
+        index.upsert("book3", "Python Data Science", None)
+        index.remove("book2")
+
+        assert index.prefix("python") == ["book5", "book4", "book1", "book3"]
+        assert "book2" not in index
+        assert len(index) == 4
+
+    @pytest.mark.parametrize("threshold", [0, 32])
+    def test_apply(self, index, monkeypatch, threshold):
+        """Test batched edits, merged or one by one, match a fresh build"""
+        monkeypatch.setattr("business_logic.title_index.MERGE_THRESHOLD", threshold)
+        rows = [("book5", "Python Anatomy", None), ("book3", "Python Data", None)]
+
+        index.apply(rows, ["book2", "missing"])
+
+        expected = TitleIndex.from_rows(
+            rows
+            + [("book1", "Python  Basics", "John Smith")]
+            + [("book4", "Python Basics", "Ann Lee")]
+        )
+        assert index.range("", "\U0010ffff") == expected.range("", "\U0010ffff")
+        assert "book2" not in index and "book5" in index
+
+
+@pytest.mark.django_db
+class TestTitleIndexLifecycle:
+    """Tests for the process-wide index"""
+
+    def test_patched_on_book_change(self, django_capture_on_commit_callbacks):
+        """Test saving or deleting a book patches the loaded index"""
+        index = get_title_index()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            book = Book.objects.create(id="b1", title="Zebra Tales")
+        assert get_title_index() is index
+        assert index.prefix("zebra") == ["b1"]
+
+        book.title = "Aardvark Tales"
+        with django_capture_on_commit_callbacks(execute=True):
+            book.save()
+        assert index.prefix("zebra") == []
+
+        with django_capture_on_commit_callbacks(execute=True):
+            book.delete()
+        assert "b1" not in index
+
+    def test_patched_on_bulk_import(self, django_capture_on_commit_callbacks):
+        """Test the bulk-import signal patches imported rows in"""
+        index = get_title_index()
+        Book.objects.bulk_create([Book(id="b2", title="Imported")])
+
+        with django_capture_on_commit_callbacks(execute=True):
+            books_imported.send(sender=Book, book_ids=["b2"])
+
+        assert get_title_index() is index
+        assert index.prefix("imp") == ["b2"]
+
+    def test_patched_after_change_elsewhere(self, monkeypatch):
+        """Test books changed by another process reach the index"""
+        monkeypatch.setattr("business_logic.catalog_sync.REFRESH_INTERVAL", 0)
+        index = get_title_index()
+
+        # Another worker's write: row and log change, no signal here
+        Book.objects.bulk_create([Book(id="b1", title="Zebra Tales")])
+        CatalogVersion.bump(["b1"])
+
+        assert get_title_index() is index
+        assert index.prefix("zebra") == ["b1"]
@@ -0,0 +1,104 @@
+import random
+
+import pytest
+
+from business_logic.trie import RadixTrie, book_keys, get_trie
+from data_access.models import Book, CatalogVersion
+
+
+class TestRadixTrie:
+    """Tests for the popularity-ranked autocomplete trie"""
+
+    @pytest.fixture
+    def trie(self):
+        """Trie over a small hand-made catalog"""
+        return RadixTrie.from_rows(
+            [
+                ("b1", "Python Basics", "John Smith", 10.0),
+                ("b2", "Python Cookbook", "Jane Doe", 50.0),
+                ("b3", "Pyramids", "Johanna Lee, Jane Doe", None),
+                ("b4", "Data Science", "Python Team", 20.0),
+            ]
+        )
+
+    def test_book_keys(self):
+        """Test titles and each author are normalized keys"""
+        assert book_keys(" The  Hobbit", "A, B ,A") == ["the hobbit", "a", "b"]
+
+    def test_suggest_ranked_by_ratings(self, trie):
+        """Test matches on title or author come most rated first"""
+        ids = [book_id for book_id, _, _ in trie.suggest("py")]
+        assert ids == ["b2", "b4", "b1", "b3"]
+        assert [s[0] for s in trie.suggest("PYTHON C")] == ["b2"]
+        assert [s[0] for s in trie.suggest("jo", limit=1)] == ["b1"]
+        assert trie.suggest("ruby") == []
+        assert trie.suggest("py")[0] == ("b2", "Python Cookbook", "Jane Doe")
+
+    def test_upsert_and_remove(self, trie):
+        """Test edits re-rank and drop books from every cached list"""
+        trie.upsert("b3", "Pyramids", None, 100.0)
+        trie.remove("b2")
+
+        assert [s[0] for s in trie.suggest("py")] == ["b3", "b4", "b1"]
+        assert [s[0] for s in trie.suggest("jane")] == []
+        assert "b2" not in trie
+
+    def test_matches_brute_force(self, monkeypatch):
+        """Test cached top lists equal a scan after random edits"""
+        monkeypatch.setattr("business_logic.trie.TOP_K", 3)
+        rng = random.Random(0)
+        words = ["ab", "abc", "abd", "b", "ba", "a"]
+        trie = RadixTrie()
+        books = {}
+        for step in range(300):
+            book_id = f"b{rng.randrange(30)}"
+            if rng.random() < 0.2:
+                trie.remove(book_id)
+                books.pop(book_id, None)
+            else:
+                title = "".join(rng.choice(words) for _ in range(2))
+                rating = float(rng.randrange(5))
+                trie.upsert(book_id, title, rng.choice(words), rating)
+                books[book_id] = (title, rating)
+
+        for prefix in ["", "a", "ab", "abc", "b", "ba", "bab"]:
+            expected = sorted(
+                (-rating, book_id)
+                for book_id, (title, rating) in books.items()
+                if any(
+                    key.startswith(prefix)
+                    for key in book_keys(title, trie._books[book_id][1])
+                )
+            )
+            ids = [s[0] for s in trie.suggest(prefix, limit=3)]
+            assert ids == [book_id for _, book_id in expected[:3]], prefix
+
+
+@pytest.mark.django_db
+class TestTrieLifecycle:
+    """Tests for the process-wide trie"""
+
+    def test_patched_on_book_change(self, django_capture_on_commit_callbacks):
+        """Test saving or deleting a book patches the loaded trie"""
+        trie = get_trie()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            book = Book.objects.create(id="b1", title="Zebra", ratingsCount=1)
+        assert get_trie() is trie
+        assert [s[0] for s in trie.suggest("zeb")] == ["b1"]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            book.delete()
+        assert trie.suggest("zeb") == []
+
+    def test_patched_after_change_elsewhere(self, monkeypatch):
+        """Test books changed by another process reach the trie"""
+        monkeypatch.setattr("business_logic.catalog_sync.REFRESH_INTERVAL", 0)
+        trie = get_trie()
+
+        # Another worker's write: row and log change, no signal here
+        Book.objects.bulk_create([Book(id="b1", title="Zebra", ratingsCount=1)])
+        CatalogVersion.bump(["b1"])
+
+        assert get_trie() is trie
+        assert [s[0] for s in trie.suggest("zeb")] == ["b1"]
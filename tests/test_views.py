@@ -92,6 +92,72 @@ class TestViews:
         response = client.get(url)
         assert response.status_code == 200
 
+    def test_search_view_whole_catalog(self, client, multiple_books):
+        """Test substring search is not limited to the first page"""
+        Book.objects.bulk_create(
+            Book(id=f"filler{i:03d}", title=f"Filler {i}") for i in range(150)
+        )
+        Book.objects.create(id="zzz", title="Late Python Arrival")
+
+        response = client.get(reverse("search") + "?q=python&sort=title")
+        titles = {book.title for book in response.context["books"]}
+        assert titles == {
+            "Python Programming",
+            "Introduction to Django",
+            "Advanced Python",
+            "Late Python Arrival",
+        }
+
+    def test_search_view_pages_by_cursor(self, client, multiple_books):
+        """Test the next link resumes substring search after the last key"""
+        Book.objects.bulk_create(
+            Book(id=f"py{i:03d}", title=f"Python Vol {i:03d}") for i in range(150)
+        )
+
+        response = client.get(reverse("search") + "?q=python")
+        first = response.context["books"]
+        next_after = response.context["next_after"]
+        assert len(first) == 100
+        assert next_after == "python vol 096\x00"
+        assert "after=python%20vol%20096%00" in str(response.content)
+
+        response = client.get(reverse("search") + f"?q=python&after={next_after}")
+        rest = response.context["books"]
+        assert response.context["next_after"] is None
+        assert {book.id for book in first} | {book.id for book in rest} == {
+            "book1",
+            "book2",
+            "book3",
+            *(f"py{i:03d}" for i in range(150)),
+        }
+        assert len(first) + len(rest) == 153
+
+    def test_autocomplete_ranked_by_ratings(self, client, multiple_books):
+        """Test suggestions match titles or authors, most rated first"""
+        Book.objects.filter(id="book3").update(ratingsCount=100)
+        Book.objects.create(id="book4", title="Pythons", ratingsCount=50)
+
+        response = client.get(reverse("autocomplete") + "?q=py")
+        data = json.loads(response.content.decode("utf-8"))
+
+        assert [item["id"] for item in data["suggestions"]] == ["book4", "book1"]
+
+    def test_search_view_fuzzy_mode(self, client, multiple_books):
+        """Test fuzzy mode tolerates typos"""
+        response = client.get(reverse("search") + "?q=pyton programing&mode=fuzzy")
+        assert response.status_code == 200
+        titles = [book.title for book in response.context["books"]]
+        assert titles == ["Python Programming"]
+
+    def test_search_view_prefix_mode(self, client, multiple_books):
+        """Test prefix mode searches titles across the whole catalog"""
+        url = reverse("search") + "?q=python&mode=prefix"
+        response = client.get(url)
+        assert response.status_code == 200
+        titles = [book.title for book in response.context["books"]]
+        assert titles == ["Python Programming"]
+        assert "mode=prefix" in str(response.content)
+
     def test_book_details_view(self, client, sample_book):
         """Test book details view"""
         url = reverse("book_details", kwargs={"book_id": sample_book.id})
@@ -129,6 +195,12 @@ class TestViews:
         data = json.loads(response.content.decode("utf-8"))
         assert len(data["suggestions"]) <= 1
 
+        # Test with a non-positive or non-numeric max
+        for value in ("0", "-1", "x"):
+            url = reverse("autocomplete") + f"?q=P&max={value}"
+            response = client.get(url)
+            assert response.status_code == 400
+
         # Test with empty query
         url = reverse("autocomplete") + "?q="
         response = client.get(url)
@@ -189,6 +261,20 @@ class TestBST:
         results = BST.search_in_books(sample_books, "JavaScript")
         assert len(results) == 0
 
+    def test_search_page_in_books(self, sample_books):
+        """Test pages come in catalog key order with a cursor to resume from"""
+        results, cursor = BST.search_page_in_books(sample_books, "John", 10)
+        assert [book.authors for book in results] == ["Robert Johnson", "John Smith"]
+        assert cursor is None
+
+        # A full page hands back the last key as the cursor
+        results, cursor = BST.search_page_in_books(sample_books, "Python", 1)
+        assert [book.id for book in results] == ["book3"]
+        assert cursor == "data science with python\x00robert johnson"
+
+        results, cursor = BST.search_page_in_books(sample_books, "Python", 1, cursor)
+        assert [book.id for book in results] == ["book2"]
+
     def test_bst_build_and_insert(self):
         """Test creating a BST and inserting books"""
         book1 = Book(id="test1", title="Test Book 1", authors="Author 1")